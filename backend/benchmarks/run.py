@@ -0,0 +1,395 @@
+"""Throughput and latency benchmarks for the file loader API.
+
+Drives the real FastAPI app, served by uvicorn on a loopback port, against a
+local S3 stand-in (moto in server mode by default, or any S3-compatible
+endpoint passed with ``--endpoint-url``). The stand-in runs in its own
+process, so the peak RSS recorded for each scenario covers the API and the
+load generator only.
+
+Run from the backend directory:
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --output new.json --compare results.json --tolerance 0.1
+
+With ``--compare``, scenarios whose throughput dropped or whose p99 latency
+grew by more than the tolerance are reported and the exit status is 1.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+BUCKET = "benchmark-bucket"
+MB = 1024 * 1024
+SIZE_UNITS = {"KB": 1024, "MB": MB, "GB": 1024 * MB}
+
+
+def parse_size(value: str) -> int:
+    value = value.strip().upper()
+    for unit, factor in SIZE_UNITS.items():
+        if value.endswith(unit):
+            return int(float(value[:-len(unit)]) * factor)
+    return int(value)
+
+
+def parse_list(value: str, cast=int) -> list:
+    return [cast(item) for item in value.split(",") if item.strip()]
+
+
+def percentile(values: list, pct: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on port {port} after {timeout}s")
+
+
+class RssSampler:
+    """Track the peak resident set size of this process while a scenario runs.
+
+    ``ru_maxrss`` only ever grows over the life of the process, so /proc is
+    polled instead to get a peak per scenario; where /proc is unavailable
+    the process-wide maximum is reported.
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def current_rss() -> int:
+        try:
+            with open("/proc/self/statm") as statm:
+                return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except OSError:
+            maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            # Reported in bytes on macOS, kilobytes elsewhere
+            return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+    def _sample(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.current_rss())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = self.current_rss()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.current_rss())
+
+
+async def run_load(operation, operations: int, concurrency: int) -> dict:
+    """Run ``operation(i)`` ``operations`` times, ``concurrency`` at once.
+
+    Each operation returns the number of units (bytes or keys) it moved.
+    """
+    slots = asyncio.Semaphore(concurrency)
+    latencies = []
+    units = []
+
+    async def timed(i: int):
+        async with slots:
+            start = time.perf_counter()
+            units.append(await operation(i))
+            latencies.append(time.perf_counter() - start)
+
+    with RssSampler() as rss:
+        start = time.perf_counter()
+        await asyncio.gather(*[timed(i) for i in range(operations)])
+        elapsed = time.perf_counter() - start
+
+    return {
+        "operations": operations,
+        "units": sum(units),
+        "seconds": round(elapsed, 4),
+        "ops_per_second": round(operations / elapsed, 2),
+        "units_per_second": round(sum(units) / elapsed, 2),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "max": round(max(latencies) * 1000, 2),
+        },
+        "peak_rss_mb": round(rss.peak / MB, 1),
+    }
+
+
+def put_keys(s3, prefix: str, count: int):
+    """Create ``count`` empty objects directly in S3; setup, not measured"""
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        list(pool.map(lambda i: s3.put_object(Bucket=BUCKET, Key=f"{prefix}{i:08d}", Body=b""), range(count)))
+
+
+async def bench_upload(http, args) -> list:
+    results = []
+    for size in args.upload_sizes:
+        payload = os.urandom(size)
+        for concurrency in args.concurrency:
+            async def upload(i: int) -> int:
+                response = await http.post(
+                    "/upload",
+                    params={"bucket_name": BUCKET, "upload_path": f"bench/upload/{size}/{concurrency}"},
+                    files={"file": (f"{i}.bin", io.BytesIO(payload), "application/octet-stream")},
+                )
+                response.raise_for_status()
+                return size
+
+            result = await run_load(upload, args.requests, concurrency)
+            results.append({"scenario": "upload", "params": {"size": size, "concurrency": concurrency},
+                            "unit": "bytes", **result})
+    return results
+
+
+async def bench_download(http, s3, args) -> list:
+    results = []
+    key = "bench/download/object.bin"
+    s3.put_object(Bucket=BUCKET, Key=key, Body=os.urandom(args.download_size))
+
+    async def download(i: int) -> int:
+        received = 0
+        async with http.stream("GET", f"/download/{BUCKET}/{key}") as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_raw():
+                received += len(chunk)
+        return received
+
+    for concurrency in args.concurrency:
+        result = await run_load(download, args.requests, concurrency)
+        results.append({"scenario": "download", "params": {"size": args.download_size, "concurrency": concurrency},
+                        "unit": "bytes", **result})
+    return results
+
+
+async def bench_list(http, s3, args) -> list:
+    prefix = "bench/list/"
+    put_keys(s3, prefix, args.list_keys)
+
+    async def list_prefix(i: int) -> int:
+        count = 0
+        async with http.stream("GET", f"/buckets/{BUCKET}/objects", params={"prefix": prefix, "stream": "true"}) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line and json.loads(line)["type"] == "file":
+                    count += 1
+        if count != args.list_keys:
+            raise RuntimeError(f"Listing returned {count} keys, expected {args.list_keys}")
+        return count
+
+    result = await run_load(list_prefix, args.list_repeats, 1)
+    return [{"scenario": "list", "params": {"keys": args.list_keys}, "unit": "keys", **result}]
+
+
+async def bench_delete(http, s3, args) -> list:
+    # Every run deletes its own freshly created prefix
+    for i in range(args.delete_repeats):
+        put_keys(s3, f"bench/delete/{i}/", args.delete_keys)
+
+    async def delete_prefix(i: int) -> int:
+        response = await http.request("DELETE", f"/delete/{BUCKET}", params={"prefix": f"bench/delete/{i}/"})
+        response.raise_for_status()
+        body = response.json()
+        if body["failed"]:
+            raise RuntimeError(f"{len(body['failed'])} keys failed to delete")
+        return len(body["deleted"])
+
+    result = await run_load(delete_prefix, args.delete_repeats, 1)
+    return [{"scenario": "delete", "params": {"keys": args.delete_keys}, "unit": "keys", **result}]
+
+
+def start_moto_server() -> tuple:
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "moto.server", "-p", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_for_port(port)
+    except RuntimeError:
+        process.kill()
+        raise RuntimeError("moto server did not start; install it with `pip install 'moto[server]'`")
+    return process, f"http://127.0.0.1:{port}"
+
+
+def start_api_server(endpoint_url: str):
+    """Configure the app for the stand-in and serve it on a background thread"""
+    os.environ.update({
+        "AWS_ENDPOINT_URL_S3": endpoint_url,
+        "AWS_ACCESS_KEY_ID": os.environ.get("AWS_ACCESS_KEY_ID", "benchmark"),
+        "AWS_SECRET_ACCESS_KEY": os.environ.get("AWS_SECRET_ACCESS_KEY", "benchmark"),
+        "S3_BUCKET_NAME": BUCKET,
+        # Measure the S3 path rather than cache hits
+        "LISTING_CACHE_TTL": "0",
+    })
+    import uvicorn
+    from config import reload_settings
+    reload_settings()
+    from main import app
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    wait_for_port(port)
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+async def run_scenarios(api_url: str, s3, args) -> list:
+    import httpx
+
+    results = []
+    limits = httpx.Limits(max_connections=max(args.concurrency) * 2)
+    async with httpx.AsyncClient(base_url=api_url, timeout=300, limits=limits) as http:
+        if "upload" in args.scenarios:
+            results += await bench_upload(http, args)
+        if "download" in args.scenarios:
+            results += await bench_download(http, s3, args)
+        if "list" in args.scenarios:
+            results += await bench_list(http, s3, args)
+        if "delete" in args.scenarios:
+            results += await bench_delete(http, s3, args)
+    return results
+
+
+def scenario_id(result: dict) -> str:
+    params = ",".join(f"{name}={value}" for name, value in sorted(result["params"].items()))
+    return f"{result['scenario']}[{params}]"
+
+
+def compare(results: list, baseline: list, tolerance: float) -> list:
+    """Return a description of every scenario that regressed beyond ``tolerance``"""
+    previous = {scenario_id(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        before = previous.get(scenario_id(result))
+        if before is None:
+            continue
+        if result["units_per_second"] < before["units_per_second"] * (1 - tolerance):
+            regressions.append(
+                f"{scenario_id(result)}: throughput {before['units_per_second']} -> {result['units_per_second']} {result['unit']}/s"
+            )
+        if result["latency_ms"]["p99"] > before["latency_ms"]["p99"] * (1 + tolerance):
+            regressions.append(
+                f"{scenario_id(result)}: p99 {before['latency_ms']['p99']} -> {result['latency_ms']['p99']} ms"
+            )
+    return regressions
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--output", default="benchmark-results.json", help="Where to write the JSON results")
+    parser.add_argument("--compare", help="Earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed relative slowdown before flagging")
+    parser.add_argument("--endpoint-url", help="Use this S3-compatible endpoint instead of starting moto server")
+    parser.add_argument("--scenarios", type=lambda v: parse_list(v, str), default=["upload", "download", "list", "delete"])
+    parser.add_argument("--upload-sizes", type=lambda v: parse_list(v, parse_size), default=[64 * 1024, MB, 16 * MB])
+    parser.add_argument("--concurrency", type=parse_list, default=[1, 8])
+    parser.add_argument("--requests", type=int, default=20, help="Operations per upload/download scenario")
+    parser.add_argument("--download-size", type=parse_size, default=32 * MB)
+    parser.add_argument("--list-keys", type=int, default=5000)
+    parser.add_argument("--list-repeats", type=int, default=5)
+    parser.add_argument("--delete-keys", type=int, default=2000)
+    parser.add_argument("--delete-repeats", type=int, default=3)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    moto = None
+    endpoint_url = args.endpoint_url
+    if not endpoint_url:
+        moto, endpoint_url = start_moto_server()
+
+    try:
+        import boto3
+        s3 = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=os.environ.get("AWS_REGION", "us-east-1"),
+            aws_access_key_id=os.environ.get("AWS_ACCESS_KEY_ID", "benchmark"),
+            aws_secret_access_key=os.environ.get("AWS_SECRET_ACCESS_KEY", "benchmark"),
+        )
+        s3.create_bucket(Bucket=BUCKET)
+
+        server, thread, api_url = start_api_server(endpoint_url)
+        try:
+            results = asyncio.run(run_scenarios(api_url, s3, args))
+        finally:
+            server.should_exit = True
+            thread.join()
+    finally:
+        if moto is not None:
+            moto.terminate()
+            moto.wait()
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "endpoint": "moto-server" if moto is not None else endpoint_url,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as out:
+        json.dump(report, out, indent=2)
+
+    for result in results:
+        print(f"{scenario_id(result):45} {result['units_per_second'] / (MB if result['unit'] == 'bytes' else 1):10.1f} "
+              f"{'MB' if result['unit'] == 'bytes' else result['unit']}/s  p50 {result['latency_ms']['p50']:8.1f}ms  "
+              f"p99 {result['latency_ms']['p99']:8.1f}ms  rss {result['peak_rss_mb']:7.1f}MB")
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(results, json.load(baseline_file)["results"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
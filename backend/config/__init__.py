@@ -1,3 +1,3 @@
-from .settings import settings, get_settings
+from .settings import settings, get_settings, reload_settings, reset_settings, on_settings_reload
 
-__all__ = ["settings", "get_settings"]
+__all__ = ["settings", "get_settings", "reload_settings", "reset_settings", "on_settings_reload"]
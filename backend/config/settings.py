@@ -1,4 +1,5 @@
 import os
+from functools import lru_cache
 from pydantic_settings import BaseSettings
 from pydantic import ConfigDict
 
@@ -8,6 +9,7 @@ class Settings(BaseSettings):
     aws_access_key_id: str = ""
     aws_secret_access_key: str = ""
     aws_region: str = "us-east-1"
+    aws_endpoint_url_s3: str = ""
     s3_bucket_name: str = ""
     max_file_size: int = 5 * 1024 * 1024 * 1024  # 5GB
     allowed_mime_types: list = [
@@ -16,10 +18,86 @@ class Settings(BaseSettings):
         "application/json", "application/octet-stream",
         "text/csv", "text/markdown"
     ]
+    upload_part_size: int = 8 * 1024 * 1024  # 8MB, S3 minimum is 5MB
+    upload_token_key: str = ""  # signs direct multipart uploads' part counts; defaults to the AWS secret key
+    upload_max_in_flight_parts: int = 4
+    upload_multipart_threshold: int = 8 * 1024 * 1024  # 8MB, smaller files use a single PUT
+    upload_io_queue_depth: int = 100  # chunks boto3 may queue for writing when uploading files
+    upload_compression: str = ""  # "gzip" or "zstd" to compress compressible uploads by default
+    compressible_mime_types: list = ["text/csv", "application/json", "text/plain", "text/markdown"]
+    upload_adaptive: bool = False  # size parts and concurrency from observed throughput
+    upload_max_part_size: int = 64 * 1024 * 1024  # 64MB, upper bound for adaptive part sizes
+    upload_worker_max_parts: int = 32  # concurrent part uploads across all uploads in a worker
+    upload_job_workers: int = 4  # background uploads running at once for POST /upload/jobs
+    upload_job_max_queued: int = 1000  # jobs waiting for a worker before new ones are refused
+    upload_job_retention: int = 86400  # seconds finished jobs stay available for status lookups
+    upload_job_lease: int = 60  # seconds a dead worker's jobs and spool files are left alone before being taken over
+    upload_spool_dir: str = "upload_spool"
+    upload_jobs_path: str = "upload_jobs.sqlite3"
+    bulk_upload_concurrency: int = 8
+    bulk_upload_max_files: int = 1000
+    download_chunk_size: int = 1024 * 1024  # 1MB
+    download_cache_dir: str = ""  # directory for the on-disk download cache; empty disables it
+    download_cache_max_bytes: int = 1024 * 1024 * 1024  # 1GB
+    download_cache_max_object_size: int = 256 * 1024 * 1024  # 256MB, larger objects are always streamed from S3
+    delete_batch_concurrency: int = 4
+    listing_cache_ttl: int = 30  # seconds, 0 disables the cache
+    listing_cache_max_entries: int = 1000
+    listing_cache_max_bytes: int = 32 * 1024 * 1024  # 32MB
+    prefix_usage_concurrency: int = 16  # LIST requests in flight for one usage walk
+    prefix_usage_max_depth: int = 5
+    prefix_usage_cache_ttl: int = 60  # seconds usage totals are reused; 0 disables
+    archive_prefetch: int = 4
+    copy_multipart_threshold: int = 256 * 1024 * 1024  # 256MB, CopyObject itself stops at 5GB
+    copy_part_size: int = 64 * 1024 * 1024  # 64MB
+    copy_part_concurrency: int = 8
+    copy_object_concurrency: int = 16
+    s3_max_pool_connections: int = 50
+    s3_client_cache_size: int = 32
+    s3_client_idle_ttl: int = 900  # seconds
+    s3_executor_max_workers: int = 32
+    s3_retry_base_delay: float = 0.1  # seconds, shortest backoff before a retry
+    s3_retry_max_delay: float = 20.0  # seconds, longest backoff before a retry
+    s3_retry_budget: int = 100  # retry tokens per worker
+    s3_retry_budget_refill: float = 10.0  # tokens regained per second
+    s3_circuit_failure_threshold: int = 10  # throttled responses in a row that open a bucket's circuit
+    s3_circuit_reset_timeout: float = 10.0  # seconds an open circuit fails fast before probing
+    s3_circuit_half_open_calls: int = 2  # probe calls let through while half-open
+    dedup_enabled: bool = False  # copy identical content server-side instead of uploading it again
+    dedup_index_path: str = "dedup_index.sqlite3"
+    dedup_rebuild_concurrency: int = 16
+    key_index_enabled: bool = False  # keep a searchable SQLite index of object keys
+    key_index_path: str = "key_index.sqlite3"
+    key_index_refresh_interval: int = 300  # seconds before a search refreshes its bucket in the background; 0 never
+    key_index_concurrency: int = 16  # LIST requests in flight while refreshing a bucket
     log_level: str = "INFO"
+    log_format: str = "json"  # "json" or "text"
+    log_sample_rate: float = 1.0  # fraction of successful per-request/per-upload records kept
 
+@lru_cache(maxsize=1)
 def get_settings() -> Settings:
-    """Get settings instance, reading environment variables each time"""
+    """Get the settings instance, resolved once from the environment and .env"""
     return Settings()
 
+_reload_hooks = []
+
+def on_settings_reload(func):
+    """Register ``func`` to be called by ``reset_settings`` and ``reload_settings``, e.g. to drop a singleton built from the old settings"""
+    _reload_hooks.append(func)
+    return func
+
+def reset_settings():
+    """Drop the cached settings and everything built from them; the next use re-reads the environment.
+
+    Stop the upload job queue first if it is running.
+    """
+    get_settings.cache_clear()
+    for hook in _reload_hooks:
+        hook()
+
+def reload_settings() -> Settings:
+    """Re-read the environment and .env, resetting everything built from the old settings"""
+    reset_settings()
+    return get_settings()
+
 settings = get_settings()
@@ -1,18 +1,69 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Header, Body
+from fastapi import FastAPI, HTTPException, Header, Body, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, Response, PlainTextResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
-from pydantic import BaseModel
-from src.services.s3_uploader import S3Client
-from src.models.upload import UploadResponse
-from src.utils.logger import get_request_id, StructuredLogger
+from botocore.exceptions import ClientError
+from src.services.async_s3 import AsyncS3Client, shutdown_s3_executor
+from src.services.s3_uploader import choose_part_size, MAX_PARTS, get_client_registry, credentials_fingerprint
+from src.services.retry_policy import CircuitOpenError, get_retry_policy, CLOSED, HALF_OPEN, OPEN
+from src.services.streaming_upload import StreamingUpload
+from src.services.transfer_tuning import get_transfer_tuner
+from src.services.dedup_index import get_dedup_index, rebuild_index
+from src.services.key_index import get_key_index, refresh_key_index
+from src.services.compression import StreamCompressor, supported_encodings, accepts_encoding
+from src.services.listing_cache import get_listing_cache, USAGE
+from src.services.prefix_usage import prefix_usage
+from src.services.object_cache import ObjectCache, CachedObject, get_object_cache, download_to_cache, iter_file
+from src.services.upload_jobs import get_upload_job_queue, iter_spool_file
+from src.services.archive import stream_zip_archive
+from src.services.object_copy import copy_object, copy_prefix
+from src.models.upload import (
+    UploadResponse,
+    UploadJobAccepted,
+    UploadJobStatus,
+    BulkUploadResponse,
+    MultipartInitiateRequest,
+    MultipartInitiateResponse,
+    MultipartPartUrlsRequest,
+    MultipartCompleteRequest,
+    ArchiveRequest,
+    CopyRequest,
+)
+from src.utils.logger import (
+    get_request_id, bind_request_id, timed, StructuredLogger, RequestLoggingMiddleware, setup_logging, shutdown_logging
+)
+from src.utils.metrics import registry as metrics_registry, MetricsMiddleware, CallbackMetric
+from src.utils.form_stream import iter_form_events, FIELD, FILE_START, FILE_DATA, FILE_END
 from config import get_settings
+import asyncio
+import functools
+import hashlib
+import hmac
 import logging
+import json
 import os
-import io
+import time
+import uuid
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime, format_datetime
+from datetime import datetime, timezone
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+    setup_logging(settings.log_level, settings.log_format, settings.log_sample_rate)
+    # Picks up jobs left queued or running by the previous process
+    await get_upload_job_queue().start(process_upload_job)
+    yield
+    await get_upload_job_queue().stop()
+    shutdown_s3_executor()
+    shutdown_logging()
+
+app = FastAPI(title="AWS S3 File Loader", lifespan=lifespan)
 
-app = FastAPI(title="AWS S3 File Loader")
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestLoggingMiddleware)
 
 # CORS middleware
 app.add_middleware(
@@ -25,83 +76,667 @@ app.add_middleware(
 
 logger = logging.getLogger(__name__)
 
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_handler(request: Request, exc: CircuitOpenError):
+    """A throttled bucket's circuit is open: tell the client to back off instead of failing hard"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": exc.response["Error"]["Message"]},
+        headers={"Retry-After": str(max(1, int(exc.retry_after + 0.999)))},
+    )
+
+@timed("validation")
+def resolve_settings(aws_access_key: str = None, aws_secret_key: str = None):
+    """Settings for this request, using header credentials when provided"""
+    settings = get_settings()
+    
+    # Use provided credentials or fall back to settings
+    access_key = aws_access_key or settings.aws_access_key_id
+    secret_key = aws_secret_key or settings.aws_secret_access_key
+    
+    if not access_key or not secret_key:
+        raise HTTPException(status_code=400, detail="AWS credentials not provided")
+    
+    if access_key == settings.aws_access_key_id and secret_key == settings.aws_secret_access_key:
+        return settings
+    return settings.model_copy(update={
+        "aws_access_key_id": access_key,
+        "aws_secret_access_key": secret_key
+    })
+
+def build_upload_key(upload_path: str, filename: str) -> str:
+    """Generate S3 key with upload path (without request_id in path)"""
+    return f"{upload_path.rstrip('/')}/{filename}" if upload_path else f"uploads/{filename}"
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
+def request_content_length(request: Request) -> int:
+    """The request's declared body size, or None when absent or malformed"""
+    try:
+        return int(request.headers["content-length"])
+    except (KeyError, ValueError):
+        return None
+
+def resolve_upload_target(settings, bucket_name: str, filename: str, content_type: str,
+                          compression: str = None) -> tuple:
+    """Validate an incoming file part; return its bucket and compressor (None when stored as sent)"""
+    # Use provided bucket or default
+    target_bucket = bucket_name or settings.s3_bucket_name
+    if not target_bucket:
+        raise HTTPException(status_code=400, detail="Bucket name not provided and S3_BUCKET_NAME not configured")
+    
+    if not filename:
+        raise HTTPException(status_code=400, detail="File must have a name")
+    
+    # Validate MIME type
+    if content_type and content_type not in settings.allowed_mime_types:
+        raise HTTPException(
+            status_code=400,
+            detail=f"File type {content_type} not allowed"
+        )
+    
+    encoding = settings.upload_compression if compression is None else compression
+    compressor = None
+    if encoding and encoding not in ("none", "identity"):
+        if encoding not in supported_encodings():
+            raise HTTPException(
+                status_code=400,
+                detail=f"Compression {encoding} not supported, use one of: {', '.join(supported_encodings())}"
+            )
+        if content_type in settings.compressible_mime_types:
+            compressor = StreamCompressor(encoding)
+    return target_bucket, compressor
+
+@timed("validation")
+def start_streaming_upload(s3_client: AsyncS3Client, bucket_name: str, upload_path: str,
+                           filename: str, content_type: str, request_id: str,
+                           expected_size: int = None, declared_sha256: str = None,
+                           compression: str = None) -> StreamingUpload:
+    """Validate an incoming file part and open a streaming upload for it.
+
+    ``expected_size`` is an upper bound on the file size, such as the request's
+    Content-Length; without it ``max_file_size`` bounds the number of parts.
+    ``compression`` overrides ``upload_compression``; it only applies to
+    ``compressible_mime_types``.
+    """
+    settings = s3_client.settings
+    target_bucket, compressor = resolve_upload_target(settings, bucket_name, filename, content_type, compression)
+    
+    tuner = get_transfer_tuner()
+    part_size, max_in_flight = tuner.plan(min(expected_size or settings.max_file_size, settings.max_file_size))
+    
+    return StreamingUpload(
+        s3_client,
+        target_bucket,
+        build_upload_key(upload_path, filename),
+        request_id,
+        content_type=content_type,
+        part_size=part_size,
+        max_in_flight=max_in_flight,
+        tuner=tuner,
+        dedup_index=get_dedup_index() if settings.dedup_enabled else None,
+        declared_sha256=declared_sha256,
+        compressor=compressor,
+    )
+
 @app.post("/upload")
 async def upload_file(
-    file: UploadFile = File(...),
+    request: Request,
     bucket_name: str = None,
     upload_path: str = "",
+    compression: str = None,
+    content_sha256: str = Header(None, alias="X-Content-SHA256"),
     aws_access_key: str = Header(None, alias="X-AWS-Access-Key"),
     aws_secret_key: str = Header(None, alias="X-AWS-Secret-Key")
 ) -> UploadResponse:
-    """Upload file to S3"""
+    """Upload file to S3, streaming the request body into a multipart upload.
+
+    ``X-Content-SHA256`` (hex) is checked against the received bytes, and with
+    deduplication enabled lets content already in the bucket skip the upload.
+    ``compression=gzip|zstd`` stores compressible types compressed.
+    """
     request_id = get_request_id()
+    bind_request_id(request_id)
+    started = time.perf_counter()
     
-    # Use provided credentials or fall back to settings
-    access_key = aws_access_key or get_settings().aws_access_key_id
-    secret_key = aws_secret_key or get_settings().aws_secret_access_key
+    settings = resolve_settings(aws_access_key, aws_secret_key)
     
-    if not access_key or not secret_key:
-        raise HTTPException(status_code=400, detail="AWS credentials not provided")
+    s3_client = AsyncS3Client(settings=settings)
+    form_fields = {}
+    upload = None
+    completed = False
     
-    settings = get_settings().model_copy(update={
-        "aws_access_key_id": access_key,
-        "aws_secret_access_key": secret_key
-    })
+    try:
+        async for event in iter_form_events(request):
+            kind = event[0]
+            
+            if kind == FIELD:
+                form_fields[event[1]] = event[2]
+            
+            elif kind == FILE_START:
+                _, field_name, filename, content_type = event
+                if field_name != "file" or upload is not None:
+                    raise HTTPException(status_code=400, detail="Exactly one file must be sent in the 'file' field")
+                
+                # Query parameters win over form fields sent ahead of the file
+                upload = start_streaming_upload(
+                    s3_client,
+                    bucket_name or form_fields.get("bucket_name"),
+                    upload_path or form_fields.get("upload_path", ""),
+                    filename,
+                    content_type,
+                    request_id,
+                    expected_size=request_content_length(request),
+                    declared_sha256=content_sha256,
+                    compression=compression or form_fields.get("compression")
+                )
+                StructuredLogger.log_upload_start(request_id, filename, request_content_length(request) or 0)
+            
+            elif kind == FILE_DATA:
+                # Validate file size as the bytes arrive
+                if upload.bytes_received + len(event[1]) > settings.max_file_size:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"File size exceeds maximum {settings.max_file_size}"
+                    )
+                await upload.write(event[1])
+        
+        if upload is None:
+            raise HTTPException(status_code=400, detail="No file provided in the 'file' field")
+        
+        if upload.bytes_received == 0:
+            raise HTTPException(status_code=400, detail="File is empty")
+        
+        await upload.complete()
+        completed = True
+    except (HTTPException, CircuitOpenError):
+        raise
+    except Exception as e:
+        if upload is not None:
+            StructuredLogger.log_upload_error(request_id, upload.file_key, str(e))
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+    finally:
+        # Also runs when the client disconnects and the request is cancelled, so no
+        # multipart upload is left behind accruing storage
+        if upload is not None and not completed:
+            await asyncio.shield(upload.abort())
     
-    # Use provided bucket or default
-    target_bucket = bucket_name or settings.s3_bucket_name
+    StructuredLogger.log_upload_success(
+        request_id, upload.file_key, upload.file_key, upload.bytes_received, time.perf_counter() - started
+    )
+    presigned_url = s3_client.generate_presigned_url_for_bucket(upload.bucket_name, upload.file_key)
+    return UploadResponse(
+        success=True,
+        file_key=upload.file_key,
+        request_id=request_id,
+        presigned_url=presigned_url,
+        deduplicated_from=upload.deduplicated_from,
+        content_encoding=upload.content_encoding
+    )
+
+async def process_upload_job(job: dict, settings, progress, started) -> dict:
+    """Upload a spooled job body through a StreamingUpload; the job queue's handler"""
+    bind_request_id(job["request_id"])
+    started = time.perf_counter()
+    s3_client = AsyncS3Client(settings=settings)
+    upload = start_streaming_upload(
+        s3_client,
+        job["bucket_name"],
+        job["upload_path"],
+        job["filename"],
+        job["content_type"],
+        job["request_id"],
+        expected_size=job["size"],
+        declared_sha256=job["declared_sha256"],
+        compression=job["compression"]
+    )
+    StructuredLogger.log_upload_start(job["request_id"], job["filename"], job["size"])
+    recorded_upload_id = None
+    try:
+        async for chunk in iter_spool_file(job["spool_path"], settings.download_chunk_size):
+            await upload.write(chunk)
+            progress(upload.bytes_received)
+            if upload.upload_id != recorded_upload_id:
+                recorded_upload_id = upload.upload_id
+                await started(recorded_upload_id)
+        await upload.complete()
+    except BaseException as e:
+        if not isinstance(e, asyncio.CancelledError):
+            StructuredLogger.log_upload_error(job["request_id"], upload.file_key, str(e))
+        await upload.abort()
+        raise
+    
+    StructuredLogger.log_upload_success(
+        job["request_id"], upload.file_key, upload.file_key, upload.bytes_received, time.perf_counter() - started
+    )
+    return UploadResponse(
+        success=True,
+        file_key=upload.file_key,
+        request_id=job["request_id"],
+        presigned_url=s3_client.generate_presigned_url_for_bucket(upload.bucket_name, upload.file_key),
+        deduplicated_from=upload.deduplicated_from,
+        content_encoding=upload.content_encoding
+    ).model_dump()
+
+@app.post("/upload/jobs", status_code=202)
+async def submit_upload_job(
+    request: Request,
+    bucket_name: str = None,
+    upload_path: str = "",
+    compression: str = None,
+    content_sha256: str = Header(None, alias="X-Content-SHA256"),
+    aws_access_key: str = Header(None, alias="X-AWS-Access-Key"),
+    aws_secret_key: str = Header(None, alias="X-AWS-Secret-Key")
+) -> UploadJobAccepted:
+    """Accept a file for background upload; same form and options as /upload.
+
+    The body is spooled to local disk as it arrives and the request returns
+    202 with a job id as soon as it is complete. The upload to S3 runs on
+    the job queue's workers; poll ``GET /upload/jobs/{job_id}`` for progress
+    and the final UploadResponse.
+    """
+    request_id = get_request_id()
+    bind_request_id(request_id)
+    settings = resolve_settings(aws_access_key, aws_secret_key)
+    
+    queue = get_upload_job_queue()
+    await queue.start(process_upload_job)
+    if queue.is_full():
+        raise HTTPException(status_code=503, detail="Upload queue is full", headers={"Retry-After": "5"})
+    
+    job_id = uuid.uuid4().hex
+    form_fields = {}
+    job = None
+    spool = None
+    
+    try:
+        async for event in iter_form_events(request):
+            kind = event[0]
+            
+            if kind == FIELD:
+                form_fields[event[1]] = event[2]
+            
+            elif kind == FILE_START:
+                _, field_name, filename, content_type = event
+                if field_name != "file" or job is not None:
+                    raise HTTPException(status_code=400, detail="Exactly one file must be sent in the 'file' field")
+                
+                # Query parameters win over form fields sent ahead of the file
+                target_upload_path = upload_path or form_fields.get("upload_path", "")
+                job_compression = compression or form_fields.get("compression")
+                with timed("validation"):
+                    target_bucket, _ = resolve_upload_target(
+                        settings, bucket_name or form_fields.get("bucket_name"), filename, content_type, job_compression
+                    )
+                job = {
+                    "id": job_id,
+                    "request_id": request_id,
+                    "bucket_name": target_bucket,
+                    "upload_path": target_upload_path,
+                    "file_key": build_upload_key(target_upload_path, filename),
+                    "filename": filename,
+                    "content_type": content_type,
+                    "compression": job_compression,
+                    "declared_sha256": content_sha256,
+                }
+                spool = queue.spool(job_id)
+                await spool.open()
+            
+            elif kind == FILE_DATA:
+                if spool.size + len(event[1]) > settings.max_file_size:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"File size exceeds maximum {settings.max_file_size}"
+                    )
+                await spool.write(event[1])
+        
+        if job is None:
+            raise HTTPException(status_code=400, detail="No file provided in the 'file' field")
+        
+        if spool.size == 0:
+            raise HTTPException(status_code=400, detail="File is empty")
+        
+        await spool.commit()
+    except BaseException:
+        if spool is not None:
+            await spool.discard()
+        raise
+    
+    job["size"] = spool.size
+    await queue.submit(job, settings if settings is not get_settings() else None)
+    return UploadJobAccepted(
+        job_id=job_id,
+        status="queued",
+        request_id=request_id,
+        status_url=f"/upload/jobs/{job_id}"
+    )
+
+@app.get("/upload/jobs/{job_id}")
+async def get_upload_job(job_id: str) -> UploadJobStatus:
+    """Status of a background upload: bytes uploaded so far and, once done, its UploadResponse or error"""
+    job = await get_upload_job_queue().status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Upload job not found: {job_id}")
+    return UploadJobStatus(
+        job_id=job["id"],
+        status=job["status"],
+        request_id=job["request_id"],
+        bucket_name=job["bucket_name"],
+        file_key=job["file_key"],
+        bytes_total=job["size"],
+        bytes_uploaded=job["bytes_uploaded"],
+        created_at=job["created"],
+        updated_at=job["updated"],
+        result=job["result"],
+        error=job["error"]
+    )
+
+@app.post("/upload/bulk")
+async def upload_files_bulk(
+    request: Request,
+    bucket_name: str = None,
+    upload_path: str = "",
+    compression: str = None,
+    aws_access_key: str = Header(None, alias="X-AWS-Access-Key"),
+    aws_secret_key: str = Header(None, alias="X-AWS-Secret-Key")
+) -> BulkUploadResponse:
+    """Upload many files from one multipart request, several S3 transfers at a time.
+
+    Each file gets its own result, so one bad file doesn't fail the batch.
+    """
+    settings = resolve_settings(aws_access_key, aws_secret_key)
+    s3_client = AsyncS3Client(settings=settings)
+    # Bounds both concurrent S3 transfers and the files buffered in memory
+    slots = asyncio.Semaphore(max(1, settings.bulk_upload_concurrency))
+    form_fields = {}
+    results = []
+    tasks = []
+    current = None  # (index, StreamingUpload or None when the file was rejected)
+    received = False
+    
+    async def finish(index: int, upload: StreamingUpload):
+        try:
+            if upload.bytes_received == 0:
+                raise HTTPException(status_code=400, detail="File is empty")
+            await upload.complete()
+            StructuredLogger.log_upload_success(
+                upload.request_id, upload.file_key, upload.file_key, upload.bytes_received
+            )
+            results[index] = UploadResponse(
+                success=True,
+                file_key=upload.file_key,
+                request_id=upload.request_id,
+                presigned_url=s3_client.generate_presigned_url_for_bucket(upload.bucket_name, upload.file_key),
+                deduplicated_from=upload.deduplicated_from,
+                content_encoding=upload.content_encoding
+            )
+        except asyncio.CancelledError:
+            # The request failed partway through; its client gets no per-file results
+            await asyncio.shield(upload.abort())
+            raise
+        except Exception as e:
+            error = e.detail if isinstance(e, HTTPException) else str(e)
+            StructuredLogger.log_upload_error(upload.request_id, upload.file_key, error)
+            await upload.abort()
+            results[index] = UploadResponse(success=False, file_key=upload.file_key, error=error, request_id=upload.request_id)
+        finally:
+            slots.release()
+    
+    async def reject(index: int, upload: StreamingUpload, error: str):
+        if upload is not None:
+            await upload.abort()
+            slots.release()
+        results[index] = UploadResponse(
+            success=False,
+            file_key=upload.file_key if upload else None,
+            error=error,
+            request_id=results[index].request_id
+        )
+    
+    try:
+        async for event in iter_form_events(request):
+            kind = event[0]
+            
+            if kind == FIELD:
+                form_fields[event[1]] = event[2]
+            
+            elif kind == FILE_START:
+                _, _, filename, content_type = event
+                if len(results) >= settings.bulk_upload_max_files:
+                    raise HTTPException(status_code=400, detail=f"At most {settings.bulk_upload_max_files} files per request")
+                
+                request_id = get_request_id()
+                results.append(UploadResponse(success=False, file_key=None, request_id=request_id))
+                index = len(results) - 1
+                await slots.acquire()
+                try:
+                    upload = start_streaming_upload(
+                        s3_client,
+                        bucket_name or form_fields.get("bucket_name"),
+                        upload_path or form_fields.get("upload_path", ""),
+                        filename,
+                        content_type,
+                        request_id,
+                        expected_size=request_content_length(request),
+                        compression=compression or form_fields.get("compression")
+                    )
+                except HTTPException as e:
+                    slots.release()
+                    await reject(index, None, e.detail)
+                    current = (index, None)
+                    continue
+                StructuredLogger.log_upload_start(request_id, filename, 0)
+                current = (index, upload)
+            
+            elif kind == FILE_DATA:
+                index, upload = current
+                if upload is None:
+                    continue  # Rejected file: drain its bytes
+                if upload.bytes_received + len(event[1]) > settings.max_file_size:
+                    await reject(index, upload, f"File size exceeds maximum {settings.max_file_size}")
+                    current = (index, None)
+                    continue
+                await upload.write(event[1])
+            
+            elif kind == FILE_END:
+                index, upload = current
+                if upload is not None:
+                    tasks.append(asyncio.create_task(finish(index, upload)))
+                current = None
+        received = True
+    finally:
+        # Also runs when the client disconnects and the request is cancelled: abort the
+        # file being received and the ones still completing, so none is left behind
+        if not received:
+            if current is not None and current[1] is not None:
+                await asyncio.shield(current[1].abort())
+            for task in tasks:
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    if not results:
+        raise HTTPException(status_code=400, detail="No files provided")
+    
+    uploaded = sum(1 for result in results if result.success)
+    return BulkUploadResponse(
+        success=uploaded == len(results),
+        uploaded=uploaded,
+        failed=len(results) - uploaded,
+        results=results
+    )
+
+MAX_PART_URLS_PER_REQUEST = 1000
+
+def multipart_upload_token(settings, upload_id: str, bucket_name: str, file_key: str, part_count: int) -> str:
+    """Signature over the part count granted to a direct upload, so part-urls can't be asked for more parts"""
+    key = (settings.upload_token_key or settings.aws_secret_access_key).encode()
+    message = f"{upload_id}\0{bucket_name}\0{file_key}\0{part_count}".encode()
+    return hmac.new(key, message, hashlib.sha256).hexdigest()
+
+@app.post("/multipart/initiate")
+async def initiate_multipart_upload(
+    upload: MultipartInitiateRequest,
+    aws_access_key: str = Header(None, alias="X-AWS-Access-Key"),
+    aws_secret_key: str = Header(None, alias="X-AWS-Secret-Key")
+) -> MultipartInitiateResponse:
+    """Start a multipart upload the client sends directly to S3 with presigned part URLs"""
+    request_id = get_request_id()
+    settings = resolve_settings(aws_access_key, aws_secret_key)
+    
+    target_bucket = upload.bucket_name or settings.s3_bucket_name
     if not target_bucket:
         raise HTTPException(status_code=400, detail="Bucket name not provided and S3_BUCKET_NAME not configured")
     
-    if not file.filename:
+    if not upload.filename:
         raise HTTPException(status_code=400, detail="File must have a name")
     
-    # Validate file size
-    file_content = await file.read()
-    file_size = len(file_content)
-    
-    if file_size > settings.max_file_size:
+    if upload.file_size > settings.max_file_size:
         raise HTTPException(
             status_code=400,
-            detail=f"File size {file_size} exceeds maximum {settings.max_file_size}"
+            detail=f"File size {upload.file_size} exceeds maximum {settings.max_file_size}"
         )
     
-    if file_size == 0:
+    if upload.file_size <= 0:
         raise HTTPException(status_code=400, detail="File is empty")
     
-    # Validate MIME type
-    if file.content_type and file.content_type not in settings.allowed_mime_types:
+    if upload.content_type and upload.content_type not in settings.allowed_mime_types:
         raise HTTPException(
             status_code=400,
-            detail=f"File type {file.content_type} not allowed"
+            detail=f"File type {upload.content_type} not allowed"
         )
     
-    StructuredLogger.log_upload_start(request_id, file.filename, file_size)
+    s3_key = build_upload_key(upload.upload_path, upload.filename)
+    part_size = choose_part_size(upload.file_size, settings.upload_part_size)
     
-    # Generate S3 key with upload path (without request_id in path)
-    s3_key = f"{upload_path.rstrip('/')}/{file.filename}" if upload_path else f"uploads/{file.filename}"
+    s3_client = AsyncS3Client(settings=settings)
+    try:
+        upload_id = await s3_client.create_multipart_upload(target_bucket, s3_key, request_id, upload.content_type)
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=f"Failed to initiate multipart upload: {str(e)}")
     
-    # Reset file pointer after reading
-    file.file.seek(0)
+    StructuredLogger.log_upload_start(request_id, upload.filename, upload.file_size)
+    part_count = -(-upload.file_size // part_size)
+    return MultipartInitiateResponse(
+        upload_id=upload_id,
+        bucket_name=target_bucket,
+        file_key=s3_key,
+        part_size=part_size,
+        part_count=part_count,
+        upload_token=multipart_upload_token(settings, upload_id, target_bucket, s3_key, part_count),
+        request_id=request_id
+    )
+
+@app.post("/multipart/{upload_id}/part-urls")
+async def get_multipart_part_urls(
+    upload_id: str,
+    request: MultipartPartUrlsRequest,
+    aws_access_key: str = Header(None, alias="X-AWS-Access-Key"),
+    aws_secret_key: str = Header(None, alias="X-AWS-Secret-Key")
+):
+    """Presign PUT URLs for a batch of part numbers, up to the part count granted by initiate"""
+    settings = resolve_settings(aws_access_key, aws_secret_key)
+    if not request.part_numbers or len(request.part_numbers) > MAX_PART_URLS_PER_REQUEST:
+        raise HTTPException(status_code=400, detail=f"Request between 1 and {MAX_PART_URLS_PER_REQUEST} part URLs")
+    expected_token = multipart_upload_token(settings, upload_id, request.bucket_name, request.file_key, request.part_count)
+    if not hmac.compare_digest(expected_token, request.upload_token):
+        raise HTTPException(status_code=403, detail="Invalid upload token")
+    part_limit = min(request.part_count, MAX_PARTS)
+    if any(n < 1 or n > part_limit for n in request.part_numbers):
+        raise HTTPException(status_code=400, detail=f"Part numbers must be between 1 and {part_limit}")
     
-    # Upload to S3
-    s3_client = S3Client(settings=settings)
-    result = s3_client.upload_file_to_bucket(file.file, target_bucket, s3_key, request_id)
+    s3_client = AsyncS3Client(settings=settings)
+    urls = [
+        {
+            "part_number": part_number,
+            "url": s3_client.generate_presigned_part_url(request.bucket_name, request.file_key, upload_id, part_number)
+        }
+        for part_number in request.part_numbers
+    ]
+    return {"upload_id": upload_id, "urls": urls}
+
+@app.get("/multipart/{upload_id}/parts")
+async def list_multipart_parts(
+    upload_id: str,
+    bucket_name: str,
+    file_key: str,
+    aws_access_key: str = Header(None, alias="X-AWS-Access-Key"),
+    aws_secret_key: str = Header(None, alias="X-AWS-Secret-Key")
+):
+    """List parts already uploaded, so an interrupted upload can resume"""
+    s3_client = AsyncS3Client(settings=resolve_settings(aws_access_key, aws_secret_key))
+    try:
+        parts = await s3_client.list_parts(bucket_name, file_key, upload_id)
+    except ClientError as e:
+        raise HTTPException(status_code=404, detail=f"Multipart upload not found: {str(e)}")
+    return {
+        "upload_id": upload_id,
+        "parts": [{"part_number": p["PartNumber"], "etag": p["ETag"], "size": p["Size"]} for p in parts]
+    }
+
+@app.post("/multipart/{upload_id}/complete")
+async def complete_multipart(
+    upload_id: str,
+    request: MultipartCompleteRequest,
+    aws_access_key: str = Header(None, alias="X-AWS-Access-Key"),
+    aws_secret_key: str = Header(None, alias="X-AWS-Secret-Key")
+) -> UploadResponse:
+    """Complete a direct-to-S3 multipart upload from the part ETags.
+
+    The size of the parts actually in S3 is checked against ``max_file_size``
+    first; oversized uploads are aborted.
+    """
+    request_id = get_request_id()
+    if not request.parts:
+        raise HTTPException(status_code=400, detail="No parts provided")
     
-    if result["success"]:
-        presigned_url = s3_client.generate_presigned_url_for_bucket(target_bucket, s3_key)
-        return UploadResponse(
-            success=True,
-            file_key=s3_key,
-            request_id=request_id,
-            presigned_url=presigned_url
+    settings = resolve_settings(aws_access_key, aws_secret_key)
+    s3_client = AsyncS3Client(settings=settings)
+    try:
+        uploaded = {p["PartNumber"]: p["Size"] for p in await s3_client.list_parts(request.bucket_name, request.file_key, upload_id)}
+    except CircuitOpenError:
+        raise
+    except ClientError as e:
+        raise HTTPException(status_code=404, detail=f"Multipart upload not found: {str(e)}")
+    total_size = sum(uploaded.get(part.part_number, 0) for part in request.parts)
+    if total_size > settings.max_file_size:
+        await s3_client.abort_multipart_upload(request.bucket_name, request.file_key, upload_id)
+        StructuredLogger.log_upload_error(request_id, request.file_key, f"{total_size} bytes exceeds the maximum")
+        raise HTTPException(
+            status_code=400,
+            detail=f"File size {total_size} exceeds maximum {settings.max_file_size}; the upload was aborted"
         )
-    else:
-        raise HTTPException(status_code=500, detail=result.get("error", "Upload failed"))
+    
+    parts = [{"PartNumber": part.part_number, "ETag": part.etag} for part in request.parts]
+    try:
+        await s3_client.complete_multipart_upload(request.bucket_name, request.file_key, upload_id, parts)
+    except ClientError as e:
+        StructuredLogger.log_upload_error(request_id, request.file_key, str(e))
+        raise HTTPException(status_code=400, detail=f"Failed to complete multipart upload: {str(e)}")
+    
+    StructuredLogger.log_upload_success(request_id, request.file_key, request.file_key)
+    return UploadResponse(
+        success=True,
+        file_key=request.file_key,
+        request_id=request_id,
+        presigned_url=s3_client.generate_presigned_url_for_bucket(request.bucket_name, request.file_key)
+    )
+
+@app.delete("/multipart/{upload_id}")
+async def abort_multipart(
+    upload_id: str,
+    bucket_name: str,
+    file_key: str,
+    aws_access_key: str = Header(None, alias="X-AWS-Access-Key"),
+    aws_secret_key: str = Header(None, alias="X-AWS-Secret-Key")
+):
+    """Abort a multipart upload and discard its parts"""
+    s3_client = AsyncS3Client(settings=resolve_settings(aws_access_key, aws_secret_key))
+    aborted = await s3_client.abort_multipart_upload(bucket_name, file_key, upload_id)
+    if not aborted:
+        raise HTTPException(status_code=500, detail="Failed to abort multipart upload")
+    return {"success": True, "upload_id": upload_id}
 
 @app.get("/buckets")
 async def list_buckets(
@@ -109,41 +744,125 @@ async def list_buckets(
     aws_secret_key: str = Header(None, alias="X-AWS-Secret-Key")
 ):
     """List all S3 buckets"""
-    # Use provided credentials or fall back to settings
-    access_key = aws_access_key or get_settings().aws_access_key_id
-    secret_key = aws_secret_key or get_settings().aws_secret_access_key
-    
-    if not access_key or not secret_key:
-        raise HTTPException(status_code=400, detail="AWS credentials not provided")
-    
-    s3_client = S3Client(settings=get_settings().model_copy(update={
-        "aws_access_key_id": access_key,
-        "aws_secret_access_key": secret_key
-    }))
-    buckets = s3_client.list_buckets()
+    s3_client = AsyncS3Client(settings=resolve_settings(aws_access_key, aws_secret_key))
+    buckets = await s3_client.list_buckets()
     return {"buckets": buckets}
 
 @app.get("/buckets/{bucket_name}/objects")
 async def list_bucket_objects(
     bucket_name: str,
     prefix: str = "",
+    page_size: int = Query(1000, ge=1, le=1000),
+    continuation_token: str = None,
+    stream: bool = False,
     aws_access_key: str = Header(None, alias="X-AWS-Access-Key"),
     aws_secret_key: str = Header(None, alias="X-AWS-Secret-Key")
 ):
-    """List objects in a specific bucket"""
-    # Use provided credentials or fall back to settings
-    access_key = aws_access_key or get_settings().aws_access_key_id
-    secret_key = aws_secret_key or get_settings().aws_secret_access_key
+    """List objects in a specific bucket, one page at a time or as an NDJSON stream"""
+    s3_client = AsyncS3Client(settings=resolve_settings(aws_access_key, aws_secret_key))
+    # Fetch the first page up front so errors still produce a proper status code
+    first_page = await s3_client.list_objects(bucket_name, prefix, "/", page_size, continuation_token)
+    if not stream:
+        return first_page
     
-    if not access_key or not secret_key:
-        raise HTTPException(status_code=400, detail="AWS credentials not provided")
+    return StreamingResponse(
+        iter_listing_ndjson(s3_client, bucket_name, prefix, page_size, first_page),
+        media_type="application/x-ndjson"
+    )
+
+async def iter_listing_ndjson(s3_client: AsyncS3Client, bucket_name: str, prefix: str, page_size: int, first_page: dict):
+    """Emit folders and files one JSON object per line while walking every page"""
+    page = first_page
+    count = 0
+    while True:
+        for folder in page["folders"]:
+            yield json.dumps({"type": "folder", **folder}) + "\n"
+        for file in page["files"]:
+            yield json.dumps({"type": "file", **file}) + "\n"
+        count += len(page["folders"]) + len(page["files"])
+        if not page["next_token"]:
+            break
+        try:
+            # Full walks bypass the cache so they don't evict interactive listings
+            page = await s3_client.list_objects(bucket_name, prefix, "/", page_size, page["next_token"], use_cache=False)
+        except HTTPException as e:
+            yield json.dumps({"type": "error", "detail": e.detail}) + "\n"
+            return
+    yield json.dumps({"type": "end", "count": count}) + "\n"
+
+@app.get("/buckets/{bucket_name}/usage")
+async def get_prefix_usage(
+    bucket_name: str,
+    prefix: str = "",
+    max_depth: int = Query(1, ge=0),
+    stream: bool = False,
+    refresh: bool = False,
+    aws_access_key: str = Header(None, alias="X-AWS-Access-Key"),
+    aws_secret_key: str = Header(None, alias="X-AWS-Secret-Key")
+):
+    """Object count and bytes under a prefix, with a per-sub-prefix breakdown down to ``max_depth``.
+
+    Sub-prefixes are listed concurrently. With ``stream=true`` running
+    totals and each finished sub-prefix are sent as NDJSON before the final
+    ``done`` line. Results are reused for ``prefix_usage_cache_ttl`` seconds
+    unless ``refresh=true``.
+    """
+    settings = resolve_settings(aws_access_key, aws_secret_key)
+    if max_depth > settings.prefix_usage_max_depth:
+        raise HTTPException(status_code=400, detail=f"max_depth is limited to {settings.prefix_usage_max_depth}")
+    s3_client = AsyncS3Client(settings=settings)
+    cache = get_listing_cache()
+    cache_key = (credentials_fingerprint(settings), USAGE, bucket_name, prefix, max_depth)
     
-    s3_client = S3Client(settings=get_settings().model_copy(update={
-        "aws_access_key_id": access_key,
-        "aws_secret_access_key": secret_key
-    }))
-    objects = s3_client.list_objects(bucket_name, prefix)
-    return objects
+    usage = cache.get(cache_key) if not refresh and settings.prefix_usage_cache_ttl > 0 else None
+    if usage is not None:
+        usage = {**usage, "cached": True}
+        if stream:
+            return StreamingResponse(iter([json.dumps(usage) + "\n"]), media_type="application/x-ndjson")
+        return usage
+    
+    events = prefix_usage(s3_client, bucket_name, prefix, max_depth, settings.prefix_usage_concurrency)
+    try:
+        # Wait for the first listing page so errors still produce a proper status code
+        first_event = await events.__anext__()
+    except CircuitOpenError:
+        raise
+    except ClientError as e:
+        error_code = e.response.get("Error", {}).get("Code", "Unknown")
+        status_code = {"NoSuchBucket": 404, "AccessDenied": 403}.get(error_code, 500)
+        raise HTTPException(status_code=status_code, detail=f"Failed to list objects: {e}")
+    
+    async def remember(event: dict):
+        if event["type"] == "done":
+            event.pop("type")
+            if settings.prefix_usage_cache_ttl > 0:
+                cache.set(cache_key, event, ttl=settings.prefix_usage_cache_ttl)
+    
+    if stream:
+        return StreamingResponse(iter_usage_ndjson(first_event, events, remember), media_type="application/x-ndjson")
+    
+    event = first_event
+    try:
+        while event["type"] != "done":
+            event = await events.__anext__()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to compute usage: {str(e)}")
+    await remember(event)
+    return {**event, "cached": False}
+
+async def iter_usage_ndjson(first_event: dict, events, remember):
+    """Emit usage events one JSON object per line; the last one is the full result"""
+    event = first_event
+    try:
+        while True:
+            if event["type"] == "done":
+                await remember(event)
+                yield json.dumps({"type": "done", **event, "cached": False}) + "\n"
+                return
+            yield json.dumps(event) + "\n"
+            event = await events.__anext__()
+    except Exception as e:
+        yield json.dumps({"type": "error", "error": str(e)}) + "\n"
 
 @app.get("/config")
 async def get_config():
@@ -156,82 +875,502 @@ async def get_config():
         "aws_region": settings.aws_region
     }
 
+metrics_registry.register(CallbackMetric(
+    "listing_cache_lookups_total",
+    "Listing and metadata cache lookups",
+    lambda: {("hit",): get_listing_cache().hits, ("miss",): get_listing_cache().misses},
+    ("result",),
+    type_name="counter"
+))
+metrics_registry.register(CallbackMetric(
+    "s3_pooled_clients",
+    "S3 clients held in the client registry",
+    lambda: {(): len(get_client_registry())}
+))
+
+def download_cache_lookups() -> dict:
+    object_cache = get_object_cache()
+    if object_cache is None:
+        return {}
+    return {("hit",): object_cache.hits, ("miss",): object_cache.misses, ("coalesced",): object_cache.coalesced}
+
+metrics_registry.register(CallbackMetric(
+    "download_cache_lookups_total",
+    "Download cache lookups; coalesced misses waited for another request's fetch",
+    download_cache_lookups,
+    ("result",),
+    type_name="counter"
+))
+metrics_registry.register(CallbackMetric(
+    "download_cache_bytes",
+    "Object bytes held in the on-disk download cache",
+    lambda: {(): get_object_cache().stats()["bytes"]} if get_object_cache() is not None else {}
+))
+CIRCUIT_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+metrics_registry.register(CallbackMetric(
+    "s3_circuit_state",
+    "Per-bucket throttling circuit: 0 closed, 1 half-open, 2 open",
+    lambda: {(bucket,): CIRCUIT_STATE_VALUES[state] for bucket, state in get_retry_policy().circuit_states().items()},
+    ("bucket",)
+))
+metrics_registry.register(CallbackMetric(
+    "s3_retry_budget_tokens",
+    "Retry tokens left in this worker's retry budget",
+    lambda: {(): get_retry_policy().budget.tokens}
+))
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics in text exposition format"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Hit/miss counters for the listing and metadata cache, and the download cache when enabled"""
+    stats = get_listing_cache().stats()
+    object_cache = get_object_cache()
+    if object_cache is not None:
+        stats["downloads"] = object_cache.stats()
+    return stats
+
+@app.get("/retry/stats")
+async def get_retry_stats():
+    """Retry budget and the circuits of buckets that are or were recently throttled"""
+    return get_retry_policy().stats()
+
 @app.get("/download/{bucket_name}/{file_key:path}")
 async def download_file(
     bucket_name: str,
     file_key: str,
+    range_header: str = Header(None, alias="Range"),
+    if_none_match: str = Header(None, alias="If-None-Match"),
+    if_modified_since: str = Header(None, alias="If-Modified-Since"),
+    accept_encoding: str = Header(None, alias="Accept-Encoding"),
     aws_access_key: str = Header(None, alias="X-AWS-Access-Key"),
     aws_secret_key: str = Header(None, alias="X-AWS-Secret-Key")
 ):
-    """Download file from S3"""
-    # Use provided credentials or fall back to settings
-    access_key = aws_access_key or get_settings().aws_access_key_id
-    secret_key = aws_secret_key or get_settings().aws_secret_access_key
+    """Download file from S3, streaming the body with Range and conditional GET support.
+
+    Objects stored with a Content-Encoding are sent as stored to clients that
+    accept the encoding, and decompressed on the fly for those that don't.
+    """
+    settings = resolve_settings(aws_access_key, aws_secret_key)
     
-    if not access_key or not secret_key:
-        raise HTTPException(status_code=400, detail="AWS credentials not provided")
+    s3_client = AsyncS3Client(settings=settings)
     
-    settings = get_settings().model_copy(update={
-        "aws_access_key_id": access_key,
-        "aws_secret_access_key": secret_key
-    })
+    # Decoded responses carry a weak ETag; S3 only knows the strong one
+    if if_none_match:
+        if_none_match = ", ".join(entity_tags(if_none_match)) or None
+    
+    modified_since = None
+    if if_modified_since and not if_none_match:
+        try:
+            modified_since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            modified_since = None
     
-    s3_client = S3Client(settings=settings)
+    object_cache = get_object_cache()
+    if object_cache is not None and not range_header:
+        cached = await serve_from_cache(
+            s3_client, object_cache, bucket_name, file_key, accept_encoding, if_none_match, modified_since
+        )
+        if cached is not None:
+            return cached
     
     try:
-        # Get file from S3
-        file_data = s3_client.download_file(bucket_name, file_key)
-        
-        # Get content type from S3 object metadata
-        metadata = s3_client.get_object_metadata(bucket_name, file_key)
-        content_type = metadata.get('ContentType', 'application/octet-stream')
-        
-        return StreamingResponse(
-            io.BytesIO(file_data),
-            media_type=content_type,
-            headers={"Content-Disposition": f"attachment; filename={file_key.split('/')[-1]}"}
+        # A single GET gives us the body and all headers; no separate HEAD request
+        response = await s3_client.get_object(
+            bucket_name,
+            file_key,
+            byte_range=range_header,
+            if_none_match=if_none_match,
+            if_modified_since=modified_since,
         )
+    except CircuitOpenError:
+        raise
+    except ClientError as e:
+        status = e.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+        if status == 304:
+            etag = e.response.get("ResponseMetadata", {}).get("HTTPHeaders", {}).get("etag")
+            return Response(status_code=304, headers={"ETag": etag} if etag else {})
+        if status == 416:
+            raise HTTPException(status_code=416, detail=f"Requested range not satisfiable: {range_header}")
+        raise HTTPException(status_code=404, detail=f"File not found: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"File not found: {str(e)}")
+    
+    # Also checked here in case the store only matched single tags, not the whole list
+    if if_none_match and not_modified(response, if_none_match):
+        response["Body"].close()
+        return Response(status_code=304, headers={"ETag": response["ETag"]})
+    
+    open_body = functools.partial(s3_client.iter_body, response["Body"], settings.download_chunk_size)
+    return build_download_response(file_key, response, open_body, accept_encoding)
+
+def build_download_response(file_key: str, metadata: dict, open_body, accept_encoding: str = None) -> StreamingResponse:
+    """Stream an object body with the headers S3 gave for it (a get_object response or cached copy).
+
+    ``open_body(encoding=None)`` returns the chunk iterator, decoding the
+    stored body when given its encoding.
+    """
+    headers = {
+        "Content-Disposition": f"attachment; filename={file_key.split('/')[-1]}",
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(metadata["ContentLength"]),
+    }
+    if metadata.get("ETag"):
+        headers["ETag"] = metadata["ETag"]
+    if metadata.get("LastModified"):
+        headers["Last-Modified"] = format_datetime(metadata["LastModified"].astimezone(timezone.utc), usegmt=True)
+    if metadata.get("ContentRange"):
+        headers["Content-Range"] = metadata["ContentRange"]
+    
+    encoding = metadata.get("ContentEncoding")
+    decode = None
+    if encoding:
+        headers["Vary"] = "Accept-Encoding"
+        # Ranges address the stored bytes, so partial responses are always sent encoded
+        if accepts_encoding(accept_encoding, encoding) or metadata.get("ContentRange") \
+                or encoding not in supported_encodings():
+            headers["Content-Encoding"] = encoding
+        else:
+            decode = encoding
+            del headers["Content-Length"]
+            headers["Accept-Ranges"] = "none"
+            if "ETag" in headers:
+                headers["ETag"] = "W/" + headers["ETag"]
+    
+    return StreamingResponse(
+        open_body(encoding=decode),
+        status_code=206 if metadata.get("ContentRange") else 200,
+        media_type=metadata.get("ContentType") or "application/octet-stream",
+        headers=headers
+    )
+
+def entity_tags(if_none_match: str) -> list:
+    """The tags in an If-None-Match list, with W/ dropped since If-None-Match compares weakly"""
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return [tag[2:] if tag.startswith("W/") else tag for tag in tags if tag]
+
+def not_modified(metadata: dict, if_none_match: str = None, modified_since=None) -> bool:
+    """Whether the client's conditional headers match this object version"""
+    if if_none_match:
+        tags = entity_tags(if_none_match)
+        return "*" in tags or metadata.get("ETag") in tags
+    if modified_since and metadata.get("LastModified"):
+        try:
+            return metadata["LastModified"] <= modified_since
+        except TypeError:  # naive date from the client
+            return False
+    return False
+
+async def serve_from_cache(s3_client: AsyncS3Client, object_cache: ObjectCache, bucket_name: str, file_key: str,
+                           accept_encoding: str = None, if_none_match: str = None, modified_since=None) -> Response:
+    """Serve a download through the on-disk object cache.
+
+    A cached body is revalidated with a GET conditional on its ETag, which
+    S3 answers with a bodiless 304 while it is current; only then is it
+    served from the local file. Misses download the whole object into the
+    cache first, one S3 fetch per object however many requests want it.
+    Returns None when the caller should go to S3 directly, e.g. on errors.
+    """
+    entry = object_cache.get(bucket_name, file_key)
+    response = None
+    try:
+        if entry is not None:
+            try:
+                response = await s3_client.get_object(bucket_name, file_key, if_none_match=entry.etag)
+            except ClientError as e:
+                if e.response.get("ResponseMetadata", {}).get("HTTPStatusCode") != 304:
+                    raise
+                object_cache.hits += 1
+            else:
+                # Changed since it was cached; the response already holds the new version
+                entry = None
+                await s3_client.run(object_cache.remove, bucket_name, file_key)
+        
+        if entry is None:
+            object_cache.misses += 1
+            if response is not None:
+                result = await download_to_cache(s3_client, object_cache, bucket_name, file_key, response)
+            else:
+                async def load():
+                    fresh = await s3_client.get_object(bucket_name, file_key)
+                    return await download_to_cache(s3_client, object_cache, bucket_name, file_key, fresh)
+                
+                result = await object_cache.fetch((credentials_fingerprint(s3_client.settings), bucket_name, file_key), load)
+            if result is None:
+                return None
+            if not isinstance(result, CachedObject):
+                # Too large to cache: stream the response this request already opened
+                if not_modified(result, if_none_match, modified_since):
+                    result["Body"].close()
+                    return Response(status_code=304, headers={"ETag": result["ETag"]})
+                open_body = functools.partial(s3_client.iter_body, result["Body"], s3_client.settings.download_chunk_size)
+                return build_download_response(file_key, result, open_body, accept_encoding)
+            entry = result
+    except CircuitOpenError:
+        raise
+    except ClientError:
+        await s3_client.run(object_cache.remove, bucket_name, file_key)
+        return None
+    
+    if not_modified(entry.metadata, if_none_match, modified_since):
+        return Response(status_code=304, headers={"ETag": entry.etag})
+    try:
+        # Held open while streaming, so eviction can't pull the file from under the response
+        f = await s3_client.run(open, entry.path, "rb")
+    except FileNotFoundError:
+        return None
+    open_body = functools.partial(iter_file, s3_client, f, s3_client.settings.download_chunk_size)
+    return build_download_response(file_key, entry.metadata, open_body, accept_encoding)
+
+@app.post("/archive/{bucket_name}")
+async def download_archive(
+    bucket_name: str,
+    archive: ArchiveRequest,
+    aws_access_key: str = Header(None, alias="X-AWS-Access-Key"),
+    aws_secret_key: str = Header(None, alias="X-AWS-Secret-Key")
+):
+    """Download many objects, or everything under a prefix, as a streamed ZIP archive"""
+    settings = resolve_settings(aws_access_key, aws_secret_key)
+    
+    if not archive.keys and not archive.prefix:
+        raise HTTPException(status_code=400, detail="Provide keys or a non-empty prefix")
+    
+    s3_client = AsyncS3Client(settings=settings)
+    if archive.prefix:
+        keys = s3_client.iter_object_keys(bucket_name, archive.prefix)
+        default_name = archive.prefix.rstrip("/").split("/")[-1]
+    else:
+        keys = archive.keys
+        default_name = bucket_name
+    archive_name = archive.archive_name or f"{default_name}.zip"
+    
+    return StreamingResponse(
+        stream_zip_archive(
+            s3_client,
+            bucket_name,
+            keys,
+            strip_prefix=archive.prefix or "",
+            chunk_size=settings.download_chunk_size,
+            prefetch=settings.archive_prefetch
+        ),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={archive_name}"}
+    )
+
+@app.post("/copy/{bucket_name}")
+async def copy_objects(
+    bucket_name: str,
+    request: CopyRequest,
+    stream: bool = False,
+    aws_access_key: str = Header(None, alias="X-AWS-Access-Key"),
+    aws_secret_key: str = Header(None, alias="X-AWS-Secret-Key")
+):
+    """Server-side copy of a key or a whole prefix"""
+    return await run_copy(bucket_name, request, False, stream, resolve_settings(aws_access_key, aws_secret_key))
+
+@app.post("/move/{bucket_name}")
+async def move_objects(
+    bucket_name: str,
+    request: CopyRequest,
+    stream: bool = False,
+    aws_access_key: str = Header(None, alias="X-AWS-Access-Key"),
+    aws_secret_key: str = Header(None, alias="X-AWS-Secret-Key")
+):
+    """Server-side move/rename of a key or a whole prefix: copy, then batch-delete the sources"""
+    return await run_copy(bucket_name, request, True, stream, resolve_settings(aws_access_key, aws_secret_key))
+
+async def run_copy(bucket_name: str, request: CopyRequest, move: bool, stream: bool, settings):
+    s3_client = AsyncS3Client(settings=settings)
+    destination_bucket = request.destination_bucket or bucket_name
+    
+    if request.source_key:
+        if not request.destination_key:
+            raise HTTPException(status_code=400, detail="destination_key is required when copying a key")
+        if destination_bucket == bucket_name and request.destination_key == request.source_key:
+            raise HTTPException(status_code=400, detail="Source and destination are the same object")
+        try:
+            result = await copy_object(s3_client, bucket_name, request.source_key, destination_bucket, request.destination_key)
+            if move:
+                await s3_client.delete_object(bucket_name, request.source_key)
+        except ClientError as e:
+            status = e.response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+            raise HTTPException(status_code=404 if status == 404 else 500, detail=f"Copy failed: {str(e)}")
+        return {"success": True, "moved": move, **result}
+    
+    if not request.source_prefix or request.destination_prefix is None:
+        raise HTTPException(status_code=400, detail="Provide source_key/destination_key or source_prefix/destination_prefix")
+    if destination_bucket == bucket_name and request.destination_prefix.startswith(request.source_prefix):
+        raise HTTPException(status_code=400, detail="Destination prefix must not be inside the source prefix")
+    
+    events = copy_prefix(
+        s3_client, bucket_name, request.source_prefix, destination_bucket, request.destination_prefix, move=move
+    )
+    if stream:
+        return StreamingResponse(iter_copy_ndjson(events), media_type="application/x-ndjson")
+    
+    errors = []
+    summary = None
+    try:
+        async for event in events:
+            if event["type"] == "error":
+                errors.append({"key": event["key"], "error": event["error"]})
+            elif event["type"] == "done":
+                summary = event
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Copy failed: {str(e)}")
+    summary.pop("type")
+    return {"success": not errors, "moved": move, **summary, "errors": errors}
+
+async def iter_copy_ndjson(events):
+    """Emit copy progress events one JSON object per line"""
+    try:
+        async for event in events:
+            yield json.dumps(event) + "\n"
+    except Exception as e:
+        yield json.dumps({"type": "error", "error": str(e)}) + "\n"
+
+@app.post("/dedup/rebuild/{bucket_name}")
+async def rebuild_dedup_index(
+    bucket_name: str,
+    prefix: str = "",
+    aws_access_key: str = Header(None, alias="X-AWS-Access-Key"),
+    aws_secret_key: str = Header(None, alias="X-AWS-Secret-Key")
+):
+    """Refresh the deduplication index from the content hashes in object metadata.
+
+    Only new or changed objects are read, so this can be re-run cheaply.
+    """
+    settings = resolve_settings(aws_access_key, aws_secret_key)
+    if not settings.dedup_enabled:
+        raise HTTPException(status_code=400, detail="Deduplication is not enabled")
+    
+    s3_client = AsyncS3Client(settings=settings)
+    index = get_dedup_index()
+    try:
+        totals = await rebuild_index(s3_client, index, bucket_name, prefix, settings.dedup_rebuild_concurrency)
+    except ClientError as e:
+        error_code = e.response.get("Error", {}).get("Code", "Unknown")
+        status_code = {"NoSuchBucket": 404, "AccessDenied": 403}.get(error_code, 500)
+        raise HTTPException(status_code=status_code, detail=f"Failed to rebuild index: {error_code}")
+    return {"success": True, **totals, "index": index.stats()}
+
+@app.get("/search/{bucket_name}")
+async def search_keys(
+    bucket_name: str,
+    q: str = None,
+    glob: str = None,
+    prefix: str = "",
+    limit: int = Query(100, ge=1, le=1000),
+    continuation_token: str = None,
+    aws_access_key: str = Header(None, alias="X-AWS-Access-Key"),
+    aws_secret_key: str = Header(None, alias="X-AWS-Secret-Key")
+):
+    """Find keys by substring (``q``, case-insensitive) or glob pattern in the local key index.
+
+    The first search in a bucket lists it into the index. After that
+    results come from the index alone, and a bucket last refreshed more
+    than ``key_index_refresh_interval`` seconds ago is refreshed in the
+    background.
+    """
+    settings = resolve_settings(aws_access_key, aws_secret_key)
+    index = get_key_index()
+    if index is None:
+        raise HTTPException(status_code=400, detail="Key search is not enabled")
+    if (q is None) == (glob is None):
+        raise HTTPException(status_code=400, detail="Provide either q or glob")
+    
+    s3_client = AsyncS3Client(settings=settings)
+    # The index is shared between credentials: a cached one-key listing checks this caller may list the bucket
+    await s3_client.list_objects(bucket_name, "", "/", 1)
+    
+    refreshed = index.refreshed_at(bucket_name)
+    if refreshed is None:
+        await refresh_bucket_index(s3_client, index, bucket_name, settings)
+    elif settings.key_index_refresh_interval > 0 and bucket_name not in index.refreshing \
+            and time.time() - refreshed > settings.key_index_refresh_interval:
+        index.refreshing.add(bucket_name)
+        task = asyncio.create_task(refresh_in_background(s3_client, index, bucket_name, settings))
+        background_refreshes.add(task)
+        task.add_done_callback(background_refreshes.discard)
+    
+    result = await s3_client.run(index.search, bucket_name, q, glob, prefix, limit, continuation_token)
+    return {
+        "bucket": bucket_name,
+        **result,
+        "indexed_at": datetime.fromtimestamp(index.refreshed_at(bucket_name), timezone.utc).isoformat(),
+        "refreshing": bucket_name in index.refreshing,
+    }
+
+@app.post("/search/{bucket_name}/refresh")
+async def refresh_search_index(
+    bucket_name: str,
+    aws_access_key: str = Header(None, alias="X-AWS-Access-Key"),
+    aws_secret_key: str = Header(None, alias="X-AWS-Secret-Key")
+):
+    """List the bucket into the key index now; only new, changed and removed keys are written"""
+    settings = resolve_settings(aws_access_key, aws_secret_key)
+    index = get_key_index()
+    if index is None:
+        raise HTTPException(status_code=400, detail="Key search is not enabled")
+    totals = await refresh_bucket_index(AsyncS3Client(settings=settings), index, bucket_name, settings)
+    return {"success": True, **totals, "index": index.stats()}
+
+# Running background refreshes, referenced so they aren't garbage collected mid-run
+background_refreshes = set()
+
+async def refresh_in_background(s3_client: AsyncS3Client, index, bucket_name: str, settings):
+    try:
+        await refresh_key_index(s3_client, index, bucket_name, settings.key_index_concurrency)
+    except Exception as e:
+        logger.warning(f"Background refresh of the key index for {bucket_name} failed: {e}")
+
+async def refresh_bucket_index(s3_client: AsyncS3Client, index, bucket_name: str, settings) -> dict:
+    try:
+        return await refresh_key_index(s3_client, index, bucket_name, settings.key_index_concurrency)
+    except CircuitOpenError:
+        raise
+    except ClientError as e:
+        error_code = e.response.get("Error", {}).get("Code", "Unknown")
+        status_code = {"NoSuchBucket": 404, "AccessDenied": 403}.get(error_code, 500)
+        raise HTTPException(status_code=status_code, detail=f"Failed to index bucket: {error_code}")
 
 @app.delete("/delete/{bucket_name}")
 async def delete_files(
     bucket_name: str,
-    file_keys: list = Body(...),
+    file_keys: list = Body(None),
+    prefix: str = None,
     aws_access_key: str = Header(None, alias="X-AWS-Access-Key"),
     aws_secret_key: str = Header(None, alias="X-AWS-Secret-Key")
 ):
-    """Delete multiple files from S3"""
-    # Use provided credentials or fall back to settings
-    access_key = aws_access_key or get_settings().aws_access_key_id
-    secret_key = aws_secret_key or get_settings().aws_secret_access_key
-    
-    if not access_key or not secret_key:
-        raise HTTPException(status_code=400, detail="AWS credentials not provided")
+    """Delete multiple files from S3, or every file under a prefix"""
+    settings = resolve_settings(aws_access_key, aws_secret_key)
     
-    settings = get_settings().model_copy(update={
-        "aws_access_key_id": access_key,
-        "aws_secret_access_key": secret_key
-    })
+    if not file_keys and not prefix:
+        raise HTTPException(status_code=400, detail="Provide file keys in the body or a non-empty prefix")
     
-    s3_client = S3Client(settings=settings)
+    s3_client = AsyncS3Client(settings=settings)
     
     try:
-        deleted_files = []
-        failed_files = []
-        
-        for file_key in file_keys:
-            try:
-                s3_client.delete_object(bucket_name, file_key)
-                deleted_files.append(file_key)
-            except Exception as e:
-                failed_files.append({"key": file_key, "error": str(e)})
+        # Prefix mode streams the listing into the batch deleter page by page
+        keys = s3_client.iter_object_keys(bucket_name, prefix) if prefix else file_keys
+        result = await s3_client.delete_keys(
+            bucket_name,
+            keys,
+            concurrency=settings.delete_batch_concurrency
+        )
+        if settings.dedup_enabled and result["deleted"]:
+            await s3_client.run(get_dedup_index().remove, bucket_name, result["deleted"])
         
         return {
             "success": True,
-            "deleted": deleted_files,
-            "failed": failed_files
+            "deleted": result["deleted"],
+            "failed": result["failed"]
         }
+    except (HTTPException, CircuitOpenError):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Delete operation failed: {str(e)}")
 
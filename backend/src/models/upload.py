@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, List
 
 class UploadRequest(BaseModel):
     bucket_name: Optional[str] = None
@@ -10,3 +10,75 @@ class UploadResponse(BaseModel):
     error: Optional[str] = None
     request_id: str
     presigned_url: Optional[str] = None
+    deduplicated_from: Optional[str] = None
+    content_encoding: Optional[str] = None
+
+class UploadJobAccepted(BaseModel):
+    job_id: str
+    status: str
+    request_id: str
+    status_url: str
+
+class UploadJobStatus(BaseModel):
+    job_id: str
+    status: str
+    request_id: str
+    bucket_name: str
+    file_key: str
+    bytes_total: int
+    bytes_uploaded: int
+    created_at: float
+    updated_at: float
+    result: Optional[UploadResponse] = None
+    error: Optional[str] = None
+
+class BulkUploadResponse(BaseModel):
+    success: bool
+    uploaded: int
+    failed: int
+    results: List[UploadResponse]
+
+class MultipartInitiateRequest(BaseModel):
+    filename: str
+    file_size: int
+    content_type: Optional[str] = None
+    bucket_name: Optional[str] = None
+    upload_path: str = ""
+
+class MultipartInitiateResponse(BaseModel):
+    upload_id: str
+    bucket_name: str
+    file_key: str
+    part_size: int
+    part_count: int
+    upload_token: str
+    request_id: str
+
+class MultipartPartUrlsRequest(BaseModel):
+    bucket_name: str
+    file_key: str
+    part_numbers: List[int]
+    part_count: int
+    upload_token: str
+
+class MultipartPart(BaseModel):
+    part_number: int
+    etag: str
+    size: Optional[int] = None
+
+class MultipartCompleteRequest(BaseModel):
+    bucket_name: str
+    file_key: str
+    parts: List[MultipartPart]
+
+class ArchiveRequest(BaseModel):
+    keys: Optional[List[str]] = None
+    prefix: Optional[str] = None
+    archive_name: Optional[str] = None
+
+class CopyRequest(BaseModel):
+    source_key: Optional[str] = None
+    source_prefix: Optional[str] = None
+    destination_bucket: Optional[str] = None
+    destination_key: Optional[str] = None
+    destination_prefix: Optional[str] = None
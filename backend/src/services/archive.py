@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import zipfile
+from collections import deque
+from src.services.async_s3 import AsyncS3Client
+from src.services.compression import supported_encodings
+
+logger = logging.getLogger(__name__)
+
+# Already-compressed formats are stored as-is rather than deflated again
+STORED_CONTENT_TYPES = {"image/jpeg", "image/png", "image/gif", "application/zip", "application/gzip", "application/pdf"}
+
+
+class _ZipSink:
+    """Write-only file object that collects zipfile output until drained"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def archive_entry_name(key: str, strip_prefix: str = "") -> str:
+    """Relative ZIP entry name for a key, or "" if nothing safe is left.
+
+    S3 keys may contain ``..`` segments, a leading ``/`` or backslashes, which
+    would make extractors write outside the target directory. Those segments
+    are dropped rather than resolved.
+    """
+    name = key[len(strip_prefix):] if strip_prefix and key.startswith(strip_prefix) else key
+    parts = [part for part in name.replace("\\", "/").split("/") if part not in ("", ".", "..")]
+    return "/".join(parts)
+
+
+async def _iter_keys(keys):
+    if hasattr(keys, "__aiter__"):
+        async for key in keys:
+            yield key
+    else:
+        for key in keys:
+            yield key
+
+
+async def stream_zip_archive(s3_client: AsyncS3Client, bucket_name: str, keys, strip_prefix: str = "",
+                             chunk_size: int = 1024 * 1024, prefetch: int = 4):
+    """Yield a ZIP archive of S3 objects as it is written.
+
+    Up to ``prefetch`` upcoming objects are opened concurrently so S3 latency
+    overlaps with compressing and sending the current one. Object bodies are
+    read and compressed chunk by chunk on the S3 executor, so neither a whole
+    object nor the whole archive is ever held in memory. Zip64 extensions are
+    used automatically for large entries and archives. Objects that can't be
+    read, or whose key leaves no safe entry name, are listed in
+    ``ARCHIVE_ERRORS.txt`` at the end of the archive.
+    Objects stored compressed (Content-Encoding) are added decompressed.
+    """
+    sink = _ZipSink()
+    archive = zipfile.ZipFile(sink, mode="w", allowZip64=True)
+    key_iter = _iter_keys(keys).__aiter__()
+    window = deque()
+    keys_exhausted = False
+    errors = []
+
+    async def fill_window():
+        nonlocal keys_exhausted
+        while not keys_exhausted and len(window) < max(1, prefetch):
+            try:
+                key = await key_iter.__anext__()
+            except StopAsyncIteration:
+                keys_exhausted = True
+                break
+            if key.endswith("/"):
+                continue  # folder placeholder objects
+            name = archive_entry_name(key, strip_prefix)
+            if not name:
+                errors.append(f"{key}: no safe name for this key in an archive")
+                continue
+            window.append((key, name, asyncio.create_task(s3_client.get_object(bucket_name, key))))
+
+    try:
+        await fill_window()
+        while window:
+            key, name, opening = window.popleft()
+            await fill_window()
+            try:
+                response = await opening
+            except Exception as e:
+                logger.error(f"Skipping {key} in archive: {e}")
+                errors.append(f"{key}: {e}")
+                continue
+
+            info = zipfile.ZipInfo(name, date_time=response["LastModified"].timetuple()[:6])
+            info.compress_type = (zipfile.ZIP_STORED if response.get("ContentType") in STORED_CONTENT_TYPES
+                                  else zipfile.ZIP_DEFLATED)
+            encoding = response.get("ContentEncoding")
+            if encoding in supported_encodings():
+                body = s3_client.iter_body(response["Body"], chunk_size, encoding=encoding)
+                # The decoded size isn't known up front, so always leave room for Zip64
+                entry = archive.open(info, mode="w", force_zip64=True)
+            else:
+                body = s3_client.iter_body(response["Body"], chunk_size)
+                info.file_size = response["ContentLength"]  # lets zipfile decide on Zip64 up front
+                entry = archive.open(info, mode="w")
+            try:
+                async for chunk in body:
+                    await s3_client.run(entry.write, chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            finally:
+                await s3_client.run(entry.close)
+            data = sink.drain()
+            if data:
+                yield data
+
+        if errors:
+            archive.writestr("ARCHIVE_ERRORS.txt", "\n".join(errors) + "\n")
+        archive.close()
+        yield sink.drain()
+    finally:
+        for _, _, opening in window:
+            if opening.done() and not opening.cancelled() and opening.exception() is None:
+                opening.result()["Body"].close()
+            else:
+                opening.cancel()
@@ -0,0 +1,371 @@
+import asyncio
+import functools
+import os
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from config import get_settings
+from src.services.s3_uploader import (
+    S3Client, credentials_fingerprint, build_transfer_config, stream_size, buckets_error, listing_error, failed_batch,
+    DEFAULT_METADATA,
+)
+from src.services.retry_policy import CircuitOpenError, get_retry_policy
+from src.services.transfer_tuning import get_transfer_tuner
+from src.services.listing_cache import get_listing_cache, BUCKETS, OBJECTS, METADATA
+from src.services.key_index import get_key_index
+from src.services.compression import open_decompressed
+from src.utils.logger import StructuredLogger, timed
+from src.utils.metrics import TRANSFER_BYTES, TRANSFERS_IN_FLIGHT
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_s3_executor() -> ThreadPoolExecutor:
+    """Get the bounded thread pool that runs blocking boto3 calls"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=get_settings().s3_executor_max_workers,
+                    thread_name_prefix="s3-io",
+                )
+    return _executor
+
+def shutdown_s3_executor():
+    """Stop the S3 executor; a new one is created on next use"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+
+
+class AsyncS3Client:
+    """Awaitable facade over S3Client.
+
+    Blocking boto3 calls run on a bounded executor shared by the whole
+    worker, and transient-error backoff under the shared RetryPolicy uses
+    ``asyncio.sleep`` so retries never stall the event loop or hold an
+    executor thread. The executor size caps how many S3 calls a worker
+    keeps in flight at once.
+
+    Bucket lists, listing pages and object metadata are served from the
+    shared ListingCache, and writes made through this facade invalidate
+    the affected entries. They also update the key search index for
+    buckets that have been indexed.
+    """
+
+    def __init__(self, client: S3Client = None, settings=None):
+        self.client = client or S3Client(settings=settings)
+        self.settings = self.client.settings
+        self.cache = get_listing_cache()
+        self._cache_scope = credentials_fingerprint(self.settings) if self.settings is not None else None
+
+    async def run(self, func, *args, **kwargs):
+        """Run a blocking callable on the S3 executor"""
+        loop = asyncio.get_running_loop()
+        with timed("s3"):
+            return await loop.run_in_executor(get_s3_executor(), functools.partial(func, *args, **kwargs))
+
+    async def _run_with_retries(self, func, bucket_name: str, description: str, *args, max_retries: int = 3, **kwargs):
+        """Run a single-attempt S3Client call, retrying transient errors with async backoff"""
+        return await get_retry_policy().call_async(
+            lambda: self.run(func, *args, max_retries=0, **kwargs),
+            bucket_name, func.__name__, description, max_retries, circuit_applied=True,
+        )
+
+    async def _index_object(self, bucket_name: str, file_key: str, size: int = None, etag: str = None):
+        """Record a written key in the search index; a HEAD fills in the size when it isn't known"""
+        index = get_key_index()
+        if index is None or index.refreshed_at(bucket_name) is None:
+            return
+        try:
+            last_modified = time.time()
+            if size is None:
+                head = await self.head_object(bucket_name, file_key)
+                size, etag, last_modified = head["ContentLength"], head.get("ETag"), head["LastModified"].timestamp()
+            await self.run(index.record, bucket_name, file_key, size, last_modified, (etag or "").strip('"') or None)
+        except Exception as e:
+            # The next refresh picks the key up
+            logger.warning(f"Failed to index {bucket_name}/{file_key}: {e}")
+
+    async def _unindex_objects(self, bucket_name: str, file_keys: list):
+        index = get_key_index()
+        if index is None or index.refreshed_at(bucket_name) is None or not file_keys:
+            return
+        try:
+            await self.run(index.remove, bucket_name, file_keys)
+        except Exception as e:
+            logger.warning(f"Failed to remove {len(file_keys)} keys from the index of {bucket_name}: {e}")
+
+    async def upload_file_to_bucket(self, file_obj, bucket_name: str, file_key: str, request_id: str, max_retries: int = 3) -> dict:
+        """Upload file to a specific S3 bucket, retrying transient errors under the shared retry policy"""
+        file_size = stream_size(file_obj)
+        transfer_config = build_transfer_config(self.settings, file_size, get_transfer_tuner().plan(file_size))
+        retries = {"count": 0}
+
+        def rewind():
+            retries["count"] += 1
+            file_obj.seek(0)
+
+        try:
+            await get_retry_policy().call_async(
+                lambda: self.run(
+                    self.client.s3.upload_fileobj,
+                    file_obj,
+                    bucket_name,
+                    file_key,
+                    ExtraArgs={"Metadata": {"request-id": request_id}},
+                    Config=transfer_config
+                ),
+                bucket_name, "upload_fileobj", f"upload_fileobj {file_key}", max_retries, on_retry=rewind,
+            )
+        except Exception as e:
+            StructuredLogger.log_upload_error(request_id, file_key, str(e), retries["count"])
+            return {"success": False, "error": str(e), "retries": retries["count"]}
+        self.cache.invalidate_object(bucket_name, file_key)
+        await self._index_object(bucket_name, file_key, file_size)
+        StructuredLogger.log_upload_success(request_id, file_key, file_key)
+        return {"success": True, "s3_key": file_key}
+
+    async def put_object(self, bucket_name: str, file_key: str, body: bytes, request_id: str, content_type: str = None,
+                         metadata: dict = None, content_encoding: str = None) -> dict:
+        response = await self._run_with_retries(
+            self.client.put_object, bucket_name, f"put_object {file_key}", bucket_name, file_key, body, request_id, content_type,
+            metadata=metadata, content_encoding=content_encoding
+        )
+        self.cache.invalidate_object(bucket_name, file_key)
+        size = len(body) if isinstance(body, (bytes, bytearray)) else None
+        await self._index_object(bucket_name, file_key, size, response.get("ETag"))
+        return response
+
+    async def create_multipart_upload(self, bucket_name: str, file_key: str, request_id: str, content_type: str = None,
+                                      metadata: dict = None, content_encoding: str = None) -> str:
+        return await self._run_with_retries(
+            self.client.create_multipart_upload, bucket_name, f"create_multipart_upload {file_key}", bucket_name, file_key, request_id,
+            content_type, metadata=metadata, content_encoding=content_encoding
+        )
+
+    async def upload_part_copy(self, source_bucket: str, source_key: str, bucket_name: str, file_key: str,
+                               upload_id: str, part_number: int, byte_range: str) -> dict:
+        return await self._run_with_retries(
+            self.client.upload_part_copy, bucket_name, f"upload_part_copy {file_key}#{part_number}",
+            source_bucket, source_key, bucket_name, file_key, upload_id, part_number, byte_range
+        )
+
+    async def copy_object(self, source_bucket: str, source_key: str, bucket_name: str, file_key: str,
+                          metadata: dict = None, content_type: str = None, content_encoding: str = None) -> dict:
+        response = await self._run_with_retries(
+            self.client.copy_object, bucket_name, f"copy_object {source_key} -> {file_key}", source_bucket, source_key, bucket_name, file_key,
+            metadata=metadata, content_type=content_type, content_encoding=content_encoding
+        )
+        self.cache.invalidate_object(bucket_name, file_key)
+        await self._index_object(bucket_name, file_key)
+        return response
+
+    async def head_object(self, bucket_name: str, file_key: str) -> dict:
+        return await self._run_with_retries(self.client.head_object, bucket_name, f"head_object {file_key}", bucket_name, file_key)
+
+    async def upload_part(self, bucket_name: str, file_key: str, upload_id: str, part_number: int, body: bytes) -> dict:
+        return await self._run_with_retries(
+            self.client.upload_part, bucket_name, f"upload_part {file_key}#{part_number}", bucket_name, file_key, upload_id, part_number, body
+        )
+
+    async def complete_multipart_upload(self, bucket_name: str, file_key: str, upload_id: str, parts: list) -> dict:
+        response = await self._run_with_retries(
+            self.client.complete_multipart_upload, bucket_name, f"complete_multipart_upload {file_key}", bucket_name, file_key, upload_id, parts
+        )
+        self.cache.invalidate_object(bucket_name, file_key)
+        await self._index_object(bucket_name, file_key)
+        return response
+
+    async def abort_multipart_upload(self, bucket_name: str, file_key: str, upload_id: str) -> bool:
+        try:
+            return await self._run_with_retries(
+                self.client.abort_multipart_upload, bucket_name, f"abort_multipart_upload {file_key}",
+                bucket_name, file_key, upload_id, raise_errors=True
+            )
+        except Exception as e:
+            logger.error(f"Failed to abort multipart upload {upload_id} for {file_key}: {e}")
+            return False
+
+    async def list_parts(self, bucket_name: str, file_key: str, upload_id: str) -> list:
+        return await self._run_with_retries(
+            self.client.list_parts, bucket_name, f"list_parts {file_key}", bucket_name, file_key, upload_id
+        )
+
+    def generate_presigned_part_url(self, bucket_name: str, file_key: str, upload_id: str,
+                                    part_number: int, expiration: int = 3600) -> str:
+        return self.client.generate_presigned_part_url(bucket_name, file_key, upload_id, part_number, expiration)
+
+    async def list_buckets(self) -> list:
+        key = (self._cache_scope, BUCKETS)
+        buckets = self.cache.get(key)
+        if buckets is None:
+            try:
+                buckets = await self._run_with_retries(self.client.list_buckets, None, "list_buckets", raise_errors=True)
+            except Exception as e:
+                raise buckets_error(e)
+            self.cache.set(key, buckets)
+        return buckets
+
+    async def list_objects(self, bucket_name: str, prefix: str = "", delimiter: str = "/",
+                           page_size: int = 1000, continuation_token: str = None, use_cache: bool = True) -> dict:
+        key = (self._cache_scope, OBJECTS, bucket_name, prefix, delimiter, page_size, continuation_token)
+        listing = self.cache.get(key) if use_cache else None
+        if listing is None:
+            try:
+                listing = await self._run_with_retries(
+                    self.client.list_objects, bucket_name, f"list_objects_v2 {bucket_name}/{prefix}",
+                    bucket_name, prefix, delimiter, page_size, continuation_token, raise_errors=True
+                )
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                raise listing_error(e, bucket_name, prefix)
+            if use_cache:
+                self.cache.set(key, listing)
+        return listing
+
+    async def download_file(self, bucket_name: str, file_key: str) -> bytes:
+        return await self._run_with_retries(
+            self.client.download_file, bucket_name, f"get_object {file_key}", bucket_name, file_key
+        )
+
+    async def get_object(self, bucket_name: str, file_key: str, byte_range: str = None,
+                         if_none_match: str = None, if_modified_since=None) -> dict:
+        return await self._run_with_retries(
+            self.client.get_object, bucket_name, f"get_object {file_key}",
+            bucket_name, file_key, byte_range, if_none_match, if_modified_since
+        )
+
+    async def iter_body(self, body, chunk_size: int = 1024 * 1024, encoding: str = None):
+        """Yield a streaming body in fixed-size chunks, reading each on the executor.
+
+        With ``encoding``, the stored gzip or zstd body is decoded as it is
+        read, still at most ``chunk_size`` bytes at a time.
+        """
+        TRANSFERS_IN_FLIGHT.inc(direction="download")
+        try:
+            reader = open_decompressed(body, encoding) if encoding else body
+            while True:
+                chunk = await self.run(reader.read, chunk_size)
+                if not chunk:
+                    break
+                TRANSFER_BYTES.inc(len(chunk), direction="download")
+                yield chunk
+        finally:
+            TRANSFERS_IN_FLIGHT.dec(direction="download")
+            body.close()
+
+    async def delete_object(self, bucket_name: str, file_key: str) -> bool:
+        deleted = await self._run_with_retries(
+            self.client.delete_object, bucket_name, f"delete_object {file_key}", bucket_name, file_key
+        )
+        self.cache.invalidate_object(bucket_name, file_key)
+        if deleted:
+            await self._unindex_objects(bucket_name, [file_key])
+        return deleted
+
+    async def delete_objects(self, bucket_name: str, file_keys: list) -> dict:
+        try:
+            result = await self._run_with_retries(
+                self.client.delete_objects, bucket_name, f"delete_objects {len(file_keys)} keys",
+                bucket_name, file_keys, raise_errors=True
+            )
+        except Exception as e:
+            result = failed_batch(bucket_name, file_keys, e)
+        finally:
+            # Every listing that holds one of the keys overlaps their common prefix
+            self.cache.invalidate_prefix(bucket_name, os.path.commonprefix(file_keys))
+        await self._unindex_objects(bucket_name, result["deleted"])
+        return result
+
+    async def list_objects_page(self, bucket_name: str, prefix: str = "", delimiter: str = "",
+                                continuation_token: str = None, max_keys: int = 1000) -> dict:
+        return await self._run_with_retries(
+            self.client.list_objects_page, bucket_name, f"list_objects_v2 {bucket_name}/{prefix}",
+            bucket_name, prefix, delimiter, continuation_token, max_keys
+        )
+
+    async def iter_listing_pages(self, bucket_name: str, prefix: str = "", delimiter: str = "",
+                                 page_size: int = 1000, continuation_token: str = None):
+        """Yield raw list_objects_v2 pages until the listing is exhausted"""
+        token = continuation_token
+        while True:
+            page = await self.list_objects_page(bucket_name, prefix, delimiter, token, page_size)
+            yield page
+            if not page.get("IsTruncated"):
+                break
+            token = page["NextContinuationToken"]
+
+    async def iter_object_keys(self, bucket_name: str, prefix: str = ""):
+        """Yield every key under a prefix, fetching one listing page at a time"""
+        async for page in self.iter_listing_pages(bucket_name, prefix):
+            for obj in page.get("Contents", []):
+                yield obj["Key"]
+
+    async def delete_keys(self, bucket_name: str, file_keys, batch_size: int = 1000, concurrency: int = 4) -> dict:
+        """Delete keys in DeleteObjects batches, several batches in flight at once.
+
+        ``file_keys`` may be a list or an async iterator, so a paginated listing
+        can be fed straight in without collecting every key first.
+        """
+        result = {"deleted": [], "failed": []}
+        slots = asyncio.Semaphore(max(1, concurrency))
+        tasks = []
+
+        async def delete_batch(batch):
+            try:
+                batch_result = await self.delete_objects(bucket_name, batch)
+                result["deleted"].extend(batch_result["deleted"])
+                result["failed"].extend(batch_result["failed"])
+            finally:
+                slots.release()
+
+        async def submit(batch):
+            await slots.acquire()
+            tasks.append(asyncio.create_task(delete_batch(batch)))
+
+        batch = []
+        if hasattr(file_keys, "__aiter__"):
+            async for key in file_keys:
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    await submit(batch)
+                    batch = []
+        else:
+            for key in file_keys:
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    await submit(batch)
+                    batch = []
+        if batch:
+            await submit(batch)
+
+        await asyncio.gather(*tasks)
+        return result
+
+    async def get_object_metadata(self, bucket_name: str, file_key: str) -> dict:
+        key = (self._cache_scope, METADATA, bucket_name, file_key)
+        metadata = self.cache.get(key)
+        if metadata is None:
+            try:
+                metadata = await self._run_with_retries(
+                    self.client.get_object_metadata, bucket_name, f"head_object {file_key}",
+                    bucket_name, file_key, raise_errors=True
+                )
+            except Exception as e:
+                # Not cached, so the next lookup asks S3 again
+                logger.error(f"Failed to get metadata for {file_key} from {bucket_name}: {e}")
+                return dict(DEFAULT_METADATA)
+            self.cache.set(key, metadata)
+        return metadata
+
+    def generate_presigned_url_for_bucket(self, bucket_name: str, file_key: str, expiration: int = 3600) -> str:
+        # Presigning is local computation, no network round trip
+        return self.client.generate_presigned_url_for_bucket(bucket_name, file_key, expiration)
@@ -0,0 +1,74 @@
+import gzip
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; gzip is always available
+    zstandard = None
+
+GZIP = "gzip"
+ZSTD = "zstd"
+
+# gzip container around raw deflate
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def supported_encodings() -> list:
+    return [GZIP, ZSTD] if zstandard is not None else [GZIP]
+
+
+class StreamCompressor:
+    """Incremental gzip or zstd compressor; feed chunks in order, then ``flush`` once"""
+
+    def __init__(self, encoding: str):
+        if encoding not in supported_encodings():
+            raise ValueError(f"Unsupported compression: {encoding}")
+        self.encoding = encoding
+        if encoding == GZIP:
+            self._compressor = zlib.compressobj(6, zlib.DEFLATED, _GZIP_WBITS)
+        else:
+            self._compressor = zstandard.ZstdCompressor(level=3).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+
+def open_decompressed(source, encoding: str):
+    """Readable file object over the decoded content of a stored gzip or zstd body.
+
+    ``read(n)`` never returns more than ``n`` bytes, however well the body
+    compressed, so a small object that expands to gigabytes is still
+    streamed in bounded chunks. Closing ``source`` is left to the caller.
+    """
+    if encoding not in supported_encodings():
+        raise ValueError(f"Unsupported compression: {encoding}")
+    if encoding == GZIP:
+        return gzip.GzipFile(fileobj=source, mode="rb")
+    return zstandard.ZstdDecompressor().stream_reader(source, read_across_frames=True, closefd=False)
+
+
+def accepts_encoding(accept_encoding: str, encoding: str) -> bool:
+    """Whether an Accept-Encoding header allows ``encoding`` (q=0 excludes it)"""
+    if not accept_encoding:
+        return False
+    wildcard = False
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name == encoding or (encoding == GZIP and name == "x-gzip"):
+            return quality > 0
+        if name == "*":
+            wildcard = quality > 0
+    return wildcard
+
@@ -0,0 +1,189 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from botocore.exceptions import ClientError
+from config import get_settings, on_settings_reload
+
+logger = logging.getLogger(__name__)
+
+# Object metadata key holding the hex SHA-256 of the object's content
+CONTENT_HASH_METADATA = "content-sha256"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    bucket TEXT NOT NULL,
+    key TEXT NOT NULL,
+    sha256 TEXT,
+    size INTEGER,
+    etag TEXT,
+    seen INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, key)
+);
+CREATE INDEX IF NOT EXISTS objects_by_hash ON objects (bucket, sha256);
+"""
+
+
+class DedupIndex:
+    """Persistent map from content hash to the objects holding that content.
+
+    Rows are keyed by ``(bucket, key)`` and also remember the ETag they were
+    recorded at, so a rebuild only has to HEAD objects that are new or
+    changed. Objects without a content hash are kept with a NULL hash for
+    the same reason. Entries can go stale when objects change outside this
+    service; ``find_duplicate`` verifies a hit against S3 before it is used.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+
+    def lookup(self, bucket_name: str, sha256: str) -> dict:
+        """An object in the bucket with this content, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT key, size, etag FROM objects WHERE bucket = ? AND sha256 = ? LIMIT 1",
+                (bucket_name, sha256)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"bucket": bucket_name, "key": row[0], "size": row[1], "etag": row[2]}
+
+    def record(self, bucket_name: str, file_key: str, sha256: str, size: int, etag: str, seen: int = 0):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO objects (bucket, key, sha256, size, etag, seen) VALUES (?, ?, ?, ?, ?, ?)",
+                (bucket_name, file_key, sha256, size, etag, seen)
+            )
+
+    def remove(self, bucket_name: str, file_keys: list):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM objects WHERE bucket = ? AND key = ?",
+                [(bucket_name, key) for key in file_keys]
+            )
+
+    def etags(self, bucket_name: str, file_keys: list) -> dict:
+        """Recorded ETag of each key that is in the index"""
+        result = {}
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(file_keys), 500):
+                batch = file_keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, etag FROM objects WHERE bucket = ? AND key IN ({','.join('?' * len(batch))})",
+                    (bucket_name, *batch)
+                )
+                result.update(rows)
+        return result
+
+    def mark_seen(self, bucket_name: str, file_keys: list, seen: int):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE objects SET seen = ? WHERE bucket = ? AND key = ?",
+                [(seen, bucket_name, key) for key in file_keys]
+            )
+
+    def prune(self, bucket_name: str, prefix: str, seen: int) -> int:
+        """Drop entries under a prefix that a rebuild pass didn't see in S3"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM objects WHERE bucket = ? AND substr(key, 1, ?) = ? AND seen != ?",
+                (bucket_name, len(prefix), prefix, seen)
+            )
+        return cursor.rowcount
+
+    def stats(self) -> dict:
+        with self._lock:
+            objects, hashed = self._conn.execute("SELECT COUNT(*), COUNT(sha256) FROM objects").fetchone()
+        return {"objects": objects, "hashed": hashed}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+async def find_duplicate(s3_client, index: DedupIndex, bucket_name: str, sha256: str) -> dict:
+    """Look up content in the index and confirm the object still holds it.
+
+    The object must still exist, and carry the same content hash in its
+    metadata or the ETag it was indexed at; stale entries are dropped.
+    """
+    entry = await s3_client.run(index.lookup, bucket_name, sha256)
+    if entry is None:
+        return None
+    try:
+        head = await s3_client.head_object(bucket_name, entry["key"])
+    except ClientError:
+        head = None
+    if head is not None:
+        stored_hash = head.get("Metadata", {}).get(CONTENT_HASH_METADATA)
+        if stored_hash == sha256 or (stored_hash is None and head.get("ETag") == entry["etag"]):
+            return {**entry, "size": head["ContentLength"], "content_type": head.get("ContentType"),
+                    "content_encoding": head.get("ContentEncoding")}
+    await s3_client.run(index.remove, bucket_name, [entry["key"]])
+    return None
+
+
+async def rebuild_index(s3_client, index: DedupIndex, bucket_name: str, prefix: str = "", concurrency: int = 16) -> dict:
+    """Bring the index up to date with the objects under a prefix.
+
+    Only objects whose ETag differs from the indexed one are HEADed to read
+    their content hash, so re-running a rebuild is cheap. Entries for objects
+    that no longer exist are pruned at the end.
+    """
+    seen = time.time_ns()
+    slots = asyncio.Semaphore(max(1, concurrency))
+    totals = {"scanned": 0, "updated": 0, "hashed": 0, "pruned": 0}
+
+    async def refresh(obj: dict):
+        async with slots:
+            try:
+                head = await s3_client.head_object(bucket_name, obj["Key"])
+            except ClientError as e:
+                logger.warning(f"Skipping {bucket_name}/{obj['Key']} in dedup rebuild: {e}")
+                return
+        sha256 = head.get("Metadata", {}).get(CONTENT_HASH_METADATA)
+        await s3_client.run(index.record, bucket_name, obj["Key"], sha256, head["ContentLength"], head.get("ETag"), seen)
+        totals["updated"] += 1
+        if sha256:
+            totals["hashed"] += 1
+
+    async for page in s3_client.iter_listing_pages(bucket_name, prefix):
+        objects = [obj for obj in page.get("Contents", []) if not obj["Key"].endswith("/")]
+        totals["scanned"] += len(objects)
+        keys = [obj["Key"] for obj in objects]
+        known = await s3_client.run(index.etags, bucket_name, keys)
+        await s3_client.run(index.mark_seen, bucket_name, [key for key in keys if key in known], seen)
+        await asyncio.gather(*[refresh(obj) for obj in objects if known.get(obj["Key"], "") != obj.get("ETag")])
+
+    totals["pruned"] = await s3_client.run(index.prune, bucket_name, prefix, seen)
+    return totals
+
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_dedup_index() -> DedupIndex:
+    """Get the process-wide deduplication index"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = DedupIndex(get_settings().dedup_index_path)
+    return _index
+
+@on_settings_reload
+def reset_dedup_index():
+    """Close the index; runs on reset_settings"""
+    global _index
+    with _index_lock:
+        if _index is not None:
+            _index.close()
+        _index = None
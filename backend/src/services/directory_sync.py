@@ -0,0 +1,207 @@
+import fnmatch
+import hashlib
+import logging
+import mimetypes
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from src.services.s3_uploader import S3Client, build_transfer_config, choose_part_size
+from src.utils.logger import get_request_id
+
+logger = logging.getLogger(__name__)
+
+# How local and remote copies of a file are compared
+COMPARE_MTIME = "mtime"  # same size and the local file is not newer than the object
+COMPARE_ETAG = "etag"  # same size and the MD5-based ETag matches the local content
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# LastModified is truncated to whole seconds, so a file uploaded in the same
+# second it was written must not look newer than its object
+MTIME_RESOLUTION = 1.0
+
+
+def is_excluded(relative: str, excludes: tuple) -> bool:
+    """Whether a relative path, or any directory above it, matches an exclude pattern"""
+    if not excludes:
+        return False
+    parts = relative.split("/")
+    return any(
+        fnmatch.fnmatch("/".join(parts[:depth]), pattern)
+        for depth in range(1, len(parts) + 1) for pattern in excludes
+    )
+
+
+def walk_local(root: str, excludes: tuple = ()) -> dict:
+    """Map each file under ``root`` to ``(size, mtime)``, keyed by its '/'-separated relative path"""
+    files = {}
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                relative = os.path.relpath(entry.path, root).replace(os.sep, "/")
+                # Excluded directories are never descended into, so only the entry itself needs checking
+                if any(fnmatch.fnmatch(relative, pattern) for pattern in excludes):
+                    continue
+                if entry.is_dir():
+                    stack.append(entry.path)
+                elif entry.is_file():
+                    stat = entry.stat()
+                    files[relative] = (stat.st_size, stat.st_mtime)
+    return files
+
+
+def list_remote(client: S3Client, bucket_name: str, prefix: str) -> dict:
+    """Map each key under ``prefix`` to ``(size, etag, last_modified)``, one listing page at a time"""
+    objects = {}
+    token = None
+    while True:
+        page = client.list_objects_page(bucket_name, prefix, continuation_token=token)
+        for obj in page.get("Contents", []):
+            if not obj["Key"].endswith("/"):
+                objects[obj["Key"]] = (obj["Size"], obj.get("ETag", "").strip('"'), obj["LastModified"].timestamp())
+        if not page.get("IsTruncated"):
+            return objects
+        token = page["NextContinuationToken"]
+
+
+def expected_etag(path: str, size: int, settings) -> str:
+    """The ETag S3 reports for this file when uploaded with our transfer settings.
+
+    Single-part uploads get the MD5 of the content; multipart uploads the
+    MD5 of the concatenated part MD5s, suffixed with the part count.
+    """
+    config = build_transfer_config(settings, size)
+    if size < config.multipart_threshold:
+        digest = hashlib.md5()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    part_size = choose_part_size(size, config.multipart_chunksize)
+    part_digests = []
+    with open(path, "rb") as f:
+        while True:
+            part = hashlib.md5()
+            remaining = part_size
+            while remaining:
+                chunk = f.read(min(HASH_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                part.update(chunk)
+                remaining -= len(chunk)
+            if remaining == part_size:
+                break
+            part_digests.append(part.digest())
+    return f"{hashlib.md5(b''.join(part_digests)).hexdigest()}-{len(part_digests)}"
+
+
+def plan_sync(client: S3Client, local_root: str, bucket_name: str, prefix: str = "", compare: str = COMPARE_MTIME,
+              delete: bool = False, excludes: tuple = (), workers: int = 16) -> dict:
+    """Work out which files to upload and which remote keys to delete.
+
+    The local walk runs on a thread while the remote listing is paged in.
+    Only size and mtime are compared by default, so an unchanged tree costs
+    one stat per file plus one LIST per 1000 keys. ``etag`` mode hashes
+    files whose size matches, ``workers`` at a time. Remote keys matching
+    ``excludes`` are never deleted, like ``aws s3 sync``.
+    """
+    if prefix and not prefix.endswith("/"):
+        prefix += "/"
+    local_result = {}
+    walker = threading.Thread(target=lambda: local_result.update(files=walk_local(local_root, excludes)))
+    walker.start()
+    try:
+        remote = list_remote(client, bucket_name, prefix)
+    finally:
+        walker.join()
+    local = local_result["files"]
+
+    uploads = []
+    to_hash = []
+    for relative, (size, mtime) in sorted(local.items()):
+        key = prefix + relative
+        path = os.path.join(local_root, *relative.split("/"))
+        existing = remote.get(key)
+        if existing is None or existing[0] != size:
+            uploads.append((path, key, size))
+        elif compare == COMPARE_ETAG:
+            to_hash.append((path, key, size, existing[1]))
+        elif mtime >= existing[2] + MTIME_RESOLUTION:
+            uploads.append((path, key, size))
+
+    if to_hash:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            etags = pool.map(lambda item: expected_etag(item[0], item[2], client.settings), to_hash)
+            for (path, key, size, remote_etag), etag in zip(to_hash, etags):
+                if etag != remote_etag:
+                    uploads.append((path, key, size))
+
+    local_keys = {prefix + relative for relative in local}
+    deletes = sorted(
+        key for key in remote
+        if key not in local_keys and not is_excluded(key[len(prefix):], excludes)
+    ) if delete else []
+    return {
+        "uploads": uploads,
+        "deletes": deletes,
+        "scanned": len(local),
+        "unchanged": len(local) - len(uploads),
+    }
+
+
+def run_sync(client: S3Client, plan: dict, bucket_name: str, workers: int = 16, dry_run: bool = False) -> dict:
+    """Carry out a sync plan and return a summary with throughput.
+
+    ``workers`` files upload at once. Large files go multipart, and each
+    file's part concurrency is scaled down so all workers together stay
+    within the client's connection pool.
+    """
+    settings = client.settings
+    workers = max(1, workers)
+    part_concurrency = max(1, settings.s3_max_pool_connections // workers)
+    totals = {"uploaded": 0, "uploaded_bytes": 0, "deleted": 0, "failed": []}
+    lock = threading.Lock()
+    started = time.perf_counter()
+
+    def upload(item: tuple):
+        path, key, size = item
+        config = build_transfer_config(settings, size, (settings.upload_part_size, part_concurrency))
+        try:
+            with open(path, "rb") as f:
+                result = client.upload_file_to_bucket(
+                    f, bucket_name, key, get_request_id(),
+                    transfer_config=config,
+                    content_type=mimetypes.guess_type(path)[0],
+                )
+        except OSError as e:
+            result = {"success": False, "error": str(e)}
+        with lock:
+            if result["success"]:
+                totals["uploaded"] += 1
+                totals["uploaded_bytes"] += size
+            else:
+                totals["failed"].append({"key": key, "error": result["error"]})
+
+    if not dry_run:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sync") as pool:
+            list(pool.map(upload, plan["uploads"]))
+        for start in range(0, len(plan["deletes"]), 1000):
+            result = client.delete_objects(bucket_name, plan["deletes"][start:start + 1000])
+            totals["deleted"] += len(result["deleted"])
+            totals["failed"].extend(result["failed"])
+
+    elapsed = time.perf_counter() - started
+    return {
+        "dry_run": dry_run,
+        "scanned": plan["scanned"],
+        "unchanged": plan["unchanged"],
+        "to_upload": len(plan["uploads"]),
+        "to_delete": len(plan["deletes"]),
+        **totals,
+        "seconds": round(elapsed, 3),
+        "throughput_mb_s": round(totals["uploaded_bytes"] / (1024 * 1024) / elapsed, 2) if elapsed else 0.0,
+    }
@@ -0,0 +1,272 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from config import get_settings, on_settings_reload
+
+logger = logging.getLogger(__name__)
+
+# Prefix depth down to which a refresh lists each sub-prefix as its own
+# concurrent listing; deeper keys are paged in with a flat listing
+SPLIT_DEPTH = 2
+
+# Shortest substring the trigram index can look up; shorter ones scan the bucket
+MIN_TRIGRAM_QUERY = 3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS keys (
+    id INTEGER PRIMARY KEY,
+    bucket TEXT NOT NULL,
+    key TEXT NOT NULL,
+    size INTEGER,
+    last_modified REAL,
+    etag TEXT,
+    seen INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (bucket, key)
+);
+CREATE TABLE IF NOT EXISTS buckets (
+    bucket TEXT PRIMARY KEY,
+    refreshed REAL NOT NULL
+);
+"""
+
+# Keys are only ever inserted or deleted, never renamed, so the full-text
+# table only has to follow inserts and deletes
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS keys_fts USING fts5(key, content='keys', content_rowid='id', tokenize='trigram');
+CREATE TRIGGER IF NOT EXISTS keys_fts_insert AFTER INSERT ON keys BEGIN
+    INSERT INTO keys_fts (rowid, key) VALUES (new.id, new.key);
+END;
+CREATE TRIGGER IF NOT EXISTS keys_fts_delete AFTER DELETE ON keys BEGIN
+    INSERT INTO keys_fts (keys_fts, rowid, key) VALUES ('delete', old.id, old.key);
+END;
+"""
+
+
+def _upper_bound(prefix: str) -> str:
+    """Smallest string greater than every string starting with ``prefix``"""
+    return prefix + "\U0010ffff"
+
+
+class KeyIndex:
+    """Searchable SQLite copy of the keys, sizes and modification times in a bucket.
+
+    Keys go into an FTS5 table with the trigram tokenizer, so substring and
+    glob searches are index lookups instead of a scan of every key. SQLite
+    builds without trigram support fall back to scanning the bucket's rows.
+
+    A bucket is searchable once ``refresh_key_index`` has listed it. Later
+    refreshes only rewrite rows whose ETag changed and prune keys that are
+    gone; writes made through AsyncS3Client update the index as they happen.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.refreshing = set()
+        with self._lock:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            try:
+                self._conn.executescript(_FTS_SCHEMA)
+                self.trigram = True
+            except sqlite3.OperationalError:
+                logger.warning("SQLite has no FTS5 trigram tokenizer; key searches will scan the index")
+                self.trigram = False
+            self._refreshed = dict(self._conn.execute("SELECT bucket, refreshed FROM buckets"))
+
+    def refreshed_at(self, bucket_name: str) -> float:
+        """When the bucket's last full refresh finished, or None if it was never indexed"""
+        return self._refreshed.get(bucket_name)
+
+    def merge(self, bucket_name: str, objects: list, seen: int) -> tuple:
+        """Bring one listing page of ``(key, size, last_modified, etag)`` into the index.
+
+        Returns the number of keys added and updated. Rows recorded after the
+        refresh started are newer than the listing and are left alone.
+        """
+        with self._lock, self._conn:
+            known = {}
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(objects), 500):
+                batch = [obj[0] for obj in objects[start:start + 500]]
+                known.update(self._conn.execute(
+                    f"SELECT key, etag FROM keys WHERE bucket = ? AND key IN ({','.join('?' * len(batch))})",
+                    (bucket_name, *batch)
+                ))
+            changed = [obj for obj in objects if obj[0] not in known or known[obj[0]] != obj[3]]
+            self._conn.executemany(
+                "INSERT INTO keys (bucket, key, size, last_modified, etag, seen) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (bucket, key) DO UPDATE SET size = excluded.size, last_modified = excluded.last_modified, "
+                "etag = excluded.etag, seen = excluded.seen WHERE seen < excluded.seen",
+                [(bucket_name, *obj, seen) for obj in changed]
+            )
+            self._conn.executemany(
+                "UPDATE keys SET seen = ? WHERE bucket = ? AND key = ? AND seen < ?",
+                [(seen, bucket_name, obj[0], seen) for obj in objects if obj[0] in known and known[obj[0]] == obj[3]]
+            )
+        added = sum(1 for obj in changed if obj[0] not in known)
+        return added, len(changed) - added
+
+    def finish_refresh(self, bucket_name: str, seen: int) -> int:
+        """Drop keys a refresh started at ``seen`` didn't list, and mark the bucket refreshed"""
+        refreshed = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute("DELETE FROM keys WHERE bucket = ? AND seen < ?", (bucket_name, seen))
+            self._conn.execute("INSERT OR REPLACE INTO buckets (bucket, refreshed) VALUES (?, ?)", (bucket_name, refreshed))
+            self._refreshed[bucket_name] = refreshed
+        return cursor.rowcount
+
+    def record(self, bucket_name: str, file_key: str, size: int, last_modified: float, etag: str):
+        """Add or update one key written through this service"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO keys (bucket, key, size, last_modified, etag, seen) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (bucket, key) DO UPDATE SET size = excluded.size, last_modified = excluded.last_modified, "
+                "etag = excluded.etag, seen = excluded.seen",
+                (bucket_name, file_key, size, last_modified, etag, time.time_ns())
+            )
+
+    def remove(self, bucket_name: str, file_keys: list):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "DELETE FROM keys WHERE bucket = ? AND key = ?",
+                [(bucket_name, key) for key in file_keys]
+            )
+
+    def search(self, bucket_name: str, query: str = None, glob: str = None, prefix: str = "",
+               limit: int = 100, after: str = None) -> dict:
+        """Keys containing ``query`` (case-insensitive) or matching ``glob``, in key order.
+
+        ``glob`` uses SQLite GLOB syntax and is case-sensitive; ``*`` also
+        matches ``/``. Pass the returned ``next_token`` as ``after`` for the
+        next page.
+        """
+        clauses = ["k.bucket = ?"]
+        params = [bucket_name]
+        source = "keys k"
+        if glob is not None:
+            if self.trigram:
+                source = "keys_fts f JOIN keys k ON k.id = f.rowid"
+                clauses.append("f.key GLOB ?")
+            else:
+                clauses.append("k.key GLOB ?")
+            params.append(glob)
+        elif query:
+            if self.trigram and len(query) >= MIN_TRIGRAM_QUERY:
+                source = "keys_fts f JOIN keys k ON k.id = f.rowid"
+                clauses.append("keys_fts MATCH ?")
+                params.append('"' + query.replace('"', '""') + '"')
+            else:
+                clauses.append("instr(lower(k.key), lower(?)) > 0")
+                params.append(query)
+        if prefix:
+            clauses.append("k.key >= ? AND k.key < ?")
+            params.extend((prefix, _upper_bound(prefix)))
+        if after is not None:
+            clauses.append("k.key > ?")
+            params.append(after)
+
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT k.key, k.size, k.last_modified, k.etag FROM {source} "
+                f"WHERE {' AND '.join(clauses)} ORDER BY k.key LIMIT ?",
+                (*params, limit + 1)
+            ).fetchall()
+        files = [{
+            "name": key.split("/")[-1],
+            "key": key,
+            "size": size,
+            "last_modified": datetime.fromtimestamp(last_modified, timezone.utc).isoformat() if last_modified else None,
+            "etag": etag,
+        } for key, size, last_modified, etag in rows[:limit]]
+        return {"files": files, "next_token": files[-1]["key"] if len(rows) > limit else None}
+
+    def stats(self) -> dict:
+        with self._lock:
+            objects, = self._conn.execute("SELECT COUNT(*) FROM keys").fetchone()
+        return {"objects": objects, "buckets": len(self._refreshed), "trigram": self.trigram}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+async def refresh_key_index(s3_client, index: KeyIndex, bucket_name: str, concurrency: int = 16) -> dict:
+    """List a whole bucket into the index.
+
+    Down to ``SPLIT_DEPTH`` levels every sub-prefix is paged through as its
+    own listing, all of them concurrently with at most ``concurrency`` LIST
+    requests in flight. Only new or changed keys are written, and keys that
+    were not listed are pruned at the end.
+    """
+    seen = time.time_ns()
+    slots = asyncio.Semaphore(max(1, concurrency))
+    totals = {"scanned": 0, "added": 0, "updated": 0, "pruned": 0, "listing_requests": 0}
+
+    async def walk(prefix: str, depth: int):
+        delimiter = "/" if depth < SPLIT_DEPTH else ""
+        children = []
+        token = None
+        try:
+            while True:
+                async with slots:
+                    page = await s3_client.list_objects_page(bucket_name, prefix, delimiter, token)
+                totals["listing_requests"] += 1
+                objects = [
+                    (obj["Key"], obj["Size"], obj["LastModified"].timestamp(), obj.get("ETag", "").strip('"'))
+                    for obj in page.get("Contents", []) if not obj["Key"].endswith("/")
+                ]
+                totals["scanned"] += len(objects)
+                if objects:
+                    added, updated = await s3_client.run(index.merge, bucket_name, objects, seen)
+                    totals["added"] += added
+                    totals["updated"] += updated
+                for common_prefix in page.get("CommonPrefixes", []):
+                    children.append(asyncio.create_task(walk(common_prefix["Prefix"], depth + 1)))
+                if not page.get("IsTruncated"):
+                    break
+                token = page["NextContinuationToken"]
+            await asyncio.gather(*children)
+        except BaseException:
+            for task in children:
+                task.cancel()
+            raise
+
+    index.refreshing.add(bucket_name)
+    try:
+        await walk("", 0)
+        totals["pruned"] = await s3_client.run(index.finish_refresh, bucket_name, seen)
+    finally:
+        index.refreshing.discard(bucket_name)
+    logger.info("Refreshed key index", extra={"fields": {"bucket": bucket_name, **totals}})
+    return totals
+
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_key_index() -> KeyIndex:
+    """Get the process-wide key search index, or None when ``key_index_enabled`` is off"""
+    global _index
+    if _index is None:
+        settings = get_settings()
+        if not settings.key_index_enabled:
+            return None
+        with _index_lock:
+            if _index is None:
+                _index = KeyIndex(settings.key_index_path)
+    return _index
+
+@on_settings_reload
+def reset_key_index():
+    """Close the index; runs on reset_settings"""
+    global _index
+    with _index_lock:
+        if _index is not None:
+            _index.close()
+        _index = None
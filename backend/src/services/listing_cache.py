@@ -0,0 +1,151 @@
+import json
+import time
+import threading
+from collections import OrderedDict
+from config import get_settings, on_settings_reload
+
+# Entry kinds
+BUCKETS = "buckets"
+OBJECTS = "objects"
+METADATA = "metadata"
+USAGE = "usage"  # prefix totals; kept for their own TTL, not invalidated by writes
+
+
+def _estimate_size(value) -> int:
+    return len(json.dumps(value, default=str))
+
+
+class ListingCache:
+    """In-process TTL cache for bucket lists, prefix listings and object metadata.
+
+    Keys are ``(credentials, kind, bucket, prefix_or_key, ...)`` tuples; the
+    credentials fingerprint comes first so callers only ever see results
+    fetched with their own credentials. The cache is bounded both by entry
+    count and by the approximate serialized size of the cached values, evicting
+    least recently used entries first. Writes made through this service call
+    ``invalidate_object``/``invalidate_prefix`` so users see their own changes
+    immediately rather than after the TTL.
+    """
+
+    def __init__(self, ttl: float = 30, max_entries: int = 1000, max_bytes: int = 32 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, key: tuple):
+        """Return the cached value, or None on a miss or expired entry"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at, size = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: tuple, value, ttl: float = None):
+        if not self.enabled:
+            return
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl), size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate_object(self, bucket_name: str, file_key: str):
+        """Drop metadata for a key and every listing of a prefix that contains it"""
+        def affected(key):
+            if key[1] in (BUCKETS, USAGE) or key[2] != bucket_name:
+                return False
+            if key[1] == METADATA:
+                return key[3] == file_key
+            return file_key.startswith(key[3])
+
+        self._invalidate(affected)
+
+    def invalidate_prefix(self, bucket_name: str, prefix: str):
+        """Drop every listing and metadata entry overlapping a prefix"""
+        def affected(key):
+            if key[1] in (BUCKETS, USAGE) or key[2] != bucket_name:
+                return False
+            return key[3].startswith(prefix) or prefix.startswith(key[3])
+
+        self._invalidate(affected)
+
+    def _invalidate(self, affected):
+        with self._lock:
+            for key in [key for key in self._entries if affected(key)]:
+                self._remove(key)
+                self.invalidations += 1
+
+    def _remove(self, key: tuple):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_listing_cache() -> ListingCache:
+    """Get the process-wide listing cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                settings = get_settings()
+                _cache = ListingCache(
+                    ttl=settings.listing_cache_ttl,
+                    max_entries=settings.listing_cache_max_entries,
+                    max_bytes=settings.listing_cache_max_bytes,
+                )
+    return _cache
+
+@on_settings_reload
+def reset_listing_cache():
+    """Drop the listing cache; runs on reset_settings"""
+    global _cache
+    with _cache_lock:
+        _cache = None
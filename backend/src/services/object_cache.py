@@ -0,0 +1,217 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from config import get_settings, on_settings_reload
+from src.services.compression import open_decompressed
+
+logger = logging.getLogger(__name__)
+
+# Response fields kept with a cached body, enough to answer as S3 would
+CACHED_FIELDS = ("ETag", "LastModified", "ContentLength", "ContentType", "ContentEncoding")
+
+# Subdirectory of the configured directory that the cache owns
+CACHE_SUBDIR = "s3-object-cache"
+
+# Names of the files the cache writes: finished bodies and downloads in progress
+_ENTRY_NAME = re.compile(r"^(?:[0-9a-f]{64}|tmp-[0-9a-f]{32})$")
+
+
+class CachedObject:
+    def __init__(self, path: str, metadata: dict):
+        self.path = path
+        self.metadata = metadata
+
+    @property
+    def etag(self) -> str:
+        return self.metadata["ETag"]
+
+    @property
+    def size(self) -> int:
+        return self.metadata["ContentLength"]
+
+
+class ObjectCache:
+    """Size-bounded on-disk LRU cache of object bodies for hot downloads.
+
+    Each ``(bucket, key)`` maps to the body at one ETag; a newer version
+    replaces it. Callers revalidate an entry with a conditional GET before
+    serving it, which also checks the caller's own access to the object,
+    so entries are shared between credentials. Bodies are stored as S3
+    holds them (still compressed when they have a Content-Encoding).
+
+    Concurrent misses for the same object share a single S3 fetch through
+    ``fetch``. Least recently used bodies are deleted once the total
+    exceeds ``max_bytes``. Bodies live in a ``s3-object-cache`` subdirectory
+    of ``directory``, and on start only files the cache itself names are
+    deleted from it, so pointing it at a shared directory is safe.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 1024 * 1024 * 1024, max_object_size: int = 256 * 1024 * 1024):
+        self.directory = os.path.join(directory, CACHE_SUBDIR)
+        self.max_bytes = max_bytes
+        self.max_object_size = min(max_object_size, max_bytes)
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._fetches = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        # Bodies left by a previous process aren't tracked, so they'd never be evicted
+        for name in os.listdir(self.directory):
+            if _ENTRY_NAME.match(name):
+                _remove(os.path.join(self.directory, name))
+
+    def get(self, bucket_name: str, file_key: str) -> CachedObject:
+        """The cached body of an object, not yet revalidated, or None"""
+        with self._lock:
+            entry = self._entries.get((bucket_name, file_key))
+            if entry is not None:
+                self._entries.move_to_end((bucket_name, file_key))
+            return entry
+
+    def temp_path(self) -> str:
+        return os.path.join(self.directory, f"tmp-{uuid.uuid4().hex}")
+
+    def put(self, bucket_name: str, file_key: str, temp_path: str, metadata: dict) -> CachedObject:
+        """Move a downloaded body into the cache, evicting least recently used bodies to make room"""
+        name = hashlib.sha256(f"{bucket_name}\0{file_key}\0{metadata['ETag']}".encode()).hexdigest()
+        entry = CachedObject(os.path.join(self.directory, name), {field: metadata.get(field) for field in CACHED_FIELDS})
+        os.replace(temp_path, entry.path)
+        removed = []
+        with self._lock:
+            previous = self._entries.pop((bucket_name, file_key), None)
+            if previous is not None:
+                self._bytes -= previous.size
+                if previous.path != entry.path:
+                    removed.append(previous.path)
+            self._entries[(bucket_name, file_key)] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self.evictions += 1
+                removed.append(evicted.path)
+        # Readers hold their file open, so unlinking doesn't cut off a download in progress
+        for path in removed:
+            _remove(path)
+        return entry
+
+    def remove(self, bucket_name: str, file_key: str):
+        with self._lock:
+            entry = self._entries.pop((bucket_name, file_key), None)
+            if entry is not None:
+                self._bytes -= entry.size
+        if entry is not None:
+            _remove(entry.path)
+
+    async def fetch(self, fetch_key: tuple, load):
+        """Run ``load()`` once for all concurrent callers with the same ``fetch_key``.
+
+        The first caller runs it and gets its result. Callers arriving while
+        it runs wait and get the CachedObject it produced, or None when it
+        failed or produced nothing cacheable; they should then go to S3 themselves.
+        """
+        pending = self._fetches.get(fetch_key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+        pending = self._fetches[fetch_key] = asyncio.get_running_loop().create_future()
+        result = None
+        try:
+            result = await load()
+            return result
+        finally:
+            del self._fetches[fetch_key]
+            pending.set_result(result if isinstance(result, CachedObject) else None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = len(self._entries), self._bytes
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+        }
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def download_to_cache(s3_client, cache: ObjectCache, bucket_name: str, file_key: str, response: dict):
+    """Write an opened get_object response into the cache.
+
+    Returns the CachedObject, or ``response`` untouched when the object is
+    too large to cache so the caller can stream it instead.
+    """
+    if response["ContentLength"] > cache.max_object_size or not response.get("ETag"):
+        return response
+    temp_path = cache.temp_path()
+    f = await s3_client.run(open, temp_path, "wb")
+    try:
+        async for chunk in s3_client.iter_body(response["Body"], s3_client.settings.download_chunk_size):
+            await s3_client.run(f.write, chunk)
+    except BaseException:
+        await s3_client.run(f.close)
+        _remove(temp_path)
+        raise
+    await s3_client.run(f.close)
+    return await s3_client.run(cache.put, bucket_name, file_key, temp_path, response)
+
+
+async def iter_file(s3_client, f, chunk_size: int, encoding: str = None):
+    """Yield an open file in chunks, reading each on the executor, and close it.
+
+    With ``encoding``, a cached gzip or zstd body is decoded as it is read.
+    """
+    try:
+        reader = open_decompressed(f, encoding) if encoding else f
+        while True:
+            chunk = await s3_client.run(reader.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        await s3_client.run(f.close)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_object_cache() -> ObjectCache:
+    """Get the process-wide download cache, or None when ``download_cache_dir`` isn't set"""
+    global _cache
+    if _cache is None:
+        settings = get_settings()
+        if not settings.download_cache_dir or settings.download_cache_max_bytes <= 0:
+            return None
+        with _cache_lock:
+            if _cache is None:
+                _cache = ObjectCache(
+                    settings.download_cache_dir,
+                    max_bytes=settings.download_cache_max_bytes,
+                    max_object_size=settings.download_cache_max_object_size,
+                )
+    return _cache
+
+@on_settings_reload
+def reset_object_cache():
+    """Forget the cache; runs on reset_settings; files stay until the next one starts"""
+    global _cache
+    with _cache_lock:
+        _cache = None
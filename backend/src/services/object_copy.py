@@ -0,0 +1,144 @@
+import asyncio
+import logging
+from src.services.async_s3 import AsyncS3Client
+from src.services.s3_uploader import choose_part_size
+from src.utils.logger import get_request_id
+
+logger = logging.getLogger(__name__)
+
+# Largest object a single CopyObject request can copy
+MAX_COPY_OBJECT_SIZE = 5 * 1024 * 1024 * 1024
+
+
+async def copy_object(s3_client: AsyncS3Client, source_bucket: str, source_key: str,
+                      bucket_name: str, file_key: str) -> dict:
+    """Server-side copy of one object; the payload never passes through this service.
+
+    Objects above ``copy_multipart_threshold``, or above the 5GB CopyObject
+    limit whatever the threshold, are copied with UploadPartCopy,
+    ``copy_part_concurrency`` parts at a time.
+    """
+    settings = s3_client.settings
+    head = await s3_client.head_object(source_bucket, source_key)
+    size = head["ContentLength"]
+
+    if size <= min(settings.copy_multipart_threshold, MAX_COPY_OBJECT_SIZE):
+        await s3_client.copy_object(source_bucket, source_key, bucket_name, file_key)
+        return {"source_key": source_key, "file_key": file_key, "size": size, "parts": 0}
+
+    part_size = choose_part_size(size, settings.copy_part_size)
+    upload_id = await s3_client.create_multipart_upload(
+        bucket_name,
+        file_key,
+        get_request_id(),
+        head.get("ContentType"),
+        metadata=head.get("Metadata"),
+        content_encoding=head.get("ContentEncoding")
+    )
+    slots = asyncio.Semaphore(max(1, settings.copy_part_concurrency))
+
+    async def copy_part(part_number: int, start: int):
+        end = min(start + part_size, size) - 1
+        async with slots:
+            return await s3_client.upload_part_copy(
+                source_bucket, source_key, bucket_name, file_key, upload_id, part_number, f"bytes={start}-{end}"
+            )
+
+    try:
+        parts = await asyncio.gather(*[
+            copy_part(part_number, start)
+            for part_number, start in enumerate(range(0, size, part_size), start=1)
+        ])
+        await s3_client.complete_multipart_upload(bucket_name, file_key, upload_id, list(parts))
+    except Exception:
+        await s3_client.abort_multipart_upload(bucket_name, file_key, upload_id)
+        raise
+
+    return {"source_key": source_key, "file_key": file_key, "size": size, "parts": len(parts)}
+
+
+async def _drain_queue(queue: asyncio.Queue):
+    while True:
+        key = await queue.get()
+        if key is None:
+            return
+        yield key
+
+
+async def copy_prefix(s3_client: AsyncS3Client, source_bucket: str, source_prefix: str,
+                      bucket_name: str, destination_prefix: str, move: bool = False):
+    """Copy (or move) every object under a prefix, yielding progress events.
+
+    ``copy_object_concurrency`` objects are copied at once while the source
+    listing is paged in. For a move, each successfully copied source key is
+    handed straight to the batch deleter, so sources are removed only after
+    their copy succeeded.
+
+    Yields ``{"type": "progress", ...}`` after every object, ``{"type": "error", ...}``
+    for each failure and a final ``{"type": "done", ...}`` summary.
+    """
+    settings = s3_client.settings
+    slots = asyncio.Semaphore(max(1, settings.copy_object_concurrency))
+    events = asyncio.Queue()
+    delete_queue = asyncio.Queue()
+    totals = {"copied": 0, "failed": 0, "bytes": 0, "deleted": 0, "delete_failed": 0}
+
+    deleter = None
+    if move:
+        deleter = asyncio.create_task(s3_client.delete_keys(
+            source_bucket, _drain_queue(delete_queue), concurrency=settings.delete_batch_concurrency
+        ))
+
+    async def copy_one(key: str):
+        destination_key = destination_prefix + key[len(source_prefix):]
+        try:
+            result = await copy_object(s3_client, source_bucket, key, bucket_name, destination_key)
+            totals["copied"] += 1
+            totals["bytes"] += result["size"]
+            if move:
+                await delete_queue.put(key)
+        except Exception as e:
+            logger.error(f"Failed to copy {source_bucket}/{key} to {bucket_name}/{destination_key}: {e}")
+            totals["failed"] += 1
+            await events.put({"type": "error", "key": key, "error": str(e)})
+        finally:
+            slots.release()
+        await events.put({"type": "progress", **totals})
+
+    async def run():
+        # Only copies still in flight are held, so at most copy_object_concurrency
+        # tasks exist however many keys the prefix has
+        tasks = set()
+        try:
+            async for key in s3_client.iter_object_keys(source_bucket, source_prefix):
+                await slots.acquire()
+                task = asyncio.create_task(copy_one(key))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        finally:
+            if deleter is not None:
+                await delete_queue.put(None)
+                deleted = await deleter
+                totals["deleted"] = len(deleted["deleted"])
+                totals["delete_failed"] = len(deleted["failed"])
+                for failure in deleted["failed"]:
+                    await events.put({"type": "error", "key": failure["key"], "error": failure["error"]})
+            await events.put(None)
+
+    runner = asyncio.create_task(run())
+    try:
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            yield event
+        await runner
+        yield {"type": "done", **totals}
+    finally:
+        if not runner.done():
+            runner.cancel()
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from src.services.async_s3 import AsyncS3Client
+
+logger = logging.getLogger(__name__)
+
+
+def _node(prefix: str, with_children: bool) -> dict:
+    node = {"prefix": prefix, "objects": 0, "bytes": 0}
+    if with_children:
+        node["children"] = []
+    return node
+
+
+def _sort_children(node: dict):
+    children = node.get("children")
+    if children:
+        children.sort(key=lambda child: child["prefix"])
+        for child in children:
+            _sort_children(child)
+
+
+async def prefix_usage(s3_client: AsyncS3Client, bucket_name: str, prefix: str = "", max_depth: int = 1,
+                       concurrency: int = 16):
+    """Total objects and bytes under a prefix, broken down by sub-prefix, yielding progress events.
+
+    Down to ``max_depth`` levels each prefix is listed with a "/" delimiter,
+    and every sub-prefix found in ``CommonPrefixes`` is walked as its own
+    paginated listing, all of them concurrently, with at most
+    ``concurrency`` LIST requests in flight. Prefixes at ``max_depth`` are
+    totalled with a flat listing. Depth 0 is a single flat listing of the
+    whole prefix.
+
+    Yields ``{"type": "progress", ...}`` running totals after every listing
+    page, ``{"type": "prefix", ...}`` as each sub-prefix's total is final,
+    and a closing ``{"type": "done", ...}`` with the whole tree.
+    """
+    slots = asyncio.Semaphore(max(1, concurrency))
+    events = asyncio.Queue()
+    root = _node(prefix, max_depth > 0)
+    totals = {"listing_requests": 0}
+
+    async def walk(node: dict, depth: int, ancestors: tuple):
+        delimiter = "/" if depth < max_depth else ""
+        children = []
+        token = None
+        while True:
+            async with slots:
+                page = await s3_client.list_objects_page(bucket_name, node["prefix"], delimiter, token)
+            totals["listing_requests"] += 1
+            contents = page.get("Contents", [])
+            size = sum(obj["Size"] for obj in contents)
+            for counted in (node, *ancestors):
+                counted["objects"] += len(contents)
+                counted["bytes"] += size
+            for common_prefix in page.get("CommonPrefixes", []):
+                child = _node(common_prefix["Prefix"], depth + 1 < max_depth)
+                node["children"].append(child)
+                children.append(asyncio.create_task(walk(child, depth + 1, (node, *ancestors))))
+            await events.put({"type": "progress", "objects": root["objects"], "bytes": root["bytes"], **totals})
+            if not page.get("IsTruncated"):
+                break
+            token = page["NextContinuationToken"]
+        try:
+            await asyncio.gather(*children)
+        except BaseException:
+            for task in children:
+                task.cancel()
+            raise
+        if depth > 0:
+            await events.put({
+                "type": "prefix", "prefix": node["prefix"], "depth": depth,
+                "objects": node["objects"], "bytes": node["bytes"],
+            })
+
+    async def run():
+        try:
+            await walk(root, 0, ())
+        except Exception as e:
+            await events.put(e)
+        finally:
+            await events.put(None)
+
+    runner = asyncio.create_task(run())
+    try:
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            if isinstance(event, Exception):
+                raise event
+            yield event
+        _sort_children(root)
+        yield {"type": "done", "max_depth": max_depth, **root, **totals}
+    finally:
+        if not runner.done():
+            runner.cancel()
@@ -0,0 +1,348 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+from botocore.exceptions import ClientError, ConnectionError as BotoConnectionError, HTTPClientError
+from config import get_settings, on_settings_reload
+from src.utils.metrics import S3_RETRIES, S3_RETRY_BUDGET_EXHAUSTED, S3_CIRCUIT_REJECTIONS
+
+logger = logging.getLogger(__name__)
+
+# Error codes worth retrying with backoff
+TRANSIENT_ERROR_CODES = [
+    "SlowDown", "ThrottlingException", "RequestLimitExceeded",
+    "InternalError", "ServiceUnavailable", "RequestTimeout",
+]
+
+# Codes meaning S3 is shedding load for the bucket; S3 throttles with 503 SlowDown
+THROTTLE_ERROR_CODES = {"SlowDown", "ThrottlingException", "RequestLimitExceeded", "ServiceUnavailable"}
+
+# Circuit breaker states
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Buckets remembered before idle closed circuits are forgotten
+MAX_TRACKED_BUCKETS = 1000
+
+
+def error_code(error: Exception) -> str:
+    if isinstance(error, ClientError):
+        return error.response.get("Error", {}).get("Code", "Unknown")
+    return type(error).__name__
+
+
+def is_transient_error(error: Exception) -> bool:
+    """Whether a boto3 error is a transient S3 error that may succeed on retry"""
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, (BotoConnectionError, HTTPClientError)):
+        return True
+    return isinstance(error, ClientError) and error_code(error) in TRANSIENT_ERROR_CODES
+
+
+def is_throttle_error(error: Exception) -> bool:
+    return isinstance(error, ClientError) and not isinstance(error, CircuitOpenError) \
+        and error_code(error) in THROTTLE_ERROR_CODES
+
+
+class CircuitOpenError(ClientError):
+    """Raised without calling S3 while a bucket's circuit is open.
+
+    It looks like the SlowDown S3 would most likely have answered, so code
+    already handling S3 errors treats it the same way; ``retry_after`` says
+    when the bucket will be tried again.
+    """
+
+    def __init__(self, bucket_name: str, retry_after: float, operation_name: str = "S3"):
+        super().__init__({
+            "Error": {"Code": "SlowDown", "Message": f"Bucket {bucket_name} is throttled, retry in {retry_after:.1f}s"},
+            "ResponseMetadata": {"HTTPStatusCode": 503},
+        }, operation_name)
+        self.bucket_name = bucket_name
+        self.retry_after = retry_after
+
+
+class RetryBudget:
+    """Token bucket capping the retries a worker makes.
+
+    Each retry takes a token and tokens come back at ``refill_rate`` per
+    second, so retries stay a bounded share of traffic: when S3 is
+    throttling everyone, an empty bucket turns retries into immediate
+    failures instead of piling more requests on.
+    """
+
+    def __init__(self, capacity: float = 100, refill_rate: float = 10.0):
+        self.capacity = max(0.0, float(capacity))
+        self.refill_rate = max(0.0, float(refill_rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.refill_rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens < tokens:
+                return False
+            self._tokens -= tokens
+            return True
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+    def stats(self) -> dict:
+        return {"tokens": round(self.tokens, 2), "capacity": self.capacity, "refill_rate": self.refill_rate}
+
+
+class CircuitBreaker:
+    """Throttling circuit for one bucket.
+
+    ``failure_threshold`` throttled responses in a row open the circuit,
+    and calls then fail fast for ``reset_timeout`` seconds. After that the
+    circuit is half-open: up to ``half_open_max_calls`` calls go through as
+    probes while the rest are still shed. A throttled probe reopens the
+    circuit, any other answer closes it.
+    """
+
+    def __init__(self, failure_threshold: int = 10, reset_timeout: float = 10.0, half_open_max_calls: int = 2):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = max(1, half_open_max_calls)
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    def allow(self) -> float:
+        """None when a call may go ahead, otherwise the seconds until the next try"""
+        with self._lock:
+            if self.state == CLOSED:
+                return None
+            if self.state == OPEN:
+                remaining = self.opened_at + self.reset_timeout - time.monotonic()
+                if remaining > 0:
+                    return remaining
+                self.state = HALF_OPEN
+                self._probes = 0
+            if self._probes < self.half_open_max_calls:
+                self._probes += 1
+                return None
+            return self.reset_timeout
+
+    def record(self, throttled: bool):
+        """Feed the outcome of an allowed call back into the circuit"""
+        with self._lock:
+            if not throttled:
+                self.failures = 0
+                if self.state == HALF_OPEN:
+                    self.state = CLOSED
+                return
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self._open()
+
+    def release(self):
+        """An allowed call ended without an answer from S3 (e.g. a connection error)"""
+        with self._lock:
+            if self.state == HALF_OPEN and self._probes:
+                self._probes -= 1
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+
+    @property
+    def idle(self) -> bool:
+        return self.state == CLOSED and self.failures == 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {"state": self.state, "consecutive_throttles": self.failures, "times_opened": self.times_opened}
+            if self.state == OPEN:
+                stats["retry_after"] = round(max(0.0, self.opened_at + self.reset_timeout - time.monotonic()), 2)
+        return stats
+
+
+class RetryPolicy:
+    """Retry rules shared by every S3 call a worker makes.
+
+    Transient errors are retried after a decorrelated-jitter backoff: each
+    wait is drawn between ``base_delay`` and three times the previous wait,
+    capped at ``max_delay``, so workers that failed together don't retry
+    together. Every retry also needs a token from the worker's
+    ``RetryBudget``, and calls to a bucket whose ``CircuitBreaker`` is open
+    fail fast with ``CircuitOpenError``.
+    """
+
+    def __init__(self, base_delay: float = 0.1, max_delay: float = 20.0, budget: RetryBudget = None,
+                 failure_threshold: int = 10, reset_timeout: float = 10.0, half_open_max_calls: int = 2):
+        self.base_delay = max(0.0, base_delay)
+        self.max_delay = max(self.base_delay, max_delay)
+        self.budget = budget or RetryBudget()
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, bucket_name: str) -> CircuitBreaker:
+        """The circuit for a bucket, or None for calls not aimed at one"""
+        if not bucket_name:
+            return None
+        breaker = self._breakers.get(bucket_name)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(bucket_name)
+                if breaker is None:
+                    if len(self._breakers) >= MAX_TRACKED_BUCKETS:
+                        for name in [name for name, b in self._breakers.items() if b.idle]:
+                            del self._breakers[name]
+                    breaker = self._breakers[bucket_name] = CircuitBreaker(
+                        self.failure_threshold, self.reset_timeout, self.half_open_max_calls
+                    )
+        return breaker
+
+    def next_delay(self, previous: float) -> float:
+        return min(self.max_delay, random.uniform(self.base_delay, max(self.base_delay, previous * 3)))
+
+    def _admit(self, breaker: CircuitBreaker, bucket_name: str, operation: str):
+        if breaker is None:
+            return
+        retry_after = breaker.allow()
+        if retry_after is not None:
+            S3_CIRCUIT_REJECTIONS.inc(bucket=bucket_name)
+            raise CircuitOpenError(bucket_name, retry_after, operation)
+
+    def _on_error(self, breaker: CircuitBreaker, error: Exception, attempt: int, max_retries: int,
+                  previous: float, operation: str, description: str, record: bool = True) -> float:
+        """Record a failed attempt and return the wait before the next one, or None to give up"""
+        if breaker is not None and record:
+            if isinstance(error, ClientError):
+                breaker.record(is_throttle_error(error))
+            else:
+                breaker.release()
+        if not is_transient_error(error) or attempt >= max_retries:
+            return None
+        if breaker is not None and breaker.state == OPEN:
+            return None
+        code = error_code(error)
+        if not self.budget.try_acquire():
+            S3_RETRY_BUDGET_EXHAUSTED.inc(operation=operation)
+            logger.warning("S3 retry budget exhausted, not retrying", extra={"fields": {
+                "operation": description, "error_code": code
+            }})
+            return None
+        delay = self.next_delay(previous)
+        S3_RETRIES.inc(operation=operation, error_code=code)
+        logger.warning("Transient S3 error, retrying", extra={"fields": {
+            "operation": description, "error_code": code, "retry": attempt + 1, "wait_s": round(delay, 3)
+        }})
+        return delay
+
+    def call(self, func, bucket_name: str, operation: str, description: str = None, max_retries: int = 3,
+             on_retry=None):
+        """Call ``func()`` under the policy, sleeping between attempts.
+
+        ``on_retry`` runs before each retry, e.g. to rewind a file object.
+        """
+        breaker = self.breaker(bucket_name)
+        delay = self.base_delay
+        attempt = 0
+        while True:
+            self._admit(breaker, bucket_name, operation)
+            try:
+                result = func()
+            except Exception as e:
+                delay = self._on_error(breaker, e, attempt, max_retries, delay, operation, description or operation)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                if on_retry is not None:
+                    on_retry()
+                attempt += 1
+                continue
+            if breaker is not None:
+                breaker.record(False)
+            return result
+
+    async def call_async(self, func, bucket_name: str, operation: str, description: str = None,
+                         max_retries: int = 3, on_retry=None, circuit_applied: bool = False):
+        """Await ``func()`` under the policy, waiting between attempts with ``asyncio.sleep``.
+
+        Set ``circuit_applied`` when each attempt already goes through the
+        bucket's circuit, e.g. an S3Client method called with
+        ``max_retries=0``, so attempts aren't admitted and counted twice.
+        """
+        breaker = self.breaker(bucket_name)
+        delay = self.base_delay
+        attempt = 0
+        while True:
+            if not circuit_applied:
+                self._admit(breaker, bucket_name, operation)
+            try:
+                result = await func()
+            except Exception as e:
+                delay = self._on_error(breaker, e, attempt, max_retries, delay, operation, description or operation,
+                                       record=not circuit_applied)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                if on_retry is not None:
+                    on_retry()
+                attempt += 1
+                continue
+            if breaker is not None and not circuit_applied:
+                breaker.record(False)
+            return result
+
+    def circuit_states(self) -> dict:
+        with self._lock:
+            breakers = list(self._breakers.items())
+        return {name: breaker.state for name, breaker in breakers}
+
+    def stats(self) -> dict:
+        with self._lock:
+            breakers = list(self._breakers.items())
+        return {
+            "budget": self.budget.stats(),
+            "circuits": {name: breaker.stats() for name, breaker in breakers if not breaker.idle},
+        }
+
+
+_policy = None
+_policy_lock = threading.Lock()
+
+def get_retry_policy() -> RetryPolicy:
+    """Get the process-wide retry policy"""
+    global _policy
+    if _policy is None:
+        with _policy_lock:
+            if _policy is None:
+                settings = get_settings()
+                _policy = RetryPolicy(
+                    base_delay=settings.s3_retry_base_delay,
+                    max_delay=settings.s3_retry_max_delay,
+                    budget=RetryBudget(settings.s3_retry_budget, settings.s3_retry_budget_refill),
+                    failure_threshold=settings.s3_circuit_failure_threshold,
+                    reset_timeout=settings.s3_circuit_reset_timeout,
+                    half_open_max_calls=settings.s3_circuit_half_open_calls,
+                )
+    return _policy
+
+@on_settings_reload
+def reset_retry_policy():
+    """Drop the budget and circuit state; runs on reset_settings"""
+    global _policy
+    with _policy_lock:
+        _policy = None
@@ -1,144 +1,385 @@
 import time
+import hashlib
+import threading
+from collections import OrderedDict
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import ClientError
 from fastapi import HTTPException
-from config import get_settings
+from config import get_settings, on_settings_reload
+from src.services.retry_policy import CircuitOpenError, get_retry_policy, error_code
 from src.utils.logger import StructuredLogger
+from src.utils.metrics import instrument_s3_client
+import functools
 import logging
 
 logger = logging.getLogger(__name__)
 
+# S3 multipart limits
+MIN_PART_SIZE = 5 * 1024 * 1024  # non-final parts smaller than 5MB are rejected
+MAX_PARTS = 10000
+
+def choose_part_size(file_size: int, preferred_part_size: int) -> int:
+    """Smallest part size >= the preferred one that keeps the upload within MAX_PARTS"""
+    part_size = max(preferred_part_size, MIN_PART_SIZE)
+    if file_size > part_size * MAX_PARTS:
+        mb = 1024 * 1024
+        part_size = -(-file_size // MAX_PARTS)
+        # Round up to a whole MB to keep part boundaries tidy
+        part_size = -(-part_size // mb) * mb
+    return part_size
+
+def build_transfer_config(settings, file_size: int = None, plan: tuple = None) -> TransferConfig:
+    """boto3 transfer settings for upload_fileobj.
+
+    ``plan`` is a ``(part_size, concurrency)`` pair, e.g. from the adaptive
+    tuner; without one the configured part size and concurrency are used.
+    """
+    part_size, concurrency = plan or (settings.upload_part_size, settings.upload_max_in_flight_parts)
+    if file_size:
+        part_size = choose_part_size(file_size, part_size)
+    return TransferConfig(
+        multipart_threshold=max(settings.upload_multipart_threshold, MIN_PART_SIZE),
+        multipart_chunksize=max(part_size, MIN_PART_SIZE),
+        max_concurrency=max(1, min(concurrency, settings.upload_worker_max_parts)),
+        max_io_queue=settings.upload_io_queue_depth,
+    )
+
+def stream_size(file_obj) -> int:
+    """Remaining bytes in a seekable file object, or None when it can't be told"""
+    try:
+        position = file_obj.tell()
+        size = file_obj.seek(0, 2) - position
+        file_obj.seek(position)
+        return size
+    except (AttributeError, OSError, ValueError):
+        return None
+
+def format_listing_page(response: dict, prefix: str = "") -> dict:
+    """Turn a raw list_objects_v2 page into folder and file entries"""
+    folders = [{"name": obj["Prefix"].rstrip("/").split("/")[-1], 
+               "prefix": obj["Prefix"]} 
+              for obj in response.get("CommonPrefixes", [])]
+    
+    files = [{"name": obj["Key"].split("/")[-1], 
+             "key": obj["Key"], 
+             "size": obj["Size"], 
+             "last_modified": obj["LastModified"].isoformat()} 
+            for obj in response.get("Contents", []) 
+            if obj["Key"] != prefix]  # Exclude the prefix itself if it's a file
+    
+    return {"folders": folders, "files": files}
+
+def buckets_error(error: Exception) -> HTTPException:
+    """The HTTP error reported when listing buckets failed"""
+    if isinstance(error, ClientError):
+        error_msg = error.response.get("Error", {}).get("Message", "Unknown error")
+        logger.error(f"AWS ClientError listing buckets - Code: {error_code(error)}, Message: {error_msg}")
+        return HTTPException(status_code=401, detail=f"AWS authentication failed: {error_msg}")
+    logger.error(f"Failed to list buckets: {type(error).__name__}: {error}", exc_info=error)
+    return HTTPException(status_code=500, detail=f"Failed to list buckets: {str(error)}")
+
+def listing_error(error: Exception, bucket_name: str, prefix: str) -> HTTPException:
+    """The HTTP error reported when listing objects failed; CircuitOpenError is left to its own handler"""
+    if isinstance(error, ClientError):
+        code = error_code(error)
+        error_msg = error.response.get("Error", {}).get("Message", "Unknown error")
+        logger.error(f"AWS ClientError listing {bucket_name}/{prefix} - Code: {code}, Message: {error_msg}")
+        status_code = {"NoSuchBucket": 404, "AccessDenied": 403}.get(code, 500)
+        return HTTPException(status_code=status_code, detail=f"Failed to list objects: {error_msg}")
+    logger.error(f"Failed to list objects in {bucket_name}/{prefix}: {error}")
+    return HTTPException(status_code=500, detail=f"Failed to list objects: {str(error)}")
+
+def failed_batch(bucket_name: str, file_keys: list, error: Exception) -> dict:
+    """delete_objects result for a batch whose request failed as a whole"""
+    logger.error(f"Failed to delete batch of {len(file_keys)} keys from {bucket_name}: {error}")
+    return {"deleted": [], "failed": [{"key": key, "error": str(error)} for key in file_keys]}
+
+# Returned by get_object_metadata when the object can't be read
+DEFAULT_METADATA = {"ContentType": "application/octet-stream"}
+
+def credentials_fingerprint(settings) -> tuple:
+    """Identify the credentials, region and endpoint without keeping the raw secret"""
+    # Hash the secret so a corrected secret for the same access key is told apart
+    secret_hash = hashlib.sha256(settings.aws_secret_access_key.encode()).hexdigest()
+    return (settings.aws_access_key_id, secret_hash, settings.aws_region, settings.aws_endpoint_url_s3)
+
+class S3ClientRegistry:
+    """Shares boto3 S3 clients between requests.
+
+    boto3 clients are thread-safe and own an urllib3 connection pool, so one
+    client per (credentials, region, endpoint) is reused across requests
+    instead of being rebuilt each time. Entries are evicted least recently
+    used first once ``max_size`` is reached, and after ``idle_ttl`` seconds
+    without use, so per-request credentials from the X-AWS-* headers don't
+    accumulate.
+    """
+    
+    def __init__(self, max_size: int = 32, idle_ttl: float = 900, max_pool_connections: int = 50):
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self.max_pool_connections = max_pool_connections
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, settings):
+        """Return the shared client for these settings, creating it if needed"""
+        key = credentials_fingerprint(settings)
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._clients.get(key)
+            if entry is not None:
+                entry[1] = now
+                self._clients.move_to_end(key)
+                return entry[0]
+            
+            client = instrument_s3_client(boto3.session.Session().client(
+                "s3",
+                region_name=settings.aws_region,
+                aws_access_key_id=settings.aws_access_key_id,
+                aws_secret_access_key=settings.aws_secret_access_key,
+                endpoint_url=settings.aws_endpoint_url_s3 or None,
+                # Retries are left to the shared RetryPolicy, which also sees throttling per bucket
+                config=Config(max_pool_connections=self.max_pool_connections, retries={"mode": "standard", "max_attempts": 1}),
+            ))
+            self._clients[key] = [client, now]
+            while len(self._clients) > self.max_size:
+                self._clients.popitem(last=False)
+            return client
+    
+    def _evict_idle(self, now: float):
+        expired = [key for key, (_, last_used) in self._clients.items() if now - last_used > self.idle_ttl]
+        for key in expired:
+            del self._clients[key]
+    
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+    
+    def __len__(self) -> int:
+        return len(self._clients)
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_client_registry() -> S3ClientRegistry:
+    """Get the process-wide S3 client registry"""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                settings = get_settings()
+                _registry = S3ClientRegistry(
+                    max_size=settings.s3_client_cache_size,
+                    idle_ttl=settings.s3_client_idle_ttl,
+                    max_pool_connections=settings.s3_max_pool_connections,
+                )
+    return _registry
+
+@on_settings_reload
+def reset_client_registry():
+    """Drop all pooled clients; runs on reset_settings"""
+    global _registry
+    with _registry_lock:
+        _registry = None
+
 class S3Client:
     def __init__(self, settings=None):
         if settings is None:
             settings = get_settings()
         self.settings = settings
-        self.s3 = boto3.client(
-            "s3",
-            region_name=settings.aws_region,
-            aws_access_key_id=settings.aws_access_key_id,
-            aws_secret_access_key=settings.aws_secret_access_key,
-        )
+        self.s3 = get_client_registry().get(settings)
     
-    def upload_file(self, file_obj, file_key: str, request_id: str, max_retries: int = 3) -> dict:
-        """Upload file to S3 with exponential backoff retry logic"""
-        retry_count = 0
-        
-        while retry_count <= max_retries:
-            try:
-                self.s3.upload_fileobj(
-                    file_obj,
-                    self.settings.s3_bucket_name,
-                    file_key,
-                    ExtraArgs={"Metadata": {"request-id": request_id}}
-                )
-                StructuredLogger.log_upload_success(request_id, file_key, file_key)
-                return {"success": True, "s3_key": file_key}
-            
-            except ClientError as e:
-                error_code = e.response.get("Error", {}).get("Code", "Unknown")
-                
-                # Exponential backoff for transient errors
-                if error_code in ["ThrottlingException", "InternalError", "ServiceUnavailable"]:
-                    if retry_count < max_retries:
-                        wait_time = 2 ** retry_count
-                        logger.warning(f"Transient error {error_code}, retrying in {wait_time}s")
-                        time.sleep(wait_time)
-                        retry_count += 1
-                        continue
-                
-                StructuredLogger.log_upload_error(request_id, file_key, str(e), retry_count)
-                return {"success": False, "error": str(e), "retries": retry_count}
-            
-            except Exception as e:
-                StructuredLogger.log_upload_error(request_id, file_key, str(e), retry_count)
-                return {"success": False, "error": str(e), "retries": retry_count}
-        
-        return {"success": False, "error": "Max retries exceeded", "retries": retry_count}
+    def upload_file(self, file_obj, file_key: str, request_id: str, max_retries: int = 3,
+                    transfer_config: TransferConfig = None) -> dict:
+        """Upload file to the configured bucket, retrying transient errors under the shared retry policy"""
+        return self.upload_file_to_bucket(file_obj, self.settings.s3_bucket_name, file_key, request_id, max_retries,
+                                          transfer_config)
     
-    def list_buckets(self) -> list:
-        """List all S3 buckets for the account"""
+    def list_buckets(self, max_retries: int = 3, raise_errors: bool = False) -> list:
+        """List all S3 buckets for the account.
+
+        Errors become HTTPExceptions unless ``raise_errors`` is set, which
+        lets a caller doing its own retries see the original error.
+        """
         try:
-            response = self.s3.list_buckets()
-            buckets = [{"name": bucket["Name"], "creation_date": bucket["CreationDate"].isoformat()} 
-                      for bucket in response.get("Buckets", [])]
-            return buckets
-        except ClientError as e:
-            error_code = e.response.get("Error", {}).get("Code", "Unknown")
-            error_msg = e.response.get("Error", {}).get("Message", "Unknown error")
-            logger.error(f"AWS ClientError listing buckets - Code: {error_code}, Message: {error_msg}")
-            raise HTTPException(status_code=401, detail=f"AWS authentication failed: {error_msg}")
+            response = self._call_with_retries(self.s3.list_buckets, "list_buckets", max_retries)
         except Exception as e:
-            logger.error(f"Failed to list buckets: {type(e).__name__}: {e}", exc_info=True)
-            raise HTTPException(status_code=500, detail=f"Failed to list buckets: {str(e)}")
+            if raise_errors:
+                raise
+            raise buckets_error(e)
+        return [{"name": bucket["Name"], "creation_date": bucket["CreationDate"].isoformat()}
+                for bucket in response.get("Buckets", [])]
     
-    def list_objects(self, bucket_name: str, prefix: str = "", delimiter: str = "/") -> dict:
-        """List objects in a bucket with optional prefix (for folder navigation)"""
+    def list_objects(self, bucket_name: str, prefix: str = "", delimiter: str = "/",
+                     page_size: int = 1000, continuation_token: str = None, max_retries: int = 3,
+                     raise_errors: bool = False) -> dict:
+        """List one page of objects in a bucket with optional prefix (for folder navigation)"""
         try:
-            params = {
-                "Bucket": bucket_name,
-                "Delimiter": delimiter
-            }
-            if prefix:
-                params["Prefix"] = prefix
-            
-            response = self.s3.list_objects_v2(**params)
-            
-            folders = [{"name": obj["Prefix"].rstrip("/").split("/")[-1], 
-                       "prefix": obj["Prefix"]} 
-                      for obj in response.get("CommonPrefixes", [])]
-            
-            files = [{"name": obj["Key"].split("/")[-1], 
-                     "key": obj["Key"], 
-                     "size": obj["Size"], 
-                     "last_modified": obj["LastModified"].isoformat()} 
-                    for obj in response.get("Contents", []) 
-                    if obj["Key"] != prefix]  # Exclude the prefix itself if it's a file
-            
-            return {
-                "folders": folders,
-                "files": files,
-                "current_prefix": prefix
-            }
+            response = self.list_objects_page(bucket_name, prefix, delimiter, continuation_token, page_size, max_retries)
+        except CircuitOpenError:
+            raise
         except Exception as e:
-            logger.error(f"Failed to list objects in {bucket_name}/{prefix}: {e}")
-            return {"folders": [], "files": [], "current_prefix": prefix}
+            if raise_errors:
+                raise
+            raise listing_error(e, bucket_name, prefix)
+        
+        listing = format_listing_page(response, prefix)
+        return {
+            "folders": listing["folders"],
+            "files": listing["files"],
+            "current_prefix": prefix,
+            "next_token": response.get("NextContinuationToken") if response.get("IsTruncated") else None,
+            "is_truncated": bool(response.get("IsTruncated"))
+        }
     
-    def upload_file_to_bucket(self, file_obj, bucket_name: str, file_key: str, request_id: str, max_retries: int = 3) -> dict:
-        """Upload file to a specific S3 bucket with exponential backoff retry logic"""
-        retry_count = 0
+    def upload_file_to_bucket(self, file_obj, bucket_name: str, file_key: str, request_id: str, max_retries: int = 3,
+                              transfer_config: TransferConfig = None, content_type: str = None) -> dict:
+        """Upload file to a specific S3 bucket, retrying transient errors under the shared retry policy"""
+        if transfer_config is None:
+            transfer_config = build_transfer_config(self.settings, stream_size(file_obj))
+        extra_args = {"Metadata": {"request-id": request_id}}
+        if content_type:
+            extra_args["ContentType"] = content_type
+        retries = {"count": 0}
         
-        while retry_count <= max_retries:
-            try:
-                self.s3.upload_fileobj(
-                    file_obj,
-                    bucket_name,
-                    file_key,
-                    ExtraArgs={"Metadata": {"request-id": request_id}}
-                )
-                StructuredLogger.log_upload_success(request_id, file_key, file_key)
-                return {"success": True, "s3_key": file_key}
-            
-            except ClientError as e:
-                error_code = e.response.get("Error", {}).get("Code", "Unknown")
-                
-                # Exponential backoff for transient errors
-                if error_code in ["ThrottlingException", "InternalError", "ServiceUnavailable"]:
-                    if retry_count < max_retries:
-                        wait_time = 2 ** retry_count
-                        logger.warning(f"Transient error {error_code}, retrying in {wait_time}s")
-                        time.sleep(wait_time)
-                        retry_count += 1
-                        continue
-                
-                StructuredLogger.log_upload_error(request_id, file_key, str(e), retry_count)
-                return {"success": False, "error": str(e), "retries": retry_count}
-            
-            except Exception as e:
-                StructuredLogger.log_upload_error(request_id, file_key, str(e), retry_count)
-                return {"success": False, "error": str(e), "retries": retry_count}
+        def rewind():
+            retries["count"] += 1
+            file_obj.seek(0)
         
-        return {"success": False, "error": "Max retries exceeded", "retries": retry_count}
+        try:
+            get_retry_policy().call(
+                functools.partial(self.s3.upload_fileobj, file_obj, bucket_name, file_key,
+                                  ExtraArgs=extra_args, Config=transfer_config),
+                bucket_name, "upload_fileobj", f"upload_fileobj {file_key}", max_retries, on_retry=rewind,
+            )
+        except Exception as e:
+            StructuredLogger.log_upload_error(request_id, file_key, str(e), retries["count"])
+            return {"success": False, "error": str(e), "retries": retries["count"]}
+        StructuredLogger.log_upload_success(request_id, file_key, file_key)
+        return {"success": True, "s3_key": file_key}
+    
+    def _call_with_retries(self, operation, description: str, max_retries: int = 3, **kwargs):
+        """Call a boto3 operation under the shared retry policy, keyed by its ``Bucket``"""
+        return get_retry_policy().call(
+            functools.partial(operation, **kwargs), kwargs.get("Bucket"), operation.__name__, description, max_retries
+        )
+    
+    def put_object(self, bucket_name: str, file_key: str, body: bytes, request_id: str, content_type: str = None,
+                   max_retries: int = 3, metadata: dict = None, content_encoding: str = None) -> dict:
+        """Upload a small in-memory object with a single PUT"""
+        params = {
+            "Bucket": bucket_name,
+            "Key": file_key,
+            "Body": body,
+            "Metadata": {**(metadata or {}), "request-id": request_id},
+        }
+        if content_type:
+            params["ContentType"] = content_type
+        if content_encoding:
+            params["ContentEncoding"] = content_encoding
+        return self._call_with_retries(self.s3.put_object, f"put_object {file_key}", max_retries, **params)
+    
+    def create_multipart_upload(self, bucket_name: str, file_key: str, request_id: str, content_type: str = None,
+                                max_retries: int = 3, metadata: dict = None, content_encoding: str = None) -> str:
+        """Start a multipart upload and return its upload id"""
+        params = {
+            "Bucket": bucket_name,
+            "Key": file_key,
+            "Metadata": {**(metadata or {}), "request-id": request_id},
+        }
+        if content_type:
+            params["ContentType"] = content_type
+        if content_encoding:
+            params["ContentEncoding"] = content_encoding
+        response = self._call_with_retries(self.s3.create_multipart_upload, f"create_multipart_upload {file_key}", max_retries, **params)
+        return response["UploadId"]
+    
+    def upload_part(self, bucket_name: str, file_key: str, upload_id: str, part_number: int, body: bytes, max_retries: int = 3) -> dict:
+        """Upload a single part of a multipart upload"""
+        response = self._call_with_retries(
+            self.s3.upload_part,
+            f"upload_part {file_key}#{part_number}",
+            max_retries,
+            Bucket=bucket_name,
+            Key=file_key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=body,
+        )
+        return {"PartNumber": part_number, "ETag": response["ETag"]}
+    
+    def upload_part_copy(self, source_bucket: str, source_key: str, bucket_name: str, file_key: str,
+                         upload_id: str, part_number: int, byte_range: str, max_retries: int = 3) -> dict:
+        """Copy a byte range of an existing object into one part of a multipart upload"""
+        response = self._call_with_retries(
+            self.s3.upload_part_copy,
+            f"upload_part_copy {file_key}#{part_number}",
+            max_retries,
+            Bucket=bucket_name,
+            Key=file_key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            CopySource={"Bucket": source_bucket, "Key": source_key},
+            CopySourceRange=byte_range,
+        )
+        return {"PartNumber": part_number, "ETag": response["CopyPartResult"]["ETag"]}
+    
+    def copy_object(self, source_bucket: str, source_key: str, bucket_name: str, file_key: str,
+                    max_retries: int = 3, metadata: dict = None, content_type: str = None,
+                    content_encoding: str = None) -> dict:
+        """Server-side copy of an object up to 5GB with a single CopyObject request.
+
+        Metadata is copied from the source unless ``metadata`` is given, in
+        which case it (with ``content_type`` and ``content_encoding``)
+        replaces the source's.
+        """
+        params = {
+            "Bucket": bucket_name,
+            "Key": file_key,
+            "CopySource": {"Bucket": source_bucket, "Key": source_key},
+        }
+        if metadata is not None:
+            params["MetadataDirective"] = "REPLACE"
+            params["Metadata"] = metadata
+            if content_type:
+                params["ContentType"] = content_type
+            if content_encoding:
+                params["ContentEncoding"] = content_encoding
+        return self._call_with_retries(self.s3.copy_object, f"copy_object {source_key} -> {file_key}", max_retries, **params)
+    
+    def head_object(self, bucket_name: str, file_key: str, max_retries: int = 3) -> dict:
+        """Raw head_object; unlike get_object_metadata, errors propagate"""
+        return self._call_with_retries(self.s3.head_object, f"head_object {file_key}", max_retries,
+                                       Bucket=bucket_name, Key=file_key)
+    
+    def complete_multipart_upload(self, bucket_name: str, file_key: str, upload_id: str, parts: list, max_retries: int = 3) -> dict:
+        """Complete a multipart upload from its uploaded parts"""
+        return self._call_with_retries(
+            self.s3.complete_multipart_upload,
+            f"complete_multipart_upload {file_key}",
+            max_retries,
+            Bucket=bucket_name,
+            Key=file_key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": sorted(parts, key=lambda part: part["PartNumber"])},
+        )
+    
+    def abort_multipart_upload(self, bucket_name: str, file_key: str, upload_id: str, max_retries: int = 3,
+                               raise_errors: bool = False) -> bool:
+        """Abort a multipart upload so S3 discards its parts"""
+        try:
+            self._call_with_retries(self.s3.abort_multipart_upload, f"abort_multipart_upload {file_key}", max_retries,
+                                    Bucket=bucket_name, Key=file_key, UploadId=upload_id)
+            logger.info(f"Aborted multipart upload {upload_id} for {file_key}")
+            return True
+        except Exception as e:
+            if raise_errors:
+                raise
+            logger.error(f"Failed to abort multipart upload {upload_id} for {file_key}: {e}")
+            return False
     
     def generate_presigned_url_for_bucket(self, bucket_name: str, file_key: str, expiration: int = 3600) -> str:
         """Generate presigned URL for a specific bucket"""
@@ -153,29 +394,98 @@ class S3Client:
             logger.error(f"Failed to generate presigned URL: {e}")
             return ""
     
-    def download_file(self, bucket_name: str, file_key: str) -> bytes:
+    def generate_presigned_part_url(self, bucket_name: str, file_key: str, upload_id: str,
+                                    part_number: int, expiration: int = 3600) -> str:
+        """Generate a presigned URL the client can PUT one multipart part to"""
+        return self.s3.generate_presigned_url(
+            "upload_part",
+            Params={"Bucket": bucket_name, "Key": file_key, "UploadId": upload_id, "PartNumber": part_number},
+            ExpiresIn=expiration
+        )
+    
+    def list_parts(self, bucket_name: str, file_key: str, upload_id: str, max_retries: int = 3) -> list:
+        """List every part already uploaded to a multipart upload"""
+        parts = []
+        params = {"Bucket": bucket_name, "Key": file_key, "UploadId": upload_id}
+        while True:
+            page = self._call_with_retries(self.s3.list_parts, f"list_parts {file_key}", max_retries, **params)
+            parts.extend({"PartNumber": part["PartNumber"], "ETag": part["ETag"], "Size": part["Size"]}
+                         for part in page.get("Parts", []))
+            if not page.get("IsTruncated"):
+                return parts
+            params["PartNumberMarker"] = page["NextPartNumberMarker"]
+    
+    def download_file(self, bucket_name: str, file_key: str, max_retries: int = 3) -> bytes:
         """Download file from S3 bucket"""
         try:
-            response = self.s3.get_object(Bucket=bucket_name, Key=file_key)
+            response = self._call_with_retries(self.s3.get_object, f"get_object {file_key}", max_retries,
+                                               Bucket=bucket_name, Key=file_key)
             return response['Body'].read()
         except Exception as e:
             logger.error(f"Failed to download file {file_key} from {bucket_name}: {e}")
             raise e
     
-    def delete_object(self, bucket_name: str, file_key: str) -> bool:
+    def get_object(self, bucket_name: str, file_key: str, byte_range: str = None,
+                   if_none_match: str = None, if_modified_since=None, max_retries: int = 3) -> dict:
+        """Open an object for streaming; the caller reads and closes response['Body']"""
+        params = {"Bucket": bucket_name, "Key": file_key}
+        if byte_range:
+            params["Range"] = byte_range
+        if if_none_match:
+            params["IfNoneMatch"] = if_none_match
+        if if_modified_since:
+            params["IfModifiedSince"] = if_modified_since
+        return self._call_with_retries(self.s3.get_object, f"get_object {file_key}", max_retries, **params)
+    
+    def delete_object(self, bucket_name: str, file_key: str, max_retries: int = 3) -> bool:
         """Delete object from S3 bucket"""
         try:
-            self.s3.delete_object(Bucket=bucket_name, Key=file_key)
+            self._call_with_retries(self.s3.delete_object, f"delete_object {file_key}", max_retries,
+                                    Bucket=bucket_name, Key=file_key)
             logger.info(f"Successfully deleted {file_key} from {bucket_name}")
             return True
         except Exception as e:
             logger.error(f"Failed to delete {file_key} from {bucket_name}: {e}")
             raise e
     
-    def get_object_metadata(self, bucket_name: str, file_key: str) -> dict:
+    def delete_objects(self, bucket_name: str, file_keys: list, max_retries: int = 3, raise_errors: bool = False) -> dict:
+        """Delete up to 1000 objects with a single DeleteObjects request"""
+        try:
+            response = self._call_with_retries(
+                self.s3.delete_objects,
+                f"delete_objects {len(file_keys)} keys",
+                max_retries,
+                Bucket=bucket_name,
+                Delete={"Objects": [{"Key": key} for key in file_keys], "Quiet": False}
+            )
+        except Exception as e:
+            if raise_errors:
+                raise
+            return failed_batch(bucket_name, file_keys, e)
+        
+        deleted = [obj["Key"] for obj in response.get("Deleted", [])]
+        failed = [{"key": err["Key"], "error": f"{err.get('Code', 'Unknown')}: {err.get('Message', '')}"}
+                  for err in response.get("Errors", [])]
+        logger.info(f"Deleted {len(deleted)} objects from {bucket_name} ({len(failed)} failed)")
+        return {"deleted": deleted, "failed": failed}
+    
+    def list_objects_page(self, bucket_name: str, prefix: str = "", delimiter: str = "",
+                          continuation_token: str = None, max_keys: int = 1000, max_retries: int = 3) -> dict:
+        """Fetch one raw list_objects_v2 page; errors propagate to the caller"""
+        params = {"Bucket": bucket_name, "MaxKeys": max_keys}
+        if prefix:
+            params["Prefix"] = prefix
+        if delimiter:
+            params["Delimiter"] = delimiter
+        if continuation_token:
+            params["ContinuationToken"] = continuation_token
+        return self._call_with_retries(self.s3.list_objects_v2, f"list_objects_v2 {bucket_name}/{prefix}", max_retries, **params)
+    
+    def get_object_metadata(self, bucket_name: str, file_key: str, max_retries: int = 3,
+                            raise_errors: bool = False) -> dict:
         """Get object metadata from S3 bucket"""
         try:
-            response = self.s3.head_object(Bucket=bucket_name, Key=file_key)
+            response = self.head_object(bucket_name, file_key, max_retries)
             return {
                 'ContentType': response.get('ContentType', 'application/octet-stream'),
                 'ContentLength': response.get('ContentLength', 0),
@@ -183,5 +493,7 @@ class S3Client:
                 'ETag': response.get('ETag')
             }
         except Exception as e:
+            if raise_errors:
+                raise
             logger.error(f"Failed to get metadata for {file_key} from {bucket_name}: {e}")
-            return {'ContentType': 'application/octet-stream'}
+            return dict(DEFAULT_METADATA)
@@ -0,0 +1,262 @@
+import asyncio
+import hashlib
+import logging
+import time
+from fastapi import HTTPException
+from src.services.async_s3 import AsyncS3Client
+from src.services.s3_uploader import MIN_PART_SIZE
+from src.services.transfer_tuning import TransferTuner, get_part_upload_slots
+from src.services.dedup_index import DedupIndex, CONTENT_HASH_METADATA, find_duplicate
+from src.services.object_copy import copy_object
+from src.services.compression import StreamCompressor
+from src.utils.metrics import TRANSFER_BYTES, TRANSFERS_IN_FLIGHT
+
+logger = logging.getLogger(__name__)
+
+
+class StreamingUpload:
+    """Feed an S3 multipart upload from a stream of chunks.
+
+    Chunks are buffered until a part fills up; full parts are uploaded in the
+    background while the next one is being received. At most
+    ``max_in_flight`` parts are uploading at once, and ``write`` waits for a
+    free slot, so memory stays around ``part_size * (max_in_flight + 1)``
+    regardless of the object size. Objects smaller than one part are sent
+    with a single PUT when the stream completes.
+
+    Part uploads also share a per-worker cap (``upload_worker_max_parts``)
+    with every other upload, and each part's timing is reported to
+    ``tuner`` so adaptive sizing can follow the observed throughput.
+
+    With a ``dedup_index`` the content is hashed while it streams and the
+    hash is recorded in the index, and in the object's metadata whenever it
+    is known before the object is written (single PUTs and declared
+    hashes). Content that already exists in
+    the bucket is server-side copied instead of uploaded: for objects that
+    fit in one part the PUT is skipped, and when the client declares the
+    hash up front (``declared_sha256``) no part is sent at all. A declared
+    hash is always verified against the received bytes.
+
+    With a ``compressor`` each chunk is compressed on the S3 executor before
+    it is buffered, and the object is stored with the matching
+    ``Content-Encoding``. Size limits and the content hash still apply to
+    the uncompressed bytes.
+    """
+
+    def __init__(
+        self,
+        s3_client: AsyncS3Client,
+        bucket_name: str,
+        file_key: str,
+        request_id: str,
+        content_type: str = None,
+        part_size: int = 8 * 1024 * 1024,
+        max_in_flight: int = 4,
+        tuner: TransferTuner = None,
+        dedup_index: DedupIndex = None,
+        declared_sha256: str = None,
+        compressor: StreamCompressor = None,
+    ):
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.file_key = file_key
+        self.request_id = request_id
+        self.content_type = content_type
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.tuner = tuner
+        self.dedup_index = dedup_index
+        self.declared_sha256 = declared_sha256.lower() if declared_sha256 else None
+        self.compressor = compressor
+        self.content_encoding = compressor.encoding if compressor is not None else None
+        self.bytes_received = 0
+        self.bytes_stored = 0
+        self.upload_id = None
+        self.deduplicated_from = None
+        self._hash = hashlib.sha256() if dedup_index is not None or declared_sha256 else None
+        self._duplicate = None
+        self._duplicate_checked = False
+        self._buffer = bytearray()
+        self._parts = []
+        self._next_part_number = 1
+        self._tasks = set()
+        self._slots = asyncio.Semaphore(max(1, max_in_flight))
+        self._error = None
+        self._finished = False
+        TRANSFERS_IN_FLIGHT.inc(direction="upload")
+
+    async def write(self, data: bytes):
+        """Append a chunk, uploading any parts that are now full"""
+        self._raise_if_failed()
+        if not self._duplicate_checked:
+            self._duplicate_checked = True
+            if self.dedup_index is not None and self.declared_sha256:
+                self._duplicate = await find_duplicate(
+                    self.s3_client, self.dedup_index, self.bucket_name, self.declared_sha256
+                )
+        self.bytes_received += len(data)
+        TRANSFER_BYTES.inc(len(data), direction="upload")
+        if self._hash is not None:
+            self._hash.update(data)
+        if self._duplicate is not None:
+            return  # Content is already in the bucket; only hash what arrives
+        if self.compressor is not None:
+            data = await self.s3_client.run(self.compressor.compress, data)
+        await self._append(data)
+
+    async def _append(self, data: bytes):
+        self.bytes_stored += len(data)
+        self._buffer += data
+        while len(self._buffer) >= self.part_size:
+            part = bytes(self._buffer[:self.part_size])
+            del self._buffer[:self.part_size]
+            await self._submit_part(part)
+
+    async def complete(self) -> dict:
+        """Flush the remaining bytes and finish the upload"""
+        try:
+            return await self._complete()
+        finally:
+            self._mark_finished()
+
+    async def _complete(self) -> dict:
+        sha256 = self._hash.hexdigest() if self._hash is not None else None
+        if self.declared_sha256 and sha256 != self.declared_sha256:
+            raise HTTPException(status_code=400, detail="Content does not match the declared SHA-256")
+        if self._duplicate is None and self.upload_id is None and self.dedup_index is not None:
+            self._duplicate = await find_duplicate(self.s3_client, self.dedup_index, self.bucket_name, sha256)
+        if self._duplicate is not None:
+            return await self._copy_duplicate(sha256)
+        if self.compressor is not None:
+            await self._append(await self.s3_client.run(self.compressor.flush))
+
+        if self.upload_id is None:
+            response = await self.s3_client.put_object(
+                self.bucket_name,
+                self.file_key,
+                bytes(self._buffer),
+                self.request_id,
+                self.content_type,
+                metadata=self._hash_metadata(sha256),
+                content_encoding=self.content_encoding,
+            )
+            self._buffer = bytearray()
+            await self._record(sha256, response.get("ETag"))
+            return {"success": True, "s3_key": self.file_key}
+
+        if self._buffer:
+            part = bytes(self._buffer)
+            self._buffer = bytearray()
+            await self._submit_part(part)
+        await self._drain()
+        self._raise_if_failed()
+        response = await self.s3_client.complete_multipart_upload(
+            self.bucket_name,
+            self.file_key,
+            self.upload_id,
+            self._parts,
+        )
+        # Without a declared hash the metadata was written before the hash was known. The index
+        # still records it against this ETag, which find_duplicate accepts in place of metadata
+        await self._record(sha256, response.get("ETag"))
+        return {"success": True, "s3_key": self.file_key, "parts": len(self._parts)}
+
+    def _hash_metadata(self, sha256: str) -> dict:
+        return {CONTENT_HASH_METADATA: sha256} if sha256 and self.dedup_index is not None else None
+
+    async def _record(self, sha256: str, etag: str):
+        if self.dedup_index is not None:
+            await self.s3_client.run(
+                self.dedup_index.record, self.bucket_name, self.file_key, sha256, self.bytes_stored, etag
+            )
+
+    async def _copy_duplicate(self, sha256: str) -> dict:
+        """Point this key at existing identical content with a server-side copy"""
+        source = self._duplicate
+        self.deduplicated_from = source["key"]
+        # The copy keeps the stored bytes, and with them the source's encoding
+        self.content_encoding = source.get("content_encoding")
+        self.bytes_stored = source["size"]
+        self._buffer = bytearray()
+        if source["key"] == self.file_key:
+            return {"success": True, "s3_key": self.file_key, "deduplicated_from": source["key"]}
+
+        if source["size"] <= self.s3_client.settings.copy_multipart_threshold:
+            response = await self.s3_client.copy_object(
+                self.bucket_name, source["key"], self.bucket_name, self.file_key,
+                metadata={CONTENT_HASH_METADATA: sha256, "request-id": self.request_id},
+                content_type=self.content_type or source["content_type"],
+                content_encoding=source.get("content_encoding"),
+            )
+            etag = response["CopyObjectResult"]["ETag"]
+        else:
+            await copy_object(self.s3_client, self.bucket_name, source["key"], self.bucket_name, self.file_key)
+            etag = None  # Filled in by the next rebuild
+        await self._record(sha256, etag)
+        return {"success": True, "s3_key": self.file_key, "deduplicated_from": source["key"]}
+
+    async def abort(self):
+        """Discard buffered data and any parts already sent to S3"""
+        self._mark_finished()
+        self._buffer = bytearray()
+        await self._drain()
+        if self.upload_id is not None:
+            await self.s3_client.abort_multipart_upload(
+                self.bucket_name,
+                self.file_key,
+                self.upload_id,
+            )
+            self.upload_id = None
+
+    def _mark_finished(self):
+        if not self._finished:
+            self._finished = True
+            TRANSFERS_IN_FLIGHT.dec(direction="upload")
+
+    async def _submit_part(self, part: bytes):
+        if self.upload_id is None:
+            self.upload_id = await self.s3_client.create_multipart_upload(
+                self.bucket_name,
+                self.file_key,
+                self.request_id,
+                self.content_type,
+                metadata=self._hash_metadata(self.declared_sha256),
+                content_encoding=self.content_encoding,
+            )
+        await self._slots.acquire()
+        if self._error is not None:
+            self._slots.release()
+            raise self._error
+        part_number = self._next_part_number
+        self._next_part_number += 1
+        task = asyncio.create_task(self._upload_part(part_number, part))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _upload_part(self, part_number: int, part: bytes):
+        try:
+            async with get_part_upload_slots():
+                started = time.perf_counter()
+                result = await self.s3_client.upload_part(
+                    self.bucket_name,
+                    self.file_key,
+                    self.upload_id,
+                    part_number,
+                    part,
+                )
+                if self.tuner is not None:
+                    self.tuner.record_part(len(part), time.perf_counter() - started)
+            self._parts.append(result)
+        except Exception as e:
+            logger.error(f"Part {part_number} of {self.file_key} failed: {e}")
+            if self._error is None:
+                self._error = e
+        finally:
+            self._slots.release()
+
+    async def _drain(self):
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def _raise_if_failed(self):
+        if self._error is not None:
+            raise self._error
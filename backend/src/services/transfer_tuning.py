@@ -0,0 +1,120 @@
+import asyncio
+import threading
+import weakref
+from config import get_settings, on_settings_reload
+from src.services.s3_uploader import MIN_PART_SIZE, choose_part_size
+
+MB = 1024 * 1024
+
+# Adaptive mode sizes parts so each takes about this long at the observed rate:
+# slow links get small parts (cheap to retry), fast links big ones (fewer requests)
+TARGET_PART_SECONDS = 2.0
+
+# Weight of the newest sample in the per-part throughput average
+THROUGHPUT_SMOOTHING = 0.2
+
+
+class TransferTuner:
+    """Chooses multipart part size and concurrency for uploads.
+
+    With ``adaptive`` off the configured part size and concurrency are used
+    as-is. With it on, the part size follows the recently observed per-part
+    throughput (an exponential moving average fed by every uploaded part),
+    between ``MIN_PART_SIZE`` and ``max_part_size``, and the concurrency is
+    whatever keeps the buffered bytes within the configured
+    ``part_size * max_in_flight`` budget: small, slow parts run more in
+    parallel, large ones fewer. Either way the part size grows when needed
+    to keep the object within S3's 10,000 parts, and concurrency never
+    exceeds ``worker_max_parts``.
+    """
+
+    def __init__(self, part_size: int = 8 * MB, max_in_flight: int = 4, max_part_size: int = 64 * MB,
+                 worker_max_parts: int = 32, adaptive: bool = False):
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_part_size = max(max_part_size, self.part_size)
+        self.worker_max_parts = max(1, worker_max_parts)
+        self.adaptive = adaptive
+        self._throughput = None  # bytes per second for a single part
+        self._samples = 0
+        self._lock = threading.Lock()
+
+    def record_part(self, size: int, seconds: float):
+        """Feed the time one part upload took into the throughput estimate"""
+        if seconds <= 0 or size <= 0:
+            return
+        rate = size / seconds
+        with self._lock:
+            if self._throughput is None:
+                self._throughput = rate
+            else:
+                self._throughput += THROUGHPUT_SMOOTHING * (rate - self._throughput)
+            self._samples += 1
+
+    @property
+    def part_throughput(self) -> float:
+        return self._throughput
+
+    def plan(self, object_size: int = None) -> tuple:
+        """Return ``(part_size, concurrency)`` for an object of ``object_size`` bytes.
+
+        ``object_size`` may be an upper bound (e.g. the request's
+        Content-Length) when the exact size isn't known up front.
+        """
+        part_size = self.part_size
+        concurrency = self.max_in_flight
+
+        if self.adaptive and self._throughput is not None:
+            target = int(self._throughput * TARGET_PART_SECONDS)
+            target = -(-target // MB) * MB  # whole MBs
+            part_size = min(max(target, MIN_PART_SIZE), self.max_part_size)
+            concurrency = max(1, (self.part_size * self.max_in_flight) // part_size)
+
+        if object_size:
+            part_size = choose_part_size(object_size, part_size)
+            concurrency = min(concurrency, max(1, -(-object_size // part_size)))
+        return part_size, min(concurrency, self.worker_max_parts)
+
+    def stats(self) -> dict:
+        return {
+            "adaptive": self.adaptive,
+            "part_throughput": self._throughput,
+            "samples": self._samples,
+        }
+
+
+_tuner = None
+_tuner_lock = threading.Lock()
+_part_slots = weakref.WeakKeyDictionary()
+
+def get_transfer_tuner() -> TransferTuner:
+    """Get the process-wide transfer tuner"""
+    global _tuner
+    if _tuner is None:
+        with _tuner_lock:
+            if _tuner is None:
+                settings = get_settings()
+                _tuner = TransferTuner(
+                    part_size=settings.upload_part_size,
+                    max_in_flight=settings.upload_max_in_flight_parts,
+                    max_part_size=settings.upload_max_part_size,
+                    worker_max_parts=settings.upload_worker_max_parts,
+                    adaptive=settings.upload_adaptive,
+                )
+    return _tuner
+
+@on_settings_reload
+def reset_transfer_tuner():
+    """Drop the tuner and its throughput history; runs on reset_settings"""
+    global _tuner
+    with _tuner_lock:
+        _tuner = None
+        _part_slots.clear()
+
+def get_part_upload_slots() -> asyncio.Semaphore:
+    """Semaphore capping concurrent part uploads across every upload in this worker"""
+    loop = asyncio.get_running_loop()
+    slots = _part_slots.get(loop)
+    if slots is None:
+        slots = _part_slots[loop] = asyncio.Semaphore(max(1, get_settings().upload_worker_max_parts))
+    return slots
@@ -0,0 +1,492 @@
+import asyncio
+import functools
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from fastapi import HTTPException
+from config import get_settings, on_settings_reload
+from src.services.async_s3 import AsyncS3Client, get_s3_executor
+from src.utils.logger import timed
+
+logger = logging.getLogger(__name__)
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# Suffix of spool files still being received; they never belong to a queued job
+PARTIAL_SUFFIX = ".part"
+
+SPOOL_CHUNK_SIZE = 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    request_id TEXT NOT NULL,
+    bucket_name TEXT NOT NULL,
+    upload_path TEXT NOT NULL,
+    file_key TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    content_type TEXT,
+    compression TEXT,
+    declared_sha256 TEXT,
+    size INTEGER NOT NULL,
+    bytes_uploaded INTEGER NOT NULL DEFAULT 0,
+    custom_credentials INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    owner TEXT,
+    lease_expires REAL,
+    upload_id TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, created);
+"""
+
+# Columns added after the first release, with their types, for existing databases
+_ADDED_COLUMNS = (("owner", "TEXT"), ("lease_expires", "REAL"), ("upload_id", "TEXT"))
+
+_COLUMNS = (
+    "id", "status", "request_id", "bucket_name", "upload_path", "file_key", "filename", "content_type",
+    "compression", "declared_sha256", "size", "bytes_uploaded", "custom_credentials", "result", "error",
+    "created", "updated", "owner", "lease_expires", "upload_id",
+)
+
+
+class UploadJobStore:
+    """SQLite record of upload jobs, so queued uploads survive a restart.
+
+    Unfinished jobs carry the ``owner`` queue handling them and a
+    ``lease_expires`` time the owner keeps pushing forward. Several
+    processes can share one store; a job only changes hands once its
+    lease has run out.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            for column, column_type in _ADDED_COLUMNS:
+                if column not in columns:
+                    self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+
+    def create(self, job: dict):
+        now = time.time()
+        job = {"bytes_uploaded": 0, "custom_credentials": 0, "result": None, "error": None,
+               "created": now, "updated": now, **job}
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT INTO jobs ({','.join(_COLUMNS)}) VALUES ({','.join('?' * len(_COLUMNS))})",
+                tuple(job.get(column) for column in _COLUMNS)
+            )
+
+    def get(self, job_id: str) -> dict:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {','.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(zip(_COLUMNS, row)) if row is not None else None
+
+    def update(self, job_id: str, **fields):
+        fields["updated"] = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"UPDATE jobs SET {', '.join(f'{column} = ?' for column in fields)} WHERE id = ?",
+                (*fields.values(), job_id)
+            )
+
+    def expired(self, now: float) -> list:
+        """Queued or running jobs whose owner's lease has run out, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {','.join(_COLUMNS)} FROM jobs WHERE status IN (?, ?) "
+                "AND (lease_expires IS NULL OR lease_expires < ?) ORDER BY created",
+                (QUEUED, RUNNING, now)
+            ).fetchall()
+        return [dict(zip(_COLUMNS, row)) for row in rows]
+
+    def claim(self, job_id: str, owner: str, lease_expires: float, now: float) -> bool:
+        """Take over a job whose lease has run out and queue it again; False if someone else got it first"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET owner = ?, lease_expires = ?, status = ?, bytes_uploaded = 0, upload_id = NULL, "
+                "updated = ? "
+                "WHERE id = ? AND status IN (?, ?) AND (lease_expires IS NULL OR lease_expires < ?)",
+                (owner, lease_expires, QUEUED, now, job_id, QUEUED, RUNNING, now)
+            )
+        return cursor.rowcount == 1
+
+    def renew(self, owner: str, lease_expires: float):
+        """Extend the lease on every unfinished job of an owner"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE owner = ? AND status IN (?, ?)",
+                (lease_expires, owner, QUEUED, RUNNING)
+            )
+
+    def release(self, owner: str):
+        """Give up an owner's unfinished jobs so any queue can claim them at once"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET lease_expires = NULL WHERE owner = ? AND status IN (?, ?)",
+                (owner, QUEUED, RUNNING)
+            )
+
+    def unfinished_ids(self) -> set:
+        with self._lock:
+            rows = self._conn.execute("SELECT id FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)).fetchall()
+        return {row[0] for row in rows}
+
+    def prune(self, before: float) -> int:
+        """Forget finished jobs last updated before ``before``"""
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated < ?", (SUCCEEDED, FAILED, before)
+            )
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+async def _run_blocking(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_s3_executor(), functools.partial(func, *args, **kwargs))
+
+
+class SpoolFile:
+    """A request body being written to disk, off the event loop.
+
+    Bytes go to ``<path>.part`` and the file is renamed into place by
+    ``commit``, so a crash mid-request never leaves a spool file that looks
+    complete. While open, ``path`` is kept in ``receiving``; ``discard``
+    takes it out again, and after ``commit`` the job queue does on submit.
+    """
+
+    def __init__(self, path: str, receiving: set = None):
+        self.path = path
+        self.size = 0
+        self._file = None
+        self._receiving = receiving if receiving is not None else set()
+
+    async def open(self):
+        self._receiving.add(self.path)
+        self._file = await _run_blocking(open, self.path + PARTIAL_SUFFIX, "wb")
+
+    async def write(self, data: bytes):
+        with timed("spool"):
+            await _run_blocking(self._file.write, data)
+        self.size += len(data)
+
+    async def commit(self):
+        with timed("spool"):
+            await _run_blocking(self._file.close)
+            await _run_blocking(os.replace, self.path + PARTIAL_SUFFIX, self.path)
+
+    async def discard(self):
+        try:
+            if self._file is not None:
+                await _run_blocking(self._file.close)
+                await _run_blocking(_remove, self.path + PARTIAL_SUFFIX)
+        finally:
+            self._receiving.discard(self.path)
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def iter_spool_file(path: str, chunk_size: int = SPOOL_CHUNK_SIZE):
+    """Yield a spooled body in chunks, reading each on the executor"""
+    f = await _run_blocking(open, path, "rb")
+    try:
+        while True:
+            chunk = await _run_blocking(f.read, chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        await _run_blocking(f.close)
+
+
+class UploadJobQueue:
+    """Uploads spooled request bodies to S3 on a bounded pool of background workers.
+
+    Jobs are recorded in an ``UploadJobStore`` before they are queued,
+    leased to this queue for ``lease`` seconds and renewed while it runs.
+    On start, and then every third of a lease, the queue claims jobs whose
+    lease ran out, i.e. whose process died, so a crash only costs the work
+    in progress; the multipart upload the dead worker had open is aborted
+    before the job runs again. Other live processes sharing the store keep
+    their jobs and their spool files. Spool files are deleted once their
+    job finishes. Bodies still being received through ``spool`` are
+    touched on every renewal, so files no job owns are deleted once they
+    have gone untouched for a lease. Finished jobs are kept for
+    ``retention`` seconds for status lookups.
+
+    Credentials sent with a request are only held in memory; their jobs fail
+    on recovery instead of having secrets written to disk.
+
+    The ``handler`` passed to ``start`` does the upload: it is awaited with
+    the job, the settings to use, a callback taking the bytes uploaded so
+    far and a coroutine function to await with the multipart upload id once
+    S3 has issued one, and returns the job's result.
+    """
+
+    def __init__(self, store: UploadJobStore, spool_dir: str, workers: int = 4, max_queued: int = 1000,
+                 retention: float = 86400, lease: float = 60):
+        self.store = store
+        self.spool_dir = spool_dir
+        self.workers = max(1, workers)
+        self.max_queued = max(1, max_queued)
+        self.retention = retention
+        self.lease = max(1.0, lease)
+        # Unique per process and per queue, so a restarted process never mistakes old leases for its own
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.handler = None
+        self._queue = None
+        self._loop = None
+        self._tasks = []
+        self._credentials = {}
+        self._progress = {}
+        # Spool paths of bodies still being received, kept from orphan cleanup until submitted
+        self._receiving = set()
+        os.makedirs(spool_dir, exist_ok=True)
+
+    def spool_path(self, job_id: str) -> str:
+        return os.path.join(self.spool_dir, job_id)
+
+    def spool(self, job_id: str) -> "SpoolFile":
+        """A SpoolFile for a new job's body, left alone by spool cleanup until the job is submitted"""
+        return SpoolFile(self.spool_path(job_id), self._receiving)
+
+    @property
+    def depth(self) -> int:
+        """Jobs waiting for a worker"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def is_full(self) -> bool:
+        return self.depth >= self.max_queued
+
+    async def start(self, handler):
+        """Start the workers on the running loop and claim abandoned jobs; no-op when running"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop:
+            return
+        self.handler = handler
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        await self._recover()
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._maintain()))
+
+    async def stop(self):
+        """Stop the workers and release their jobs, which any queue, including this one, can then claim"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+        self._queue = None
+        await _run_blocking(self.store.release, self.owner)
+
+    async def _maintain(self):
+        """Renew this queue's leases and claim jobs abandoned by other processes"""
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                await _run_blocking(self.store.renew, self.owner, time.time() + self.lease)
+                await _run_blocking(self._touch_receiving, list(self._receiving))
+                await self._recover()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Upload job maintenance failed")
+
+    async def _recover(self):
+        """Claim abandoned jobs, abort the multipart uploads they left open and queue them"""
+        claimed = await _run_blocking(self._reclaim, frozenset(self._receiving))
+        for job, runnable in claimed:
+            if job["upload_id"]:
+                settings = self._credentials.get(job["id"]) or (None if job["custom_credentials"] else get_settings())
+                if settings is not None:
+                    await AsyncS3Client(settings=settings).abort_multipart_upload(
+                        job["bucket_name"], job["file_key"], job["upload_id"]
+                    )
+            if runnable:
+                self._queue.put_nowait(job["id"])
+
+    def _reclaim(self, receiving: frozenset) -> list:
+        """Claim every job whose lease ran out, as ``(job, runnable)`` pairs"""
+        now = time.time()
+        self.store.prune(now - self.retention)
+        claimed = []
+        for job in self.store.expired(now):
+            if not self.store.claim(job["id"], self.owner, now + self.lease, now):
+                continue
+            if job["custom_credentials"] and job["id"] not in self._credentials:
+                self._fail(job["id"], "Upload interrupted by a restart; credentials sent with the request are not kept")
+                claimed.append((job, False))
+            elif not os.path.exists(self.spool_path(job["id"])):
+                self._fail(job["id"], "Upload interrupted by a restart and its spooled body is missing")
+                claimed.append((job, False))
+            else:
+                claimed.append((job, True))
+        runnable = sum(1 for _, ok in claimed if ok)
+        if runnable:
+            logger.info("Recovered upload jobs", extra={"fields": {"jobs": runnable}})
+        self._clean_spool(now, receiving)
+        return claimed
+
+    def _touch_receiving(self, paths: list):
+        """Mark bodies this queue is receiving as live for other processes sharing the spool directory"""
+        for path in paths:
+            for name in (path + PARTIAL_SUFFIX, path):
+                try:
+                    os.utime(name)
+                except FileNotFoundError:
+                    pass
+
+    def _clean_spool(self, now: float, receiving: frozenset = frozenset()):
+        """Delete bodies no unfinished job owns once they've gone untouched for a lease.
+
+        Bodies this queue is receiving are skipped. Every queue touches the
+        bodies it is receiving on each renewal, however slowly the client
+        sends them, so another live process's bodies are never a lease old.
+        """
+        unfinished = self.store.unfinished_ids()
+        for name in os.listdir(self.spool_dir):
+            job_id = name[:-len(PARTIAL_SUFFIX)] if name.endswith(PARTIAL_SUFFIX) else name
+            if job_id in unfinished or self.spool_path(job_id) in receiving:
+                continue
+            path = os.path.join(self.spool_dir, name)
+            try:
+                if os.path.getmtime(path) < now - self.lease:
+                    _remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _fail(self, job_id: str, error: str):
+        self.store.update(job_id, status=FAILED, error=error)
+        _remove(self.spool_path(job_id))
+
+    async def submit(self, job: dict, settings=None):
+        """Record a job whose body is already at ``spool_path(job["id"])`` and queue it.
+
+        ``settings`` are only needed for request-specific credentials.
+        """
+        job = {**job, "status": QUEUED, "custom_credentials": int(settings is not None),
+               "owner": self.owner, "lease_expires": time.time() + self.lease}
+        if settings is not None:
+            self._credentials[job["id"]] = settings
+        try:
+            await _run_blocking(self.store.create, job)
+        except BaseException:
+            self._credentials.pop(job["id"], None)
+            await _run_blocking(_remove, self.spool_path(job["id"]))
+            raise
+        finally:
+            self._receiving.discard(self.spool_path(job["id"]))
+        try:
+            self._queue.put_nowait(job["id"])
+        except BaseException:
+            self._credentials.pop(job["id"], None)
+            await _run_blocking(self._fail, job["id"], "Upload job could not be queued")
+            raise
+
+    async def status(self, job_id: str) -> dict:
+        job = await _run_blocking(self.store.get, job_id)
+        if job is None:
+            return None
+        if job["id"] in self._progress:
+            job["bytes_uploaded"] = self._progress[job["id"]]
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    async def _work(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception(f"Upload job {job_id} crashed")
+
+    async def _run(self, job_id: str):
+        job = await _run_blocking(self.store.get, job_id)
+        if job is None or job["status"] != QUEUED or job["owner"] != self.owner:
+            return
+        await _run_blocking(self.store.update, job_id, status=RUNNING)
+        settings = self._credentials.get(job_id) or get_settings()
+        self._progress[job_id] = 0
+
+        def progress(bytes_uploaded: int):
+            self._progress[job_id] = bytes_uploaded
+
+        async def started(upload_id: str):
+            # Lets whoever reclaims the job after a crash abort this upload
+            await _run_blocking(self.store.update, job_id, upload_id=upload_id)
+
+        try:
+            result = await self.handler({**job, "spool_path": self.spool_path(job_id)}, settings, progress, started)
+        except asyncio.CancelledError:
+            # Shutting down: leave the job running so the next start re-queues it
+            self._progress.pop(job_id, None)
+            raise
+        except Exception as e:
+            error = e.detail if isinstance(e, HTTPException) else str(e)
+            await _run_blocking(self.store.update, job_id, status=FAILED, error=error,
+                                bytes_uploaded=self._progress.pop(job_id, 0))
+        else:
+            await _run_blocking(self.store.update, job_id, status=SUCCEEDED, result=json.dumps(result),
+                                bytes_uploaded=job["size"])
+            self._progress.pop(job_id, None)
+        self._credentials.pop(job_id, None)
+        await _run_blocking(_remove, self.spool_path(job_id))
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_upload_job_queue() -> UploadJobQueue:
+    """Get the process-wide upload job queue"""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                settings = get_settings()
+                _queue = UploadJobQueue(
+                    UploadJobStore(settings.upload_jobs_path),
+                    settings.upload_spool_dir,
+                    workers=settings.upload_job_workers,
+                    max_queued=settings.upload_job_max_queued,
+                    retention=settings.upload_job_retention,
+                    lease=settings.upload_job_lease,
+                )
+    return _queue
+
+@on_settings_reload
+def reset_upload_job_queue():
+    """Close the job store; runs on reset_settings; stop the queue first"""
+    global _queue
+    with _queue_lock:
+        if _queue is not None:
+            _queue.store.close()
+        _queue = None
@@ -0,0 +1,121 @@
+import multipart
+from multipart.exceptions import FormParserError
+from multipart.multipart import parse_options_header
+from fastapi import HTTPException, Request
+
+# Event kinds yielded by iter_form_events
+FIELD = "field"
+FILE_START = "file_start"
+FILE_DATA = "file_data"
+FILE_END = "file_end"
+
+MAX_FIELD_SIZE = 64 * 1024
+
+
+class _FormEventCollector:
+    """Collects python-multipart parser callbacks into a list of events"""
+
+    def __init__(self, charset: str):
+        self.charset = charset
+        self.events = []
+        self._header_name = b""
+        self._header_value = b""
+        self._disposition = b""
+        self._content_type = b""
+        self._field_name = ""
+        self._field_data = b""
+        self._is_file = False
+
+    def _decode(self, value: bytes) -> str:
+        try:
+            return value.decode(self.charset)
+        except (UnicodeDecodeError, LookupError):
+            return value.decode("latin-1")
+
+    def on_part_begin(self):
+        self._disposition = b""
+        self._content_type = b""
+        self._field_data = b""
+        self._is_file = False
+
+    def on_header_field(self, data: bytes, start: int, end: int):
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data: bytes, start: int, end: int):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        field = self._header_name.lower()
+        if field == b"content-disposition":
+            self._disposition = self._header_value
+        elif field == b"content-type":
+            self._content_type = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._disposition)
+        if b"name" not in options:
+            raise HTTPException(status_code=400, detail='Multipart part is missing the "name" parameter')
+        self._field_name = self._decode(options[b"name"])
+        if b"filename" in options:
+            self._is_file = True
+            content_type = self._decode(self._content_type) if self._content_type else None
+            self.events.append((FILE_START, self._field_name, self._decode(options[b"filename"]), content_type))
+
+    def on_part_data(self, data: bytes, start: int, end: int):
+        if self._is_file:
+            self.events.append((FILE_DATA, data[start:end]))
+            return
+        self._field_data += data[start:end]
+        if len(self._field_data) > MAX_FIELD_SIZE:
+            raise HTTPException(status_code=400, detail=f"Form field {self._field_name} is too large")
+
+    def on_part_end(self):
+        if self._is_file:
+            self.events.append((FILE_END,))
+        else:
+            self.events.append((FIELD, self._field_name, self._decode(self._field_data)))
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+        }
+
+
+async def iter_form_events(request: Request):
+    """Parse a multipart/form-data request body incrementally.
+
+    Yields (FIELD, name, value), (FILE_START, name, filename, content_type),
+    (FILE_DATA, chunk) and (FILE_END,) tuples as the body arrives, so file
+    contents never have to be held in memory or spooled to disk.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(status_code=400, detail="Request must be multipart/form-data")
+
+    charset = params.get(b"charset", b"utf-8")
+    if isinstance(charset, bytes):
+        charset = charset.decode("latin-1")
+
+    collector = _FormEventCollector(charset)
+    parser = multipart.MultipartParser(params[b"boundary"], collector.callbacks())
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            events, collector.events = collector.events, []
+            for event in events:
+                yield event
+
+        parser.finalize()
+    except FormParserError as e:
+        raise HTTPException(status_code=400, detail=f"Malformed multipart body: {e}")
+    for event in collector.events:
+        yield event
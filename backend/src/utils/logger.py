@@ -1,27 +1,209 @@
+import atexit
+import contextvars
+import copy
+import json
 import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
 import uuid
-from datetime import datetime
+from contextlib import contextmanager
+from datetime import datetime, timezone
 
 logger = logging.getLogger(__name__)
 
+# Per-request state shared by everything running on behalf of one request:
+# {"request_id": ..., "timings": {phase: seconds}}
+_request_context = contextvars.ContextVar("request_context", default=None)
+
+_listener = None
+
 def get_request_id() -> str:
     return str(uuid.uuid4())
 
-def setup_logging(log_level: str = "INFO"):
-    logging.basicConfig(
-        level=log_level,
-        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
-    )
+def bind_request_id(request_id: str):
+    """Attach a request id to the current request's log records"""
+    context = _request_context.get()
+    if context is not None:
+        context["request_id"] = request_id
+
+@contextmanager
+def timed(phase: str):
+    """Add the time spent in the block to the current request's ``phase`` total"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        context = _request_context.get()
+        if context is not None:
+            timings = context["timings"]
+            timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - start
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: the message, its ``fields`` extra and the request id in scope"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class SuccessSampler(logging.Filter):
+    """Keep only ``rate`` of the records logged with ``extra={"sample": True}``"""
+
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return not getattr(record, "sample", False) or random.random() < self.rate
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """Enqueue records without formatting them; the listener thread does that"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        # Resolve %-args now, in case they are mutated before the record is written
+        record.msg = record.getMessage()
+        record.args = None
+        context = _request_context.get()
+        if context is not None and not hasattr(record, "request_id"):
+            record.request_id = context.get("request_id")
+        return record
+
+
+def setup_logging(log_level: str = "INFO", log_format: str = "json", sample_rate: float = 1.0):
+    """Route all logging through a queue drained by a background writer thread.
+
+    Log calls only copy the record onto the queue; formatting and the
+    blocking write to stdout happen on the listener thread. Records logged
+    with ``extra={"sample": True}`` are kept at ``sample_rate`` and dropped
+    before they are ever queued.
+    """
+    global _listener
+    shutdown_logging()
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if log_format == "json" else logging.Formatter(
+        "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    ))
+    handler = _DeferredQueueHandler(queue.SimpleQueue())
+    handler.addFilter(SuccessSampler(sample_rate))
+
+    root = logging.getLogger()
+    for existing in [h for h in root.handlers if isinstance(h, logging.handlers.QueueHandler)]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(log_level)
+
+    _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+atexit.register(shutdown_logging)
+
+
+class RequestLoggingMiddleware:
+    """ASGI middleware writing one structured record per request.
+
+    The record carries the request id bound by the route, body bytes in
+    and out, the total duration and the time spent in each phase recorded
+    with ``timed`` (``validation``, ``s3``) plus ``response``, the time from
+    the response start to its last byte. Successful requests are sampled.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        context = {"request_id": None, "timings": {}}
+        token = _request_context.set(context)
+        start = time.perf_counter()
+        state = {"status": 500, "bytes_in": 0, "bytes_out": 0, "response_start": None}
+
+        async def receive_wrapper():
+            message = await receive()
+            if message["type"] == "http.request":
+                state["bytes_in"] += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+                state["response_start"] = time.perf_counter()
+            elif message["type"] == "http.response.body":
+                state["bytes_out"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            end = time.perf_counter()
+            timings = dict(context["timings"])
+            if state["response_start"] is not None:
+                timings["response"] = end - state["response_start"]
+            fields = {
+                "method": scope["method"],
+                "route": getattr(scope.get("route"), "path", scope["path"]),
+                "status": state["status"],
+                "bytes_in": state["bytes_in"],
+                "bytes_out": state["bytes_out"],
+                "duration_ms": round((end - start) * 1000, 2),
+                **{f"{phase}_ms": round(seconds * 1000, 2) for phase, seconds in timings.items()},
+            }
+            logger.log(
+                logging.INFO if state["status"] < 500 else logging.WARNING,
+                "Request handled",
+                extra={"fields": fields, "request_id": context["request_id"], "sample": state["status"] < 400},
+            )
+            _request_context.reset(token)
+
 
 class StructuredLogger:
     @staticmethod
     def log_upload_start(request_id: str, filename: str, file_size: int):
-        logger.info(f"Upload started | request_id={request_id} | filename={filename} | size_bytes={file_size}")
-    
+        logger.info("Upload started", extra={
+            "request_id": request_id, "sample": True,
+            "fields": {"filename": filename, "bytes": file_size},
+        })
+
     @staticmethod
-    def log_upload_success(request_id: str, filename: str, s3_key: str):
-        logger.info(f"Upload succeeded | request_id={request_id} | filename={filename} | s3_key={s3_key}")
-    
+    def log_upload_success(request_id: str, filename: str, s3_key: str, file_size: int = None, duration: float = None):
+        fields = {"filename": filename, "s3_key": s3_key}
+        if file_size is not None:
+            fields["bytes"] = file_size
+        if duration is not None:
+            fields["duration_ms"] = round(duration * 1000, 2)
+        logger.info("Upload succeeded", extra={"request_id": request_id, "sample": True, "fields": fields})
+
     @staticmethod
     def log_upload_error(request_id: str, filename: str, error: str, retry_count: int = 0):
-        logger.error(f"Upload failed | request_id={request_id} | filename={filename} | error={error} | retries={retry_count}")
+        logger.error("Upload failed", extra={
+            "request_id": request_id,
+            "fields": {"filename": filename, "error": error, "retries": retry_count},
+        })
@@ -0,0 +1,253 @@
+import time
+import threading
+from bisect import bisect_left
+
+# Seconds; covers fast metadata calls through multi-second transfers
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(labelnames: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _ShardedMetric:
+    """Base for metrics updated without locks on the hot path.
+
+    Each thread writes to its own shard; shards are only summed when the
+    metrics are scraped. The lock is taken once per thread, when its shard
+    is first created.
+    """
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        shard = getattr(self._local, "values", None)
+        if shard is None:
+            shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            self._local.values = shard
+        return shard
+
+    def _label_values(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def _header(self) -> list:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.type_name}"]
+
+
+class Counter(_ShardedMetric):
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        shard = self._shard()
+        key = self._label_values(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def values(self) -> dict:
+        totals = {}
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for key, value in list(shard.items()):
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def render(self) -> list:
+        lines = self._header()
+        for key, value in sorted(self.values().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """Up/down gauge, e.g. transfers in flight"""
+
+    type_name = "gauge"
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class CallbackMetric:
+    """Metric whose labelled values are read from a callback at scrape time"""
+
+    def __init__(self, name: str, help_text: str, callback, labelnames: tuple = (), type_name: str = "gauge"):
+        self.type_name = type_name
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.type_name}"]
+        for key, value in sorted(self.callback().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_ShardedMetric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        shard = self._shard()
+        key = self._label_values(labels)
+        state = shard.get(key)
+        if state is None:
+            # Per-bucket counts, then sum and count
+            state = shard[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        state[bisect_left(self.buckets, value)] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    def render(self) -> list:
+        totals = {}
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for key, state in list(shard.items()):
+                merged = totals.setdefault(key, [0] * len(state))
+                for i, value in enumerate(state):
+                    merged[i] += value
+
+        lines = self._header()
+        bounds = self.buckets + (float("inf"),)
+        for key, state in sorted(totals.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, state):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+REQUEST_LATENCY = registry.register(Histogram(
+    "http_request_duration_seconds", "Time to serve a request, including streamed bodies", ("method", "route", "status")
+))
+TRANSFER_BYTES = registry.register(Counter(
+    "s3_transfer_bytes_total", "Payload bytes moved between clients and S3", ("direction",)
+))
+TRANSFERS_IN_FLIGHT = registry.register(Gauge(
+    "s3_transfers_in_flight", "Uploads and downloads currently streaming", ("direction",)
+))
+S3_RETRIES = registry.register(Counter(
+    "s3_retries_total", "Retries of S3 operations after transient errors", ("operation", "error_code")
+))
+S3_RETRY_BUDGET_EXHAUSTED = registry.register(Counter(
+    "s3_retry_budget_exhausted_total", "Transient errors not retried because the retry budget was empty", ("operation",)
+))
+S3_CIRCUIT_REJECTIONS = registry.register(Counter(
+    "s3_circuit_rejections_total", "S3 calls failed fast because the bucket's circuit was open", ("bucket",)
+))
+S3_OPERATION_LATENCY = registry.register(Histogram(
+    "s3_operation_duration_seconds", "Latency of individual S3 API calls", ("operation",)
+))
+S3_OPERATION_ERRORS = registry.register(Counter(
+    "s3_operation_errors_total", "Failed S3 API calls", ("operation", "error_code")
+))
+
+
+def _before_call(context=None, **kwargs):
+    if context is not None:
+        context["metrics_start"] = time.perf_counter()
+
+
+def _after_call(http_response=None, parsed=None, model=None, context=None, **kwargs):
+    start = context.get("metrics_start") if context else None
+    if start is not None:
+        S3_OPERATION_LATENCY.observe(time.perf_counter() - start, operation=model.name)
+    if http_response is not None and http_response.status_code >= 300:
+        error_code = (parsed or {}).get("Error", {}).get("Code") or str(http_response.status_code)
+        S3_OPERATION_ERRORS.inc(operation=model.name, error_code=error_code)
+
+
+def _after_call_error(exception=None, context=None, event_name="", **kwargs):
+    operation = event_name.rsplit(".", 1)[-1]
+    start = context.get("metrics_start") if context else None
+    if start is not None:
+        S3_OPERATION_LATENCY.observe(time.perf_counter() - start, operation=operation)
+    S3_OPERATION_ERRORS.inc(operation=operation, error_code=type(exception).__name__)
+
+
+def instrument_s3_client(client):
+    """Record per-operation latency and errors through botocore event hooks"""
+    client.meta.events.register("before-call.s3", _before_call)
+    client.meta.events.register("after-call.s3", _after_call)
+    client.meta.events.register("after-call-error.s3", _after_call_error)
+    return client
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing each request until its response body is fully sent"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Use the route template, not the raw path, to keep label cardinality bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - start,
+                method=scope["method"],
+                route=route,
+                status=str(status["code"])
+            )
@@ -0,0 +1,78 @@
+"""Sync a local directory tree to an S3 bucket prefix.
+
+Uses the same settings (.env / environment) as the API server:
+
+    python sync.py ./reports s3://my-bucket/reports/2024 --delete
+    python sync.py ./reports my-bucket/reports --compare etag --dry-run
+"""
+import argparse
+import sys
+from botocore.exceptions import BotoCoreError, ClientError
+from config import get_settings
+from src.services.s3_uploader import S3Client
+from src.services.directory_sync import plan_sync, run_sync, COMPARE_MTIME, COMPARE_ETAG
+from src.utils.logger import setup_logging, shutdown_logging
+
+
+def parse_destination(destination: str) -> tuple:
+    """Split ``s3://bucket/prefix`` or ``bucket/prefix`` into bucket and prefix"""
+    if destination.startswith("s3://"):
+        destination = destination[len("s3://"):]
+    bucket_name, _, prefix = destination.partition("/")
+    return bucket_name, prefix
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Upload new and changed files from a local directory to S3")
+    parser.add_argument("source", help="Local directory to sync")
+    parser.add_argument("destination", help="s3://bucket/prefix or bucket/prefix")
+    parser.add_argument("--compare", choices=[COMPARE_MTIME, COMPARE_ETAG], default=COMPARE_MTIME,
+                        help="mtime: size and modification time (fast); etag: size and content hash")
+    parser.add_argument("--delete", action="store_true", help="Delete remote files that no longer exist locally")
+    parser.add_argument("--dry-run", action="store_true", help="Show what would change without changing anything")
+    parser.add_argument("--workers", type=int, default=16, help="Files uploaded concurrently")
+    parser.add_argument("--exclude", action="append", default=[], metavar="PATTERN",
+                        help="Skip relative paths matching this glob; may be repeated")
+    parser.add_argument("-v", "--verbose", action="store_true", help="List every upload and delete")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    bucket_name, prefix = parse_destination(args.destination)
+    if not bucket_name:
+        print("Destination must name a bucket", file=sys.stderr)
+        return 2
+
+    setup_logging("INFO" if args.verbose else "WARNING", "text")
+    try:
+        client = S3Client(settings=get_settings())
+        plan = plan_sync(client, args.source, bucket_name, prefix, args.compare, args.delete,
+                         tuple(args.exclude), args.workers)
+        if args.verbose or args.dry_run:
+            for _, key, size in plan["uploads"]:
+                print(f"upload  s3://{bucket_name}/{key} ({size} bytes)")
+            for key in plan["deletes"]:
+                print(f"delete  s3://{bucket_name}/{key}")
+        summary = run_sync(client, plan, bucket_name, args.workers, args.dry_run)
+    except (BotoCoreError, ClientError, OSError) as e:
+        print(f"Sync failed: {e}", file=sys.stderr)
+        return 2
+    finally:
+        shutdown_logging()
+
+    for failure in summary["failed"]:
+        print(f"failed  {failure['key']}: {failure['error']}", file=sys.stderr)
+    action = "Would upload" if args.dry_run else "Uploaded"
+    print(
+        f"{action} {summary['to_upload']} of {summary['scanned']} files "
+        f"({summary['unchanged']} unchanged, {summary['to_delete']} to delete) | "
+        f"{summary['uploaded']} uploaded, {summary['deleted']} deleted, {len(summary['failed'])} failed | "
+        f"{summary['uploaded_bytes'] / (1024 * 1024):.1f} MB in {summary['seconds']:.2f}s "
+        f"({summary['throughput_mb_s']:.1f} MB/s)"
+    )
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,11 @@
+import pytest
+from config import reset_settings
+
+
+@pytest.fixture(autouse=True)
+def fresh_settings():
+    """Settings and everything built from them are cached per process; reset them
+    around each test so environment changes made with monkeypatch are picked up"""
+    reset_settings()
+    yield
+    reset_settings()
@@ -0,0 +1,93 @@
+import asyncio
+import pytest
+from botocore.exceptions import ClientError
+from src.services import async_s3
+from src.services.async_s3 import AsyncS3Client
+
+
+class FlakyClient:
+    settings = None
+    
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = []
+    
+    def put_object(self, bucket_name, file_key, body, request_id, content_type=None, max_retries=3, metadata=None,
+                   content_encoding=None):
+        self.calls.append(max_retries)
+        if len(self.calls) <= self.failures:
+            raise ClientError({"Error": {"Code": "ServiceUnavailable", "Message": "busy"}}, "PutObject")
+        return {"ETag": '"abc"'}
+
+def test_retries_back_off_on_event_loop(monkeypatch):
+    sleeps = []
+    
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+    
+    monkeypatch.setattr(async_s3.asyncio, "sleep", fake_sleep)
+    client = FlakyClient(failures=2)
+    
+    result = asyncio.run(AsyncS3Client(client=client).put_object("bucket", "key", b"data", "req"))
+    
+    assert result == {"ETag": '"abc"'}
+    # Decorrelated jitter: each wait falls between the base delay and three times the previous one
+    assert len(sleeps) == 2
+    assert 0.1 <= sleeps[0] <= 0.3
+    assert 0.1 <= sleeps[1] <= sleeps[0] * 3
+    # Each attempt is a single try; the retry loop lives in the async layer
+    assert client.calls == [0, 0, 0]
+
+def test_non_transient_errors_are_not_retried():
+    client = FlakyClient(failures=0)
+    
+    def denied(*args, **kwargs):
+        raise ClientError({"Error": {"Code": "AccessDenied", "Message": "no"}}, "PutObject")
+    
+    client.put_object = denied
+    with pytest.raises(ClientError):
+        asyncio.run(AsyncS3Client(client=client).put_object("bucket", "key", b"data", "req"))
+
+def test_error_swallowing_calls_still_retry_on_event_loop(monkeypatch):
+    sleeps = []
+    
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+    
+    monkeypatch.setattr(async_s3.asyncio, "sleep", fake_sleep)
+    client = FlakyClient(failures=1)
+    
+    def delete_objects(bucket_name, file_keys, max_retries=3, raise_errors=False):
+        client.calls.append((max_retries, raise_errors))
+        if len(client.calls) == 1:
+            raise ClientError({"Error": {"Code": "SlowDown", "Message": "busy"}}, "DeleteObjects")
+        return {"deleted": file_keys, "failed": []}
+    
+    client.delete_objects = delete_objects
+    result = asyncio.run(AsyncS3Client(client=client).delete_objects("bucket", ["a", "b"]))
+    
+    assert result == {"deleted": ["a", "b"], "failed": []}
+    assert client.calls == [(0, True), (0, True)]
+    assert len(sleeps) == 1
+
+def test_object_metadata_is_cached_until_the_object_is_written():
+    client = FlakyClient(failures=0)
+    lookups = []
+    
+    def get_object_metadata(bucket_name, file_key, max_retries=3, raise_errors=False):
+        lookups.append(file_key)
+        return {"ContentType": "text/plain", "ContentLength": len(lookups), "ETag": f'"{len(lookups)}"'}
+    
+    client.get_object_metadata = get_object_metadata
+    s3_client = AsyncS3Client(client=client)
+    
+    async def scenario():
+        first = await s3_client.get_object_metadata("bucket", "key")
+        cached = await s3_client.get_object_metadata("bucket", "key")
+        await s3_client.put_object("bucket", "key", b"data", "req")
+        return first, cached, await s3_client.get_object_metadata("bucket", "key")
+    
+    first, cached, fresh = asyncio.run(scenario())
+    assert first == cached
+    assert fresh["ETag"] == '"2"'
+    assert lookups == ["key", "key"]
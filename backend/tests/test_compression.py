@@ -0,0 +1,33 @@
+import gzip
+import io
+from src.services.compression import StreamCompressor, accepts_encoding, open_decompressed
+
+MB = 1024 * 1024
+
+
+def test_accepts_encoding_honours_quality_values():
+    assert accepts_encoding("gzip, deflate, br", "gzip")
+    assert not accepts_encoding("gzip;q=0, br", "gzip")
+    assert accepts_encoding("*", "zstd")
+    assert not accepts_encoding("*, zstd;q=0", "zstd")
+    assert not accepts_encoding("identity", "gzip")
+    assert not accepts_encoding(None, "gzip")
+
+def test_chunked_gzip_round_trip():
+    data = b"".join(b"line %d\n" % i for i in range(10000))
+    compressor = StreamCompressor("gzip")
+    compressed = b"".join(compressor.compress(data[i:i + 4096]) for i in range(0, len(data), 4096)) + compressor.flush()
+    assert gzip.decompress(compressed) == data
+    
+    reader = open_decompressed(io.BytesIO(compressed), "gzip")
+    assert b"".join(iter(lambda: reader.read(1000), b"")) == data
+
+def test_decompressed_reads_stay_bounded_however_well_the_body_compressed():
+    compressor = StreamCompressor("gzip")
+    compressed = b"".join(compressor.compress(bytes(MB)) for _ in range(64)) + compressor.flush()
+    assert len(compressed) < MB
+    
+    reader = open_decompressed(io.BytesIO(compressed), "gzip")
+    sizes = [len(chunk) for chunk in iter(lambda: reader.read(MB), b"")]
+    assert max(sizes) <= MB
+    assert sum(sizes) == 64 * MB
@@ -0,0 +1,92 @@
+import os
+import boto3
+from moto import mock_s3
+from config.settings import Settings
+from src.services.s3_uploader import S3Client
+from src.services.directory_sync import plan_sync, run_sync, expected_etag, COMPARE_ETAG
+
+MB = 1024 * 1024
+
+
+def make_client():
+    return S3Client(settings=Settings(
+        aws_access_key_id="testing", aws_secret_access_key="testing", aws_region="us-east-1",
+        upload_multipart_threshold=5 * MB, upload_part_size=5 * MB
+    ))
+
+def write(root, relative, data: bytes):
+    path = root / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path
+
+@mock_s3
+def test_sync_uploads_only_new_or_changed_files(tmp_path):
+    boto3.client("s3", region_name="us-east-1").create_bucket(Bucket="sync-bucket")
+    client = make_client()
+    write(tmp_path, "a.txt", b"alpha")
+    write(tmp_path, "nested/deep/b.csv", b"x,y\n1,2\n")
+    
+    first = run_sync(client, plan_sync(client, str(tmp_path), "sync-bucket", "backup"), "sync-bucket")
+    assert first["uploaded"] == 2
+    obj = client.s3.get_object(Bucket="sync-bucket", Key="backup/nested/deep/b.csv")
+    assert obj["ContentType"] == "text/csv"
+    
+    again = run_sync(client, plan_sync(client, str(tmp_path), "sync-bucket", "backup"), "sync-bucket")
+    assert again["uploaded"] == 0
+    assert again["unchanged"] == 2
+    
+    write(tmp_path, "a.txt", b"alpha, revised")
+    changed = run_sync(client, plan_sync(client, str(tmp_path), "sync-bucket", "backup"), "sync-bucket")
+    assert changed["uploaded"] == 1
+    assert client.s3.get_object(Bucket="sync-bucket", Key="backup/a.txt")["Body"].read() == b"alpha, revised"
+
+@mock_s3
+def test_sync_dry_run_and_delete(tmp_path):
+    boto3.client("s3", region_name="us-east-1").create_bucket(Bucket="sync-bucket")
+    client = make_client()
+    write(tmp_path, "keep.txt", b"keep")
+    client.s3.put_object(Bucket="sync-bucket", Key="backup/stale.txt", Body=b"old")
+    client.s3.put_object(Bucket="sync-bucket", Key="elsewhere/other.txt", Body=b"untouched")
+    
+    plan = plan_sync(client, str(tmp_path), "sync-bucket", "backup", delete=True)
+    dry = run_sync(client, plan, "sync-bucket", dry_run=True)
+    assert (dry["to_upload"], dry["to_delete"], dry["uploaded"], dry["deleted"]) == (1, 1, 0, 0)
+    assert "Contents" in client.s3.list_objects_v2(Bucket="sync-bucket", Prefix="backup/stale.txt")
+    
+    result = run_sync(client, plan, "sync-bucket")
+    assert (result["uploaded"], result["deleted"]) == (1, 1)
+    keys = [obj["Key"] for obj in client.s3.list_objects_v2(Bucket="sync-bucket")["Contents"]]
+    assert sorted(keys) == ["backup/keep.txt", "elsewhere/other.txt"]
+
+@mock_s3
+def test_delete_leaves_excluded_keys_alone(tmp_path):
+    boto3.client("s3", region_name="us-east-1").create_bucket(Bucket="sync-bucket")
+    client = make_client()
+    write(tmp_path, "keep.txt", b"keep")
+    write(tmp_path, "scratch.tmp", b"local scratch")
+    write(tmp_path, "build/out.o", b"local build")
+    for key in ("backup/scratch.tmp", "backup/build/out.o", "backup/stale.txt"):
+        client.s3.put_object(Bucket="sync-bucket", Key=key, Body=b"remote")
+    
+    plan = plan_sync(client, str(tmp_path), "sync-bucket", "backup", delete=True, excludes=("*.tmp", "build"))
+    assert plan["deletes"] == ["backup/stale.txt"]
+    assert [key for _, key, _ in plan["uploads"]] == ["backup/keep.txt"]
+
+@mock_s3
+def test_etag_compare_matches_single_and_multipart_uploads(tmp_path):
+    boto3.client("s3", region_name="us-east-1").create_bucket(Bucket="sync-bucket")
+    client = make_client()
+    small = write(tmp_path, "small.bin", os.urandom(1024))
+    large = write(tmp_path, "large.bin", os.urandom(11 * MB))
+    run_sync(client, plan_sync(client, str(tmp_path), "sync-bucket", "backup"), "sync-bucket")
+    
+    for path, key in [(small, "backup/small.bin"), (large, "backup/large.bin")]:
+        remote = client.s3.head_object(Bucket="sync-bucket", Key=key)["ETag"].strip('"')
+        assert expected_etag(str(path), path.stat().st_size, client.settings) == remote
+    
+    # Touching files doesn't matter to an ETag comparison; content does
+    os.utime(small)
+    large.write_bytes(os.urandom(11 * MB))
+    plan = plan_sync(client, str(tmp_path), "sync-bucket", "backup", compare=COMPARE_ETAG)
+    assert [key for _, key, _ in plan["uploads"]] == ["backup/large.bin"]
@@ -0,0 +1,38 @@
+from src.services.key_index import KeyIndex
+
+
+def build(index: KeyIndex, keys: list, seen: int = 1):
+    index.merge("bucket", [(key, 1, 0.0, key) for key in keys], seen)
+    return index.finish_refresh("bucket", seen)
+
+def test_search_by_substring_glob_and_prefix_with_pagination():
+    index = KeyIndex(":memory:")
+    build(index, ["logs/2024/App.log", "logs/2024/db.log", "logs/2023/app.log", "data/app.csv", "data/x.csv"])
+    
+    assert [f["key"] for f in index.search("bucket", query="APP")["files"]] == [
+        "data/app.csv", "logs/2023/app.log", "logs/2024/App.log"
+    ]
+    assert [f["key"] for f in index.search("bucket", query="x")["files"]] == ["data/x.csv"]
+    assert [f["key"] for f in index.search("bucket", glob="logs/*/*.log", prefix="logs/2024/")["files"]] == [
+        "logs/2024/App.log", "logs/2024/db.log"
+    ]
+    
+    first = index.search("bucket", glob="*.csv", limit=1)
+    assert [f["name"] for f in first["files"]] == ["app.csv"]
+    second = index.search("bucket", glob="*.csv", limit=1, after=first["next_token"])
+    assert [f["name"] for f in second["files"]] == ["x.csv"]
+    assert second["next_token"] is None
+    assert index.search("other", query="app")["files"] == []
+
+def test_refresh_rewrites_changed_keys_and_prunes_missing_ones():
+    index = KeyIndex(":memory:")
+    build(index, ["a.txt", "b.txt"])
+    
+    assert index.merge("bucket", [("a.txt", 1, 0.0, "a.txt"), ("c.txt", 1, 0.0, "c.txt"), ("b.txt", 2, 0.0, "new")], 2) \
+        == (1, 1)
+    # Written through the service while the refresh was running: newer than the listing
+    index.record("bucket", "d.txt", 5, 0.0, "d")
+    assert index.finish_refresh("bucket", 2) == 0
+    assert build(index, ["a.txt", "b.txt"], seen=3) == 1
+    assert sorted(f["key"] for f in index.search("bucket", glob="*")["files"]) == ["a.txt", "b.txt", "d.txt"]
+    assert index.search("bucket", query="c.txt")["files"] == []
@@ -0,0 +1,60 @@
+from config import reload_settings
+from src.services.listing_cache import ListingCache, get_listing_cache, BUCKETS, OBJECTS, METADATA
+
+SCOPE = ("key", "secret-hash", "us-east-1", "")
+
+
+def test_cache_counts_hits_and_misses():
+    cache = ListingCache(ttl=60)
+    key = (SCOPE, BUCKETS)
+    assert cache.get(key) is None
+    cache.set(key, [{"name": "bucket"}])
+    assert cache.get(key) == [{"name": "bucket"}]
+    
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+def test_cache_expires_entries():
+    cache = ListingCache(ttl=-1)
+    assert not cache.enabled
+    cache = ListingCache(ttl=0.000001)
+    cache.set((SCOPE, BUCKETS), [])
+    assert cache.get((SCOPE, BUCKETS)) is None
+
+def test_cache_is_bounded_by_entries_and_bytes():
+    cache = ListingCache(ttl=60, max_entries=2)
+    for i in range(3):
+        cache.set((SCOPE, METADATA, "bucket", f"key-{i}"), {"ETag": str(i)})
+    assert cache.stats()["entries"] == 2
+    assert cache.get((SCOPE, METADATA, "bucket", "key-0")) is None
+    
+    cache = ListingCache(ttl=60, max_bytes=100)
+    cache.set((SCOPE, METADATA, "bucket", "a"), {"data": "x" * 60})
+    cache.set((SCOPE, METADATA, "bucket", "b"), {"data": "y" * 60})
+    assert cache.stats()["entries"] == 1
+    assert cache.get((SCOPE, METADATA, "bucket", "b")) is not None
+
+def test_invalidate_object_drops_containing_listings():
+    cache = ListingCache(ttl=60)
+    root = (SCOPE, OBJECTS, "bucket", "", "/", 1000, None)
+    docs = (SCOPE, OBJECTS, "bucket", "docs/", "/", 1000, None)
+    images = (SCOPE, OBJECTS, "bucket", "images/", "/", 1000, None)
+    other_bucket = (SCOPE, OBJECTS, "other", "docs/", "/", 1000, None)
+    for key in [root, docs, images, other_bucket]:
+        cache.set(key, {"files": []})
+    
+    cache.invalidate_object("bucket", "docs/report.txt")
+    
+    assert cache.get(root) is None
+    assert cache.get(docs) is None
+    assert cache.get(images) is not None
+    assert cache.get(other_bucket) is not None
+
+def test_reloading_settings_rebuilds_the_cache(monkeypatch):
+    monkeypatch.setenv("LISTING_CACHE_TTL", "5")
+    reload_settings()
+    assert get_listing_cache().ttl == 5
+    monkeypatch.setenv("LISTING_CACHE_TTL", "90")
+    reload_settings()
+    assert get_listing_cache().ttl == 90
@@ -0,0 +1,42 @@
+import json
+import logging
+import logging.handlers
+from src.utils.logger import JsonFormatter, SuccessSampler, setup_logging, shutdown_logging
+
+
+def make_record(**extra):
+    record = logging.LogRecord("app", logging.INFO, __file__, 1, "Upload %s", ("done",), None)
+    record.__dict__.update(extra)
+    return record
+
+def test_json_formatter_includes_fields_and_request_id():
+    line = JsonFormatter().format(make_record(request_id="req-1", fields={"bytes": 10, "duration_ms": 1.5}))
+    entry = json.loads(line)
+    
+    assert entry["message"] == "Upload done"
+    assert entry["request_id"] == "req-1"
+    assert entry["bytes"] == 10
+    assert entry["duration_ms"] == 1.5
+
+def test_sampler_only_drops_sampled_records():
+    sampler = SuccessSampler(rate=0.0)
+    assert sampler.filter(make_record(sample=True)) is False
+    assert sampler.filter(make_record()) is True
+    assert SuccessSampler(rate=1.0).filter(make_record(sample=True)) is True
+
+def test_setup_logging_writes_json_from_background_thread(capsys):
+    root = logging.getLogger()
+    previous_level = root.level
+    setup_logging("INFO", "json", sample_rate=0.0)
+    try:
+        logging.getLogger("test").info("kept", extra={"fields": {"bytes": 3}})
+        logging.getLogger("test").info("dropped", extra={"sample": True})
+    finally:
+        shutdown_logging()
+        for handler in [h for h in root.handlers if isinstance(h, logging.handlers.QueueHandler)]:
+            root.removeHandler(handler)
+        root.setLevel(previous_level)
+    
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [line["message"] for line in lines] == ["kept"]
+    assert lines[0]["bytes"] == 3
@@ -2,9 +2,20 @@ import pytest
 from starlette.testclient import TestClient
 from moto import mock_s3
 import boto3
-from main import app
+from main import app, upload_file, upload_files_bulk
+from src.services.streaming_upload import StreamingUpload
+from starlette.requests import Request
 from config import settings
 import os
+import json
+import io
+import zipfile
+import hashlib
+import gzip
+import logging
+import time
+import asyncio
+from config import reset_settings
 
 client = TestClient(app=app)
 
@@ -69,3 +80,801 @@ def test_upload_unsupported_file_type(monkeypatch):
         files={"file": ("test.exe", b"binary content", "application/x-msdownload")}
     )
     assert response.status_code == 400
+
+@mock_s3
+def test_upload_large_file_uses_multipart(monkeypatch):
+    monkeypatch.setenv("S3_BUCKET_NAME", "test-bucket")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("UPLOAD_PART_SIZE", str(5 * 1024 * 1024))
+    
+    conn = boto3.resource("s3", region_name=settings.aws_region)
+    conn.create_bucket(Bucket="test-bucket")
+    
+    file_content = os.urandom(11 * 1024 * 1024)
+    response = client.post(
+        "/upload",
+        data={"upload_path": "large"},
+        files={"file": ("big.bin", file_content, "application/octet-stream")}
+    )
+    
+    assert response.status_code == 200
+    assert response.json()["file_key"] == "large/big.bin"
+    stored = conn.Object("test-bucket", "large/big.bin").get()["Body"].read()
+    assert stored == file_content
+
+@mock_s3
+def test_upload_exceeding_max_size_is_aborted(monkeypatch):
+    monkeypatch.setenv("S3_BUCKET_NAME", "test-bucket")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("MAX_FILE_SIZE", "1024")
+    
+    conn = boto3.resource("s3", region_name=settings.aws_region)
+    conn.create_bucket(Bucket="test-bucket")
+    
+    response = client.post(
+        "/upload",
+        files={"file": ("test.txt", b"x" * 4096, "text/plain")}
+    )
+    
+    assert response.status_code == 400
+    assert "exceeds maximum" in response.json()["detail"]
+    assert list(conn.Bucket("test-bucket").objects.all()) == []
+
+@mock_s3
+def test_upload_cancelled_mid_stream_aborts_multipart_upload(monkeypatch):
+    monkeypatch.setenv("S3_BUCKET_NAME", "test-bucket")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("UPLOAD_PART_SIZE", str(5 * 1024 * 1024))
+    
+    s3 = boto3.client("s3", region_name=settings.aws_region)
+    s3.create_bucket(Bucket="test-bucket")
+    head = b'--XX\r\nContent-Disposition: form-data; name="file"; filename="big.bin"\r\n' \
+           b"Content-Type: application/octet-stream\r\n\r\n"
+    messages = [head + os.urandom(6 * 1024 * 1024)]
+    
+    async def receive():
+        if messages:
+            return {"type": "http.request", "body": messages.pop(), "more_body": True}
+        raise asyncio.CancelledError()  # The client went away
+    
+    scope = {
+        "type": "http", "method": "POST", "path": "/upload", "query_string": b"",
+        "headers": [(b"content-type", b"multipart/form-data; boundary=XX")],
+    }
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(upload_file(Request(scope, receive), content_sha256=None, aws_access_key=None, aws_secret_key=None))
+    
+    assert s3.list_multipart_uploads(Bucket="test-bucket").get("Uploads", []) == []
+
+def test_upload_malformed_multipart_body_is_rejected(monkeypatch):
+    monkeypatch.setenv("S3_BUCKET_NAME", "test-bucket")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    response = client.post(
+        "/upload", content=b"not a multipart body", headers={"content-type": "multipart/form-data; boundary=XX"}
+    )
+    assert response.status_code == 400
+    assert "Malformed multipart body" in response.json()["detail"]
+
+@mock_s3
+def test_download_streams_range_and_conditional_requests(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    
+    conn = boto3.resource("s3", region_name=settings.aws_region)
+    conn.create_bucket(Bucket="test-bucket")
+    conn.Object("test-bucket", "docs/report.txt").put(Body=b"0123456789", ContentType="text/plain")
+    
+    response = client.get("/download/test-bucket/docs/report.txt")
+    assert response.status_code == 200
+    assert response.content == b"0123456789"
+    assert response.headers["content-type"].startswith("text/plain")
+    assert response.headers["accept-ranges"] == "bytes"
+    etag = response.headers["etag"]
+    
+    partial = client.get("/download/test-bucket/docs/report.txt", headers={"Range": "bytes=2-5"})
+    assert partial.status_code == 206
+    assert partial.content == b"2345"
+    assert partial.headers["content-range"] == "bytes 2-5/10"
+    
+    cached = client.get("/download/test-bucket/docs/report.txt", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    
+    # A list naming the object's tag as a weak validator still matches
+    listed = client.get("/download/test-bucket/docs/report.txt", headers={"If-None-Match": f'"other", W/{etag}'})
+    assert listed.status_code == 304
+    assert listed.headers["etag"] == etag
+    changed = client.get("/download/test-bucket/docs/report.txt", headers={"If-None-Match": '"other", W/"stale"'})
+    assert changed.status_code == 200
+
+@mock_s3
+def test_download_missing_file(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    
+    conn = boto3.resource("s3", region_name=settings.aws_region)
+    conn.create_bucket(Bucket="test-bucket")
+    
+    response = client.get("/download/test-bucket/missing.txt")
+    assert response.status_code == 404
+
+@mock_s3
+def test_delete_files_in_batches(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    
+    conn = boto3.resource("s3", region_name=settings.aws_region)
+    conn.create_bucket(Bucket="test-bucket")
+    for name in ["a.txt", "b.txt", "keep.txt"]:
+        conn.Object("test-bucket", name).put(Body=b"data")
+    
+    response = client.request("DELETE", "/delete/test-bucket", json=["a.txt", "b.txt"])
+    
+    assert response.status_code == 200
+    assert sorted(response.json()["deleted"]) == ["a.txt", "b.txt"]
+    assert response.json()["failed"] == []
+    assert [obj.key for obj in conn.Bucket("test-bucket").objects.all()] == ["keep.txt"]
+
+@mock_s3
+def test_delete_prefix_spanning_multiple_pages(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    
+    s3 = boto3.client("s3", region_name=settings.aws_region)
+    s3.create_bucket(Bucket="test-bucket")
+    for i in range(1005):
+        s3.put_object(Bucket="test-bucket", Key=f"logs/{i:04d}.txt", Body=b"x")
+    s3.put_object(Bucket="test-bucket", Key="other/keep.txt", Body=b"x")
+    
+    response = client.request("DELETE", "/delete/test-bucket", params={"prefix": "logs/"})
+    
+    assert response.status_code == 200
+    assert len(response.json()["deleted"]) == 1005
+    remaining = s3.list_objects_v2(Bucket="test-bucket")["Contents"]
+    assert [obj["Key"] for obj in remaining] == ["other/keep.txt"]
+
+def test_delete_requires_keys_or_prefix(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    response = client.request("DELETE", "/delete/test-bucket")
+    assert response.status_code == 400
+
+@mock_s3
+def test_list_objects_paginates_with_continuation_token(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    
+    s3 = boto3.client("s3", region_name=settings.aws_region)
+    s3.create_bucket(Bucket="test-bucket")
+    for i in range(5):
+        s3.put_object(Bucket="test-bucket", Key=f"data/{i}.txt", Body=b"x")
+    
+    first = client.get("/buckets/test-bucket/objects", params={"prefix": "data/", "page_size": 3}).json()
+    assert len(first["files"]) == 3
+    assert first["is_truncated"] is True
+    
+    second = client.get(
+        "/buckets/test-bucket/objects",
+        params={"prefix": "data/", "page_size": 3, "continuation_token": first["next_token"]}
+    ).json()
+    assert len(second["files"]) == 2
+    assert second["next_token"] is None
+
+@mock_s3
+def test_list_objects_streams_ndjson(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    
+    s3 = boto3.client("s3", region_name=settings.aws_region)
+    s3.create_bucket(Bucket="test-bucket")
+    for i in range(4):
+        s3.put_object(Bucket="test-bucket", Key=f"data/{i}.txt", Body=b"x")
+    s3.put_object(Bucket="test-bucket", Key="data/nested/deep.txt", Body=b"x")
+    
+    response = client.get("/buckets/test-bucket/objects", params={"prefix": "data/", "page_size": 2, "stream": True})
+    
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["type"] for line in lines].count("file") == 4
+    assert [line["prefix"] for line in lines if line["type"] == "folder"] == ["data/nested/"]
+    assert lines[-1] == {"type": "end", "count": 5}
+
+@mock_s3
+def test_list_objects_missing_bucket(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    response = client.get("/buckets/no-such-bucket/objects")
+    assert response.status_code == 404
+
+@mock_s3
+def test_listing_is_cached_and_invalidated_by_uploads(monkeypatch):
+    monkeypatch.setenv("S3_BUCKET_NAME", "test-bucket")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    
+    conn = boto3.resource("s3", region_name=settings.aws_region)
+    conn.create_bucket(Bucket="test-bucket")
+    
+    assert client.get("/buckets/test-bucket/objects", params={"prefix": "uploads/"}).json()["files"] == []
+    # Written behind the service's back: served from cache until the TTL expires
+    conn.Object("test-bucket", "uploads/external.txt").put(Body=b"x")
+    assert client.get("/buckets/test-bucket/objects", params={"prefix": "uploads/"}).json()["files"] == []
+    assert client.get("/cache/stats").json()["hits"] == 1
+    
+    # Writes through the service invalidate the prefix immediately
+    client.post("/upload", files={"file": ("mine.txt", b"data", "text/plain")})
+    files = client.get("/buckets/test-bucket/objects", params={"prefix": "uploads/"}).json()["files"]
+    assert sorted(f["name"] for f in files) == ["external.txt", "mine.txt"]
+
+@mock_s3
+def test_prefix_usage_totals_children_and_caches(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    
+    s3 = boto3.client("s3", region_name=settings.aws_region)
+    s3.create_bucket(Bucket="test-bucket")
+    s3.put_object(Bucket="test-bucket", Key="data/top.txt", Body=b"x" * 10)
+    s3.put_object(Bucket="test-bucket", Key="data/a/1.txt", Body=b"x" * 100)
+    s3.put_object(Bucket="test-bucket", Key="data/a/deep/2.txt", Body=b"x" * 200)
+    s3.put_object(Bucket="test-bucket", Key="data/b/3.txt", Body=b"x" * 1000)
+    
+    usage = client.get("/buckets/test-bucket/usage", params={"prefix": "data/", "max_depth": 2}).json()
+    assert (usage["objects"], usage["bytes"], usage["cached"]) == (4, 1310, False)
+    assert [(c["prefix"], c["objects"], c["bytes"]) for c in usage["children"]] == [
+        ("data/a/", 2, 300), ("data/b/", 1, 1000)
+    ]
+    assert usage["children"][0]["children"] == [{"prefix": "data/a/deep/", "objects": 1, "bytes": 200}]
+    
+    flat = client.get("/buckets/test-bucket/usage", params={"prefix": "data/", "max_depth": 0}).json()
+    assert (flat["objects"], flat["bytes"], flat["listing_requests"]) == (4, 1310, 1)
+    assert "children" not in flat
+    
+    response = client.get("/buckets/test-bucket/usage", params={"prefix": "data/", "stream": True, "refresh": True})
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert {line["prefix"] for line in lines if line["type"] == "prefix"} == {"data/a/", "data/b/"}
+    assert lines[-1]["type"] == "done" and lines[-1]["bytes"] == 1310
+    
+    # Totals are reused until their TTL runs out, even after writes
+    s3.put_object(Bucket="test-bucket", Key="data/c.txt", Body=b"x")
+    cached = client.get("/buckets/test-bucket/usage", params={"prefix": "data/"}).json()
+    assert (cached["objects"], cached["cached"]) == (4, True)
+    
+    assert client.get("/buckets/no-such-bucket/usage").status_code == 404
+
+@mock_s3
+def test_direct_multipart_upload_flow(monkeypatch):
+    monkeypatch.setenv("S3_BUCKET_NAME", "test-bucket")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    
+    s3 = boto3.client("s3", region_name=settings.aws_region)
+    s3.create_bucket(Bucket="test-bucket")
+    
+    initiated = client.post(
+        "/multipart/initiate",
+        json={"filename": "video.bin", "file_size": 6 * 1024 * 1024, "upload_path": "media"}
+    ).json()
+    assert initiated["file_key"] == "media/video.bin"
+    assert initiated["part_count"] == 1
+    upload_id = initiated["upload_id"]
+    
+    urls = client.post(
+        f"/multipart/{upload_id}/part-urls",
+        json={"bucket_name": "test-bucket", "file_key": "media/video.bin", "part_numbers": [1],
+              "part_count": 1, "upload_token": initiated["upload_token"]}
+    ).json()["urls"]
+    assert urls[0]["part_number"] == 1
+    
+    # Parts beyond the count granted by initiate, or a forged count, are refused
+    beyond = {"bucket_name": "test-bucket", "file_key": "media/video.bin", "part_numbers": [2],
+              "part_count": 1, "upload_token": initiated["upload_token"]}
+    assert client.post(f"/multipart/{upload_id}/part-urls", json=beyond).status_code == 400
+    forged = {**beyond, "part_count": 2}
+    assert client.post(f"/multipart/{upload_id}/part-urls", json=forged).status_code == 403
+    
+    # Stand in for the browser sending the part to the presigned URL
+    etag = s3.upload_part(
+        Bucket="test-bucket", Key="media/video.bin", UploadId=upload_id, PartNumber=1, Body=b"x" * 1024
+    )["ETag"]
+    
+    parts = client.get(
+        f"/multipart/{upload_id}/parts", params={"bucket_name": "test-bucket", "file_key": "media/video.bin"}
+    ).json()["parts"]
+    assert [p["part_number"] for p in parts] == [1]
+    
+    completed = client.post(
+        f"/multipart/{upload_id}/complete",
+        json={"bucket_name": "test-bucket", "file_key": "media/video.bin", "parts": [{"part_number": 1, "etag": etag}]}
+    )
+    assert completed.status_code == 200
+    assert completed.json()["success"] is True
+    assert s3.get_object(Bucket="test-bucket", Key="media/video.bin")["Body"].read() == b"x" * 1024
+
+@mock_s3
+def test_complete_multipart_aborts_upload_larger_than_allowed(monkeypatch):
+    monkeypatch.setenv("S3_BUCKET_NAME", "test-bucket")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("MAX_FILE_SIZE", "1024")
+    
+    s3 = boto3.client("s3", region_name=settings.aws_region)
+    s3.create_bucket(Bucket="test-bucket")
+    initiated = client.post("/multipart/initiate", json={"filename": "small.bin", "file_size": 100}).json()
+    upload_id = initiated["upload_id"]
+    # The client declared 100 bytes but sends more
+    etag = s3.upload_part(
+        Bucket="test-bucket", Key="small.bin", UploadId=upload_id, PartNumber=1, Body=b"x" * 2048
+    )["ETag"]
+    
+    completed = client.post(
+        f"/multipart/{upload_id}/complete",
+        json={"bucket_name": "test-bucket", "file_key": "small.bin", "parts": [{"part_number": 1, "etag": etag}]}
+    )
+    assert completed.status_code == 400
+    assert s3.list_multipart_uploads(Bucket="test-bucket").get("Uploads", []) == []
+    assert s3.list_objects_v2(Bucket="test-bucket").get("KeyCount") == 0
+
+def test_initiate_multipart_rejects_oversized_file(monkeypatch):
+    monkeypatch.setenv("S3_BUCKET_NAME", "test-bucket")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("MAX_FILE_SIZE", "1024")
+    response = client.post("/multipart/initiate", json={"filename": "big.bin", "file_size": 2048})
+    assert response.status_code == 400
+
+@mock_s3
+def test_bulk_upload_reports_per_file_results(monkeypatch):
+    monkeypatch.setenv("S3_BUCKET_NAME", "test-bucket")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("BULK_UPLOAD_CONCURRENCY", "2")
+    
+    conn = boto3.resource("s3", region_name=settings.aws_region)
+    conn.create_bucket(Bucket="test-bucket")
+    
+    files = [("files", (f"file-{i}.txt", f"content {i}".encode(), "text/plain")) for i in range(5)]
+    files.append(("files", ("empty.txt", b"", "text/plain")))
+    files.append(("files", ("bad.exe", b"MZ", "application/x-msdownload")))
+    response = client.post("/upload/bulk", data={"upload_path": "batch"}, files=files)
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data["success"] is False
+    assert data["uploaded"] == 5
+    assert data["failed"] == 2
+    assert [r["success"] for r in data["results"]] == [True] * 5 + [False, False]
+    assert "empty" in data["results"][5]["error"].lower()
+    assert "not allowed" in data["results"][6]["error"]
+    stored = sorted(obj.key for obj in conn.Bucket("test-bucket").objects.all())
+    assert stored == [f"batch/file-{i}.txt" for i in range(5)]
+
+@mock_s3
+def test_bulk_upload_cancelled_mid_stream_aborts_its_uploads(monkeypatch):
+    monkeypatch.setenv("S3_BUCKET_NAME", "test-bucket")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("UPLOAD_PART_SIZE", str(5 * 1024 * 1024))
+    
+    s3 = boto3.client("s3", region_name=settings.aws_region)
+    s3.create_bucket(Bucket="test-bucket")
+    
+    async def stalled_complete(self):
+        await asyncio.Event().wait()
+    
+    # Hold the first file in its completion so the disconnect lands while it is pending
+    monkeypatch.setattr(StreamingUpload, "complete", stalled_complete)
+    
+    def part(name: bytes) -> bytes:
+        return (b'--XX\r\nContent-Disposition: form-data; name="files"; filename="' + name + b'"\r\n'
+                b"Content-Type: application/octet-stream\r\n\r\n" + os.urandom(6 * 1024 * 1024) + b"\r\n")
+    
+    messages = [part(b"first.bin") + part(b"second.bin")[:-2]]
+    
+    async def receive():
+        if messages:
+            return {"type": "http.request", "body": messages.pop(), "more_body": True}
+        raise asyncio.CancelledError()  # The client went away
+    
+    scope = {
+        "type": "http", "method": "POST", "path": "/upload/bulk", "query_string": b"",
+        "headers": [(b"content-type", b"multipart/form-data; boundary=XX")],
+    }
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(upload_files_bulk(Request(scope, receive), aws_access_key=None, aws_secret_key=None))
+    
+    assert s3.list_multipart_uploads(Bucket="test-bucket").get("Uploads", []) == []
+    assert s3.list_objects_v2(Bucket="test-bucket").get("KeyCount") == 0
+
+@mock_s3
+def test_archive_streams_zip_of_keys_and_prefix(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    
+    s3 = boto3.client("s3", region_name=settings.aws_region)
+    s3.create_bucket(Bucket="test-bucket")
+    s3.put_object(Bucket="test-bucket", Key="reports/a.csv", Body=b"a,b\n1,2\n" * 100)
+    s3.put_object(Bucket="test-bucket", Key="reports/2024/b.json", Body=b'{"b": 1}')
+    s3.put_object(Bucket="test-bucket", Key="other.txt", Body=b"other")
+    
+    response = client.post("/archive/test-bucket", json={"prefix": "reports/"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/zip"
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert sorted(archive.namelist()) == ["2024/b.json", "a.csv"]
+        assert archive.read("a.csv") == b"a,b\n1,2\n" * 100
+    
+    response = client.post("/archive/test-bucket", json={"keys": ["other.txt", "missing.txt"]})
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert archive.read("other.txt") == b"other"
+        assert b"missing.txt" in archive.read("ARCHIVE_ERRORS.txt")
+
+@mock_s3
+def test_archive_entry_names_cannot_escape_the_extract_directory(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    
+    s3 = boto3.client("s3", region_name=settings.aws_region)
+    s3.create_bucket(Bucket="test-bucket")
+    s3.put_object(Bucket="test-bucket", Key="a/../../etc/passwd", Body=b"up")
+    s3.put_object(Bucket="test-bucket", Key="/abs.txt", Body=b"abs")
+    s3.put_object(Bucket="test-bucket", Key="..", Body=b"dots")
+    
+    response = client.post("/archive/test-bucket", json={"keys": ["a/../../etc/passwd", "/abs.txt", ".."]})
+    with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+        assert sorted(archive.namelist()) == ["ARCHIVE_ERRORS.txt", "a/etc/passwd", "abs.txt"]
+        assert archive.read("a/etc/passwd") == b"up"
+        assert b"..: no safe name" in archive.read("ARCHIVE_ERRORS.txt")
+
+@mock_s3
+def test_copy_large_object_uses_part_copy(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("COPY_MULTIPART_THRESHOLD", str(5 * 1024 * 1024))
+    monkeypatch.setenv("COPY_PART_SIZE", str(5 * 1024 * 1024))
+    
+    s3 = boto3.client("s3", region_name=settings.aws_region)
+    s3.create_bucket(Bucket="test-bucket")
+    payload = os.urandom(11 * 1024 * 1024)
+    s3.put_object(Bucket="test-bucket", Key="src/big.bin", Body=payload, ContentType="application/octet-stream")
+    
+    response = client.post("/copy/test-bucket", json={"source_key": "src/big.bin", "destination_key": "dst/big.bin"})
+    
+    assert response.status_code == 200
+    assert response.json()["parts"] == 3
+    assert s3.get_object(Bucket="test-bucket", Key="dst/big.bin")["Body"].read() == payload
+
+@mock_s3
+def test_copy_above_copy_object_limit_uses_part_copy_whatever_the_threshold(monkeypatch):
+    from src.services import object_copy
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("COPY_MULTIPART_THRESHOLD", str(10 * 1024 ** 4))
+    monkeypatch.setenv("COPY_PART_SIZE", str(5 * 1024 * 1024))
+    # Stand in for the 5GB limit
+    monkeypatch.setattr(object_copy, "MAX_COPY_OBJECT_SIZE", 5 * 1024 * 1024)
+    
+    s3 = boto3.client("s3", region_name=settings.aws_region)
+    s3.create_bucket(Bucket="test-bucket")
+    s3.put_object(Bucket="test-bucket", Key="src/big.bin", Body=os.urandom(6 * 1024 * 1024))
+    
+    response = client.post("/copy/test-bucket", json={"source_key": "src/big.bin", "destination_key": "dst/big.bin"})
+    
+    assert response.status_code == 200
+    assert response.json()["parts"] == 2
+
+@mock_s3
+def test_move_prefix_reports_progress_and_removes_sources(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    
+    s3 = boto3.client("s3", region_name=settings.aws_region)
+    s3.create_bucket(Bucket="test-bucket")
+    for i in range(3):
+        s3.put_object(Bucket="test-bucket", Key=f"old/{i}.txt", Body=f"{i}".encode())
+    
+    response = client.post(
+        "/move/test-bucket",
+        params={"stream": True},
+        json={"source_prefix": "old/", "destination_prefix": "new/"}
+    )
+    
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert [e["type"] for e in events].count("progress") == 3
+    assert events[-1]["type"] == "done"
+    assert events[-1]["copied"] == 3
+    assert events[-1]["deleted"] == 3
+    keys = sorted(obj["Key"] for obj in s3.list_objects_v2(Bucket="test-bucket")["Contents"])
+    assert keys == ["new/0.txt", "new/1.txt", "new/2.txt"]
+
+def test_copy_rejects_destination_inside_source(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    response = client.post("/copy/test-bucket", json={"source_prefix": "a/", "destination_prefix": "a/b/"})
+    assert response.status_code == 400
+
+@mock_s3
+def test_metrics_exposes_route_latency_bytes_and_s3_timings(monkeypatch):
+    monkeypatch.setenv("S3_BUCKET_NAME", "test-bucket")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    
+    conn = boto3.resource("s3", region_name=settings.aws_region)
+    conn.create_bucket(Bucket="test-bucket")
+    client.post("/upload", files={"file": ("m.txt", b"metrics", "text/plain")})
+    client.get("/download/test-bucket/uploads/m.txt")
+    
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    body = response.text
+    assert 'http_request_duration_seconds_count{method="POST",route="/upload",status="200"}' in body
+    assert 's3_transfer_bytes_total{direction="upload"}' in body
+    assert 's3_transfer_bytes_total{direction="download"}' in body
+    assert 's3_operation_duration_seconds_count{operation="PutObject"}' in body
+    assert 's3_transfers_in_flight{direction="upload"} 0' in body
+
+@mock_s3
+def test_key_search_indexes_bucket_and_follows_uploads_and_deletes(monkeypatch, tmp_path):
+    monkeypatch.setenv("S3_BUCKET_NAME", "test-bucket")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("KEY_INDEX_ENABLED", "true")
+    monkeypatch.setenv("KEY_INDEX_PATH", str(tmp_path / "keys.sqlite3"))
+    
+    s3 = boto3.client("s3", region_name=settings.aws_region)
+    s3.create_bucket(Bucket="test-bucket")
+    for key in ["reports/2024/q1/Summary.pdf", "reports/2024/q2/summary.pdf", "reports/2023/notes.txt", "top.txt"]:
+        s3.put_object(Bucket="test-bucket", Key=key, Body=b"x" * 7)
+    
+    # The first search lists the bucket into the index
+    found = client.get("/search/test-bucket", params={"q": "summary"}).json()
+    assert [f["key"] for f in found["files"]] == ["reports/2024/q1/Summary.pdf", "reports/2024/q2/summary.pdf"]
+    assert found["files"][0]["size"] == 7
+    
+    paged = client.get("/search/test-bucket", params={"glob": "*.pdf", "limit": 1}).json()
+    assert len(paged["files"]) == 1 and paged["next_token"] == "reports/2024/q1/Summary.pdf"
+    
+    client.post("/upload", params={"upload_path": "reports/2025"}, files={"file": ("summary.txt", b"new", "text/plain")})
+    client.request("DELETE", "/delete/test-bucket", json=["reports/2024/q1/Summary.pdf"])
+    found = client.get("/search/test-bucket", params={"q": "summary"}).json()
+    assert [(f["key"], f["size"]) for f in found["files"]] == [
+        ("reports/2024/q2/summary.pdf", 7), ("reports/2025/summary.txt", 3)
+    ]
+    
+    # Written behind the service's back: picked up by the next refresh
+    s3.put_object(Bucket="test-bucket", Key="reports/2024/q3/summary.pdf", Body=b"x")
+    s3.delete_object(Bucket="test-bucket", Key="top.txt")
+    refreshed = client.post("/search/test-bucket/refresh").json()
+    assert (refreshed["added"], refreshed["pruned"], refreshed["index"]["objects"]) == (1, 1, 4)
+    
+    assert client.get("/search/test-bucket").status_code == 400
+    assert client.get("/search/no-such-bucket", params={"q": "x"}).status_code == 404
+
+@mock_s3
+def test_dedup_copies_identical_content_instead_of_uploading(monkeypatch, tmp_path):
+    monkeypatch.setenv("S3_BUCKET_NAME", "test-bucket")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("DEDUP_ENABLED", "true")
+    monkeypatch.setenv("DEDUP_INDEX_PATH", str(tmp_path / "dedup.sqlite3"))
+    
+    conn = boto3.resource("s3", region_name=settings.aws_region)
+    conn.create_bucket(Bucket="test-bucket")
+    content = b"quarterly report"
+    
+    first = client.post("/upload", params={"upload_path": "a"}, files={"file": ("report.txt", content, "text/plain")})
+    assert first.json()["deduplicated_from"] is None
+    second = client.post("/upload", params={"upload_path": "b"}, files={"file": ("report.txt", content, "text/plain")})
+    
+    assert second.status_code == 200
+    assert second.json()["deduplicated_from"] == "a/report.txt"
+    copied = conn.Object("test-bucket", "b/report.txt").get()
+    assert copied["Body"].read() == content
+    assert copied["Metadata"]["content-sha256"] == hashlib.sha256(content).hexdigest()
+    assert copied["Metadata"]["request-id"] == second.json()["request_id"]
+
+@mock_s3
+def test_dedup_with_declared_hash_skips_multipart_upload(monkeypatch, tmp_path):
+    monkeypatch.setenv("S3_BUCKET_NAME", "test-bucket")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("UPLOAD_PART_SIZE", str(5 * 1024 * 1024))
+    monkeypatch.setenv("DEDUP_ENABLED", "true")
+    monkeypatch.setenv("DEDUP_INDEX_PATH", str(tmp_path / "dedup.sqlite3"))
+    
+    conn = boto3.resource("s3", region_name=settings.aws_region)
+    conn.create_bucket(Bucket="test-bucket")
+    content = os.urandom(11 * 1024 * 1024)
+    digest = hashlib.sha256(content).hexdigest()
+    
+    client.post("/upload", params={"upload_path": "a"}, files={"file": ("big.bin", content, "application/octet-stream")})
+    # The hash of a multipart upload is only in the index; no copy is made to stamp it
+    assert "content-sha256" not in conn.Object("test-bucket", "a/big.bin").metadata
+    
+    response = client.post(
+        "/upload",
+        params={"upload_path": "b"},
+        headers={"X-Content-SHA256": digest},
+        files={"file": ("big.bin", content, "application/octet-stream")}
+    )
+    assert response.json()["deduplicated_from"] == "a/big.bin"
+    assert conn.Object("test-bucket", "b/big.bin").get()["Body"].read() == content
+    
+    mismatch = client.post(
+        "/upload",
+        params={"upload_path": "c"},
+        headers={"X-Content-SHA256": "0" * 64},
+        files={"file": ("big.bin", content, "application/octet-stream")}
+    )
+    assert mismatch.status_code == 400
+    assert list(conn.Bucket("test-bucket").objects.filter(Prefix="c/")) == []
+
+@mock_s3
+def test_dedup_index_rebuilds_from_object_metadata(monkeypatch, tmp_path):
+    monkeypatch.setenv("S3_BUCKET_NAME", "test-bucket")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("DEDUP_ENABLED", "true")
+    monkeypatch.setenv("DEDUP_INDEX_PATH", str(tmp_path / "first.sqlite3"))
+    
+    conn = boto3.resource("s3", region_name=settings.aws_region)
+    conn.create_bucket(Bucket="test-bucket")
+    content = b"logo bytes"
+    client.post("/upload", params={"upload_path": "img"}, files={"file": ("logo.png", content, "image/png")})
+    conn.Object("test-bucket", "img/other.png").put(Body=b"not indexed")
+    
+    # Start over with an empty index
+    monkeypatch.setenv("DEDUP_INDEX_PATH", str(tmp_path / "second.sqlite3"))
+    reset_settings()
+    
+    rebuilt = client.post("/dedup/rebuild/test-bucket").json()
+    assert rebuilt["scanned"] == 2
+    assert rebuilt["hashed"] == 1
+    again = client.post("/dedup/rebuild/test-bucket").json()
+    assert again["updated"] == 0
+    
+    conn.Object("test-bucket", "img/other.png").delete()
+    assert client.post("/dedup/rebuild/test-bucket").json()["pruned"] == 1
+    
+    response = client.post("/upload", params={"upload_path": "copy"}, files={"file": ("logo.png", content, "image/png")})
+    assert response.json()["deduplicated_from"] == "img/logo.png"
+
+@mock_s3
+def test_request_log_carries_request_id_bytes_and_phase_timings(monkeypatch, caplog):
+    monkeypatch.setenv("S3_BUCKET_NAME", "test-bucket")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    
+    conn = boto3.resource("s3", region_name=settings.aws_region)
+    conn.create_bucket(Bucket="test-bucket")
+    
+    with caplog.at_level(logging.INFO, logger="src.utils.logger"):
+        response = client.post("/upload", files={"file": ("log.txt", b"payload", "text/plain")})
+    
+    record = next(r for r in caplog.records if r.getMessage() == "Request handled")
+    assert record.request_id == response.json()["request_id"]
+    assert record.fields["route"] == "/upload"
+    assert record.fields["status"] == 200
+    assert record.fields["bytes_in"] > len(b"payload")
+    assert record.fields["bytes_out"] == len(response.content)
+    for phase in ("validation_ms", "s3_ms", "response_ms", "duration_ms"):
+        assert record.fields[phase] >= 0
+
+@mock_s3
+def test_compressed_upload_is_served_encoded_or_decoded(monkeypatch):
+    monkeypatch.setenv("S3_BUCKET_NAME", "test-bucket")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    
+    conn = boto3.resource("s3", region_name=settings.aws_region)
+    conn.create_bucket(Bucket="test-bucket")
+    content = b"id,name,amount\n" + b"".join(b"%d,item-%d,%d.00\n" % (i, i, i) for i in range(5000))
+    
+    response = client.post(
+        "/upload",
+        params={"compression": "gzip"},
+        files={"file": ("data.csv", content, "text/csv")}
+    )
+    assert response.json()["content_encoding"] == "gzip"
+    stored = conn.Object("test-bucket", "uploads/data.csv").get()
+    assert stored["ContentEncoding"] == "gzip"
+    raw = stored["Body"].read()
+    assert len(raw) < len(content)
+    assert gzip.decompress(raw) == content
+    
+    encoded = client.get("/download/test-bucket/uploads/data.csv", headers={"Accept-Encoding": "gzip"})
+    assert encoded.headers["content-encoding"] == "gzip"
+    assert encoded.headers["content-length"] == str(len(raw))
+    assert encoded.content == content
+    
+    decoded = client.get("/download/test-bucket/uploads/data.csv", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in decoded.headers
+    assert decoded.headers["etag"].startswith("W/")
+    assert decoded.content == content
+
+@mock_s3
+def test_compression_skips_incompressible_types_and_rejects_unknown(monkeypatch):
+    monkeypatch.setenv("S3_BUCKET_NAME", "test-bucket")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    
+    conn = boto3.resource("s3", region_name=settings.aws_region)
+    conn.create_bucket(Bucket="test-bucket")
+    
+    image = client.post("/upload", params={"compression": "gzip"}, files={"file": ("a.png", b"\x89PNG", "image/png")})
+    assert image.json()["content_encoding"] is None
+    assert "ContentEncoding" not in conn.Object("test-bucket", "uploads/a.png").get()
+    
+    unknown = client.post("/upload", params={"compression": "br"}, files={"file": ("a.txt", b"text", "text/plain")})
+    assert unknown.status_code == 400
+
+@mock_s3
+def test_upload_job_is_accepted_then_uploaded_in_background(monkeypatch, tmp_path):
+    monkeypatch.setenv("S3_BUCKET_NAME", "test-bucket")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("UPLOAD_SPOOL_DIR", str(tmp_path / "spool"))
+    monkeypatch.setenv("UPLOAD_JOBS_PATH", str(tmp_path / "jobs.sqlite3"))
+    conn = boto3.resource("s3", region_name=settings.aws_region)
+    conn.create_bucket(Bucket="test-bucket")
+    content = os.urandom(6 * 1024 * 1024)
+    
+    with TestClient(app) as job_client:
+        response = job_client.post(
+            "/upload/jobs",
+            params={"upload_path": "jobs"},
+            files={"file": ("data.bin", content, "application/octet-stream")}
+        )
+        assert response.status_code == 202
+        accepted = response.json()
+        assert accepted["status"] == "queued"
+        
+        for _ in range(200):
+            status = job_client.get(accepted["status_url"]).json()
+            if status["status"] in ("succeeded", "failed"):
+                break
+            time.sleep(0.05)
+        
+        assert job_client.get("/upload/jobs/unknown").status_code == 404
+    
+    assert status["status"] == "succeeded", status
+    assert status["bytes_total"] == status["bytes_uploaded"] == len(content)
+    assert status["result"]["file_key"] == "jobs/data.bin"
+    assert status["result"]["request_id"] == accepted["request_id"]
+    assert conn.Object("test-bucket", "jobs/data.bin").get()["Body"].read() == content
+    assert os.listdir(tmp_path / "spool") == []
+
+@mock_s3
+def test_download_cache_revalidates_and_serves_from_disk(monkeypatch, tmp_path):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("DOWNLOAD_CACHE_DIR", str(tmp_path / "cache"))
+    conn = boto3.resource("s3", region_name=settings.aws_region)
+    conn.create_bucket(Bucket="test-bucket")
+    conn.Object("test-bucket", "templates/a.txt").put(Body=b"version one", ContentType="text/plain")
+    
+    first = client.get("/download/test-bucket/templates/a.txt")
+    second = client.get("/download/test-bucket/templates/a.txt")
+    assert first.content == second.content == b"version one"
+    assert second.headers["etag"] == first.headers["etag"]
+    assert second.headers["content-type"].startswith("text/plain")
+    assert client.get("/cache/stats").json()["downloads"]["hits"] == 1
+    
+    not_modified = client.get("/download/test-bucket/templates/a.txt", headers={"If-None-Match": first.headers["etag"]})
+    assert not_modified.status_code == 304
+    
+    # A new version fails revalidation and replaces the cached body
+    conn.Object("test-bucket", "templates/a.txt").put(Body=b"version two", ContentType="text/plain")
+    assert client.get("/download/test-bucket/templates/a.txt").content == b"version two"
+    assert client.get("/download/test-bucket/templates/a.txt").content == b"version two"
+    stats = client.get("/cache/stats").json()["downloads"]
+    assert stats["entries"] == 1
+    assert stats["bytes"] == len(b"version two")
+    assert len(os.listdir(tmp_path / "cache")) == 1
+    
+    # Ranges and missing keys still go straight to S3
+    assert client.get("/download/test-bucket/templates/a.txt", headers={"Range": "bytes=0-6"}).content == b"version"
+    assert client.get("/download/test-bucket/templates/missing.txt").status_code == 404
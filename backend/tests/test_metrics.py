@@ -0,0 +1,31 @@
+import threading
+from src.utils.metrics import Counter, Histogram
+
+
+def test_counter_sums_shards_from_all_threads():
+    counter = Counter("test_total", "test", ("kind",))
+    
+    def work():
+        for _ in range(1000):
+            counter.inc(kind="a")
+    
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.inc(5, kind="b")
+    
+    assert counter.values() == {("a",): 4000, ("b",): 5}
+    assert 'test_total{kind="a"} 4000' in counter.render()
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = Histogram("test_seconds", "test", buckets=(0.1, 1.0))
+    for value in [0.05, 0.1, 0.5, 3.0]:
+        histogram.observe(value)
+    
+    lines = histogram.render()
+    assert 'test_seconds_bucket{le="0.1"} 2' in lines
+    assert 'test_seconds_bucket{le="1.0"} 3' in lines
+    assert 'test_seconds_bucket{le="+Inf"} 4' in lines
+    assert "test_seconds_count 4" in lines
@@ -0,0 +1,61 @@
+import asyncio
+from src.services.object_cache import ObjectCache, CACHE_SUBDIR
+
+
+def put(cache: ObjectCache, key: str, body: bytes, etag: str = '"1"'):
+    path = cache.temp_path()
+    with open(path, "wb") as f:
+        f.write(body)
+    return cache.put("bucket", key, path, {"ETag": etag, "ContentLength": len(body), "Body": None})
+
+def test_cache_evicts_least_recently_used_bodies_by_size(tmp_path):
+    cache = ObjectCache(str(tmp_path / "cache"), max_bytes=10)
+    first = put(cache, "a", b"aaaa")
+    put(cache, "b", b"bbbb")
+    cache.get("bucket", "a")
+    put(cache, "c", b"cccc")
+    
+    assert cache.get("bucket", "a") is first
+    assert cache.get("bucket", "b") is None
+    assert cache.stats()["bytes"] == 8
+    assert cache.evictions == 1
+    assert sorted(p.name for p in (tmp_path / "cache" / CACHE_SUBDIR).iterdir()) == sorted(
+        [first.path.rsplit("/", 1)[-1], cache.get("bucket", "c").path.rsplit("/", 1)[-1]]
+    )
+
+def test_new_version_replaces_the_old_body(tmp_path):
+    cache = ObjectCache(str(tmp_path / "cache"))
+    put(cache, "a", b"old", '"1"')
+    entry = put(cache, "a", b"newer", '"2"')
+    
+    assert cache.get("bucket", "a") is entry
+    assert cache.stats()["bytes"] == 5
+    assert len(list((tmp_path / "cache" / CACHE_SUBDIR).iterdir())) == 1
+
+def test_start_only_removes_files_the_cache_wrote(tmp_path):
+    stale = ObjectCache(str(tmp_path))
+    put(stale, "a", b"old")
+    (tmp_path / "notes.txt").write_text("keep")
+    (tmp_path / CACHE_SUBDIR / "README").write_text("keep")
+    
+    ObjectCache(str(tmp_path))
+    
+    assert (tmp_path / "notes.txt").exists()
+    assert [p.name for p in (tmp_path / CACHE_SUBDIR).iterdir()] == ["README"]
+
+def test_concurrent_misses_share_one_fetch(tmp_path):
+    cache = ObjectCache(str(tmp_path / "cache"))
+    loads = []
+    
+    async def load():
+        loads.append(1)
+        await asyncio.sleep(0.01)
+        return put(cache, "a", b"body")
+    
+    async def run():
+        return await asyncio.gather(*[cache.fetch(("scope", "bucket", "a"), load) for _ in range(5)])
+    
+    results = asyncio.run(run())
+    assert len(loads) == 1
+    assert all(result is results[0] for result in results)
+    assert cache.coalesced == 4
@@ -0,0 +1,110 @@
+import asyncio
+import pytest
+from botocore.exceptions import ClientError
+from src.services import retry_policy
+from src.services.retry_policy import (
+    RetryPolicy, RetryBudget, CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+)
+
+
+def throttled():
+    return ClientError({"Error": {"Code": "SlowDown", "Message": "Please reduce your request rate."}}, "PutObject")
+
+def failing(errors):
+    """A callable raising ``errors`` in turn, then returning "ok" """
+    calls = []
+    
+    def call():
+        calls.append(1)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return "ok"
+    return call, calls
+
+def test_slowdown_is_retried_with_decorrelated_jitter(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(retry_policy.time, "sleep", sleeps.append)
+    policy = RetryPolicy(base_delay=0.5, max_delay=2.0)
+    call, calls = failing([throttled()] * 3)
+    
+    assert policy.call(call, "bucket", "put_object") == "ok"
+    assert len(calls) == 4
+    previous = 0.5
+    for delay in sleeps:
+        assert 0.5 <= delay <= min(2.0, previous * 3)
+        previous = delay
+
+def test_non_transient_errors_are_not_retried(monkeypatch):
+    monkeypatch.setattr(retry_policy.time, "sleep", lambda seconds: None)
+    call, calls = failing([ClientError({"Error": {"Code": "AccessDenied", "Message": "no"}}, "PutObject")])
+    
+    with pytest.raises(ClientError):
+        RetryPolicy().call(call, "bucket", "put_object")
+    assert len(calls) == 1
+
+def test_empty_budget_stops_retries(monkeypatch):
+    monkeypatch.setattr(retry_policy.time, "sleep", lambda seconds: None)
+    policy = RetryPolicy(budget=RetryBudget(capacity=1, refill_rate=0))
+    call, calls = failing([throttled()] * 3)
+    
+    with pytest.raises(ClientError):
+        policy.call(call, "bucket", "put_object")
+    # One retry was paid for, the next one found the budget empty
+    assert len(calls) == 2
+    assert policy.budget.tokens == 0
+
+def test_circuit_opens_after_repeated_throttling_and_fails_fast(monkeypatch):
+    monkeypatch.setattr(retry_policy.time, "sleep", lambda seconds: None)
+    policy = RetryPolicy(failure_threshold=3, reset_timeout=60)
+    call, calls = failing([throttled()] * 10)
+    
+    with pytest.raises(ClientError):
+        policy.call(call, "hot-bucket", "put_object", max_retries=10)
+    assert len(calls) == 3
+    assert policy.breaker("hot-bucket").state == OPEN
+    
+    with pytest.raises(CircuitOpenError) as excinfo:
+        policy.call(call, "hot-bucket", "put_object")
+    assert len(calls) == 3
+    assert 0 < excinfo.value.retry_after <= 60
+    # Other buckets are unaffected
+    assert policy.call(lambda: "ok", "other-bucket", "put_object") == "ok"
+    assert policy.stats()["circuits"]["hot-bucket"]["state"] == OPEN
+
+def test_half_open_circuit_sheds_load_until_a_probe_succeeds():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0, half_open_max_calls=1)
+    breaker.record(True)
+    assert breaker.state == OPEN
+    
+    assert breaker.allow() is None
+    assert breaker.state == HALF_OPEN
+    # Only one probe at a time
+    assert breaker.allow() is not None
+    
+    breaker.record(True)
+    assert breaker.state == OPEN
+    assert breaker.allow() is None
+    breaker.record(False)
+    assert breaker.state == CLOSED
+    assert breaker.allow() is None
+
+def test_async_retries_do_not_count_attempts_twice(monkeypatch):
+    async def fake_sleep(seconds):
+        pass
+    
+    monkeypatch.setattr(retry_policy.asyncio, "sleep", fake_sleep)
+    policy = RetryPolicy(failure_threshold=2)
+    call, calls = failing([throttled()])
+    
+    async def attempt():
+        # Stands in for an S3Client call made with max_retries=0, which records its own outcome
+        try:
+            return call()
+        except ClientError:
+            policy.breaker("bucket").record(True)
+            raise
+    
+    assert asyncio.run(policy.call_async(attempt, "bucket", "put_object", circuit_applied=True)) == "ok"
+    assert len(calls) == 2
+    assert policy.breaker("bucket").state == CLOSED
+    assert policy.breaker("bucket").failures == 1
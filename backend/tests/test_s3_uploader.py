@@ -0,0 +1,40 @@
+from config.settings import Settings
+from src.services.s3_uploader import S3ClientRegistry, choose_part_size, MIN_PART_SIZE, MAX_PARTS
+
+
+def make_settings(**overrides):
+    values = {"aws_access_key_id": "key-a", "aws_secret_access_key": "secret-a", "aws_region": "us-east-1"}
+    values.update(overrides)
+    return Settings(**values)
+
+def test_registry_reuses_client_for_same_credentials():
+    registry = S3ClientRegistry()
+    first = registry.get(make_settings())
+    assert registry.get(make_settings()) is first
+    assert registry.get(make_settings(aws_region="eu-west-1")) is not first
+    assert registry.get(make_settings(aws_secret_access_key="secret-b")) is not first
+    assert len(registry) == 3
+
+def test_registry_evicts_least_recently_used():
+    registry = S3ClientRegistry(max_size=2)
+    first = registry.get(make_settings(aws_access_key_id="a"))
+    registry.get(make_settings(aws_access_key_id="b"))
+    registry.get(make_settings(aws_access_key_id="a"))
+    registry.get(make_settings(aws_access_key_id="c"))
+    
+    assert len(registry) == 2
+    assert registry.get(make_settings(aws_access_key_id="a")) is first
+
+def test_registry_evicts_idle_clients():
+    registry = S3ClientRegistry(idle_ttl=-1)
+    first = registry.get(make_settings())
+    assert registry.get(make_settings()) is not first
+    assert len(registry) == 1
+
+def test_choose_part_size_stays_within_part_limit():
+    assert choose_part_size(1024, 1024) == MIN_PART_SIZE
+    assert choose_part_size(100 * 1024 * 1024, 8 * 1024 * 1024) == 8 * 1024 * 1024
+    
+    five_tb = 5 * 1024 ** 4
+    part_size = choose_part_size(five_tb, 8 * 1024 * 1024)
+    assert -(-five_tb // part_size) <= MAX_PARTS
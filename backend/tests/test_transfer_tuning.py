@@ -0,0 +1,43 @@
+from config.settings import Settings
+from src.services.s3_uploader import build_transfer_config, MAX_PARTS, MIN_PART_SIZE
+from src.services.transfer_tuning import TransferTuner, TARGET_PART_SECONDS
+
+MB = 1024 * 1024
+
+
+def test_fixed_plan_uses_configured_values_within_part_limit():
+    tuner = TransferTuner(part_size=8 * MB, max_in_flight=4)
+    assert tuner.plan(100 * MB) == (8 * MB, 4)
+    # Fewer parts than slots
+    assert tuner.plan(10 * MB) == (8 * MB, 2)
+    
+    part_size, _ = tuner.plan(200 * 1024 * MB)
+    assert -(-200 * 1024 * MB // part_size) <= MAX_PARTS
+
+def test_adaptive_plan_follows_part_throughput():
+    tuner = TransferTuner(part_size=8 * MB, max_in_flight=4, max_part_size=64 * MB, adaptive=True)
+    # Fast link: parts grow, fewer run at once to keep the same memory budget
+    tuner.record_part(16 * MB, 0.5)
+    part_size, concurrency = tuner.plan(10 * 1024 * MB)
+    assert part_size == int(32 * MB * TARGET_PART_SECONDS)
+    assert concurrency == 1
+    
+    # Slow link: minimum-size parts, more of them in parallel
+    slow = TransferTuner(part_size=8 * MB, max_in_flight=4, worker_max_parts=5, adaptive=True)
+    slow.record_part(MB, 4)
+    assert slow.plan(10 * 1024 * MB) == (MIN_PART_SIZE, 5)
+
+def test_adaptive_plan_never_exceeds_part_limit():
+    tuner = TransferTuner(part_size=8 * MB, max_part_size=8 * MB, adaptive=True)
+    tuner.record_part(MB, 10)
+    part_size, _ = tuner.plan(5 * 1024 * 1024 * MB)
+    assert -(-5 * 1024 * 1024 * MB // part_size) <= MAX_PARTS
+
+def test_transfer_config_from_settings():
+    settings = Settings(upload_multipart_threshold=16 * MB, upload_part_size=10 * MB,
+                        upload_max_in_flight_parts=6, upload_io_queue_depth=50, upload_worker_max_parts=4)
+    config = build_transfer_config(settings)
+    assert config.multipart_threshold == 16 * MB
+    assert config.multipart_chunksize == 10 * MB
+    assert config.max_concurrency == 4
+    assert config.max_io_queue == 50
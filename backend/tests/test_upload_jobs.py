@@ -0,0 +1,170 @@
+import asyncio
+import os
+import time
+import boto3
+import pytest
+from fastapi import HTTPException
+from moto import mock_s3
+from src.services.upload_jobs import UploadJobStore, UploadJobQueue, QUEUED, RUNNING, SUCCEEDED, FAILED
+
+
+def make_job(job_id: str, size: int) -> dict:
+    return {
+        "id": job_id, "request_id": f"req-{job_id}", "bucket_name": "bucket", "upload_path": "jobs",
+        "file_key": f"jobs/{job_id}.txt", "filename": f"{job_id}.txt", "content_type": "text/plain",
+        "compression": None, "declared_sha256": None, "size": size,
+    }
+
+def run_until_idle(queue: UploadJobQueue, handler, job_ids):
+    async def run():
+        await queue.start(handler)
+        while any(queue.store.get(job_id)["status"] in (QUEUED, RUNNING) for job_id in job_ids):
+            await asyncio.sleep(0.01)
+        await queue.stop()
+    asyncio.run(run())
+
+def test_start_recovers_unfinished_jobs_and_cleans_the_spool(tmp_path):
+    store = UploadJobStore(str(tmp_path / "jobs.sqlite3"))
+    spool_dir = tmp_path / "spool"
+    spool_dir.mkdir()
+    # "a" was mid-upload when the process stopped, "b" lost its body, "c" used request credentials
+    for job_id, status in (("a", RUNNING), ("b", QUEUED), ("c", QUEUED)):
+        store.create({**make_job(job_id, 3), "status": status, "custom_credentials": int(job_id == "c")})
+    (spool_dir / "a").write_bytes(b"aaa")
+    (spool_dir / "c").write_bytes(b"ccc")
+    (spool_dir / "orphan.part").write_bytes(b"half")
+    abandoned = time.time() - 3600
+    os.utime(spool_dir / "orphan.part", (abandoned, abandoned))
+    
+    handled = []
+    
+    async def handler(job, settings, progress, started):
+        with open(job["spool_path"], "rb") as f:
+            handled.append((job["id"], f.read()))
+        progress(job["size"])
+        return {"success": True, "file_key": job["file_key"], "request_id": job["request_id"]}
+    
+    run_until_idle(UploadJobQueue(store, str(spool_dir)), handler, "abc")
+    
+    assert handled == [("a", b"aaa")]
+    assert store.get("a")["status"] == SUCCEEDED
+    assert store.get("a")["bytes_uploaded"] == 3
+    assert store.get("b")["status"] == FAILED
+    assert "credentials" in store.get("c")["error"]
+    assert os.listdir(spool_dir) == []
+
+def test_failed_jobs_record_the_error(tmp_path):
+    store = UploadJobStore(":memory:")
+    queue = UploadJobQueue(store, str(tmp_path / "spool"))
+    
+    async def handler(job, settings, progress, started):
+        progress(1)
+        raise HTTPException(status_code=400, detail="Content does not match the declared SHA-256")
+    
+    async def run():
+        await queue.start(handler)
+        with open(queue.spool_path("a"), "wb") as f:
+            f.write(b"abc")
+        await queue.submit(make_job("a", 3))
+        while store.get("a")["status"] in (QUEUED, RUNNING):
+            await asyncio.sleep(0.01)
+        status = await queue.status("a")
+        await queue.stop()
+        return status
+    
+    status = asyncio.run(run())
+    assert status["status"] == FAILED
+    assert status["error"] == "Content does not match the declared SHA-256"
+    assert status["bytes_uploaded"] == 1
+    assert not os.path.exists(queue.spool_path("a"))
+
+def test_jobs_leased_by_a_live_process_are_left_alone(tmp_path):
+    store = UploadJobStore(str(tmp_path / "jobs.sqlite3"))
+    spool_dir = tmp_path / "spool"
+    spool_dir.mkdir()
+    # Another worker is running "a" and still receiving the body of a new upload
+    store.create({**make_job("a", 3), "status": RUNNING, "owner": "other", "lease_expires": time.time() + 60})
+    (spool_dir / "a").write_bytes(b"aaa")
+    (spool_dir / "b.part").write_bytes(b"ha")
+    
+    async def handler(job, settings, progress, started):
+        raise AssertionError("claimed a job another worker owns")
+    
+    async def run():
+        queue = UploadJobQueue(store, str(spool_dir))
+        await queue.start(handler)
+        await queue.stop()
+    
+    asyncio.run(run())
+    assert store.get("a")["status"] == RUNNING
+    assert store.get("a")["owner"] == "other"
+    assert sorted(os.listdir(spool_dir)) == ["a", "b.part"]
+
+def test_submit_removes_the_spooled_body_when_the_job_cannot_be_recorded(tmp_path):
+    store = UploadJobStore(":memory:")
+    queue = UploadJobQueue(store, str(tmp_path / "spool"))
+    
+    async def run():
+        await queue.start(None)
+        with open(queue.spool_path("a"), "wb") as f:
+            f.write(b"abc")
+        store.close()
+        try:
+            await queue.submit(make_job("a", 3))
+        finally:
+            for task in queue._tasks:
+                task.cancel()
+    
+    with pytest.raises(Exception):
+        asyncio.run(run())
+    assert not os.path.exists(queue.spool_path("a"))
+
+def test_bodies_still_being_received_survive_a_stalled_client(tmp_path):
+    store = UploadJobStore(str(tmp_path / "jobs.sqlite3"))
+    spool_dir = tmp_path / "spool"
+    receiver = UploadJobQueue(store, str(spool_dir))
+    other_process = UploadJobQueue(store, str(spool_dir))
+    
+    async def run():
+        spool = receiver.spool("slow")
+        await spool.open()
+        await spool.write(b"first chunk")
+        # The client stalls for longer than a lease
+        stalled = time.time() - 3600
+        os.utime(spool.path + ".part", (stalled, stalled))
+        receiver._reclaim(frozenset(receiver._receiving))
+        assert os.path.exists(spool.path + ".part")
+        # Renewal marks it live for every other process sharing the spool directory
+        receiver._touch_receiving(list(receiver._receiving))
+        other_process._reclaim(frozenset())
+        assert os.path.exists(spool.path + ".part")
+        await spool.write(b", second chunk")
+        await spool.commit()
+    
+    asyncio.run(run())
+    assert (spool_dir / "slow").read_bytes() == b"first chunk, second chunk"
+
+@mock_s3
+def test_reclaimed_jobs_abort_the_multipart_upload_left_open(tmp_path, monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_REGION", "us-east-1")
+    s3 = boto3.client("s3", region_name="us-east-1")
+    s3.create_bucket(Bucket="bucket")
+    upload_id = s3.create_multipart_upload(Bucket="bucket", Key="jobs/a.txt")["UploadId"]
+    
+    store = UploadJobStore(str(tmp_path / "jobs.sqlite3"))
+    spool_dir = tmp_path / "spool"
+    spool_dir.mkdir()
+    # The worker running "a" died after starting its multipart upload
+    store.create({**make_job("a", 3), "status": RUNNING, "owner": "dead", "lease_expires": time.time() - 1,
+                  "upload_id": upload_id})
+    (spool_dir / "a").write_bytes(b"aaa")
+    
+    async def handler(job, settings, progress, started):
+        assert job["upload_id"] is None
+        return {"success": True, "file_key": job["file_key"], "request_id": job["request_id"]}
+    
+    run_until_idle(UploadJobQueue(store, str(spool_dir)), handler, "a")
+    assert store.get("a")["status"] == SUCCEEDED
+    assert s3.list_multipart_uploads(Bucket="bucket").get("Uploads", []) == []
@@ -151,6 +151,21 @@ export function FileUpload() {
     }
   }
 
+  const loadMoreObjects = async () => {
+    if (!bucketObjects.next_token) return
+    
+    try {
+      const objects = await getBucketObjects(selectedBucket, currentPath, awsAccessKey, awsSecretKey, bucketObjects.next_token)
+      setBucketObjects(prev => ({
+        ...objects,
+        folders: [...prev.folders, ...objects.folders],
+        files: [...prev.files, ...objects.files]
+      }))
+    } catch (err) {
+      setError(`Failed to load bucket contents: ${err.message}`)
+    }
+  }
+
   const handleBucketChange = (bucketName) => {
     setSelectedBucket(bucketName)
     setCurrentPath('')
@@ -503,6 +518,15 @@ export function FileUpload() {
               </div>
             ))}
             
+            {bucketObjects.next_token && (
+              <button
+                onClick={loadMoreObjects}
+                className="w-full text-sm text-blue-600 hover:text-blue-800 p-2"
+              >
+                Load more
+              </button>
+            )}
+            
             {bucketObjects.folders?.length === 0 && bucketObjects.files?.length === 0 && (
               <p className="text-gray-500 text-sm">No files or folders in this location</p>
             )}
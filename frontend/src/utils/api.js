@@ -40,10 +40,11 @@ async function handleResponse(response, defaultMessage) {
 }
 
 export async function uploadFile(file, bucketName, uploadPath, awsAccessKey, awsSecretKey) {
+  // Fields must precede the file: the backend streams the file as it arrives
   const formData = new FormData()
-  formData.append('file', file)
   if (bucketName) formData.append('bucket_name', bucketName)
   if (uploadPath) formData.append('upload_path', uploadPath)
+  formData.append('file', file)
   
   const headers = {}
   if (awsAccessKey && awsSecretKey) {
@@ -63,6 +64,31 @@ export async function uploadFile(file, bucketName, uploadPath, awsAccessKey, aws
   }
 }
 
+export async function uploadFiles(files, bucketName, uploadPath, awsAccessKey, awsSecretKey) {
+  // Fields must precede the files: the backend streams each file as it arrives
+  const formData = new FormData()
+  if (bucketName) formData.append('bucket_name', bucketName)
+  if (uploadPath) formData.append('upload_path', uploadPath)
+  for (const file of files) formData.append('files', file)
+  
+  const headers = {}
+  if (awsAccessKey && awsSecretKey) {
+    headers['X-AWS-Access-Key'] = awsAccessKey
+    headers['X-AWS-Secret-Key'] = awsSecretKey
+  }
+  
+  try {
+    const response = await fetch(`${API_BASE_URL}/upload/bulk`, {
+      method: 'POST',
+      headers,
+      body: formData,
+    })
+    return await handleResponse(response, 'Bulk upload failed')
+  } catch (error) {
+    throw error
+  }
+}
+
 export async function getBuckets(awsAccessKey, awsSecretKey) {
   const headers = {}
   if (awsAccessKey && awsSecretKey) {
@@ -88,7 +114,7 @@ export async function getBuckets(awsAccessKey, awsSecretKey) {
   }
 }
 
-export async function getBucketObjects(bucketName, prefix = '', awsAccessKey, awsSecretKey) {
+export async function getBucketObjects(bucketName, prefix = '', awsAccessKey, awsSecretKey, continuationToken = null) {
   const headers = {}
   if (awsAccessKey && awsSecretKey) {
     headers['X-AWS-Access-Key'] = awsAccessKey
@@ -98,6 +124,7 @@ export async function getBucketObjects(bucketName, prefix = '', awsAccessKey, aw
   try {
     const url = new URL(`${API_BASE_URL}/buckets/${bucketName}/objects`)
     if (prefix) url.searchParams.set('prefix', prefix)
+    if (continuationToken) url.searchParams.set('continuation_token', continuationToken)
     
     const response = await fetch(url.toString(), { headers })
     return await handleResponse(response, 'Failed to fetch bucket objects')
@@ -106,6 +133,27 @@ export async function getBucketObjects(bucketName, prefix = '', awsAccessKey, aw
   }
 }
 
+export async function searchObjects(bucketName, { query = null, glob = null, prefix = '' } = {}, awsAccessKey, awsSecretKey, continuationToken = null) {
+  const headers = {}
+  if (awsAccessKey && awsSecretKey) {
+    headers['X-AWS-Access-Key'] = awsAccessKey
+    headers['X-AWS-Secret-Key'] = awsSecretKey
+  }
+  
+  try {
+    const url = new URL(`${API_BASE_URL}/search/${bucketName}`)
+    if (query) url.searchParams.set('q', query)
+    if (glob) url.searchParams.set('glob', glob)
+    if (prefix) url.searchParams.set('prefix', prefix)
+    if (continuationToken) url.searchParams.set('continuation_token', continuationToken)
+    
+    const response = await fetch(url.toString(), { headers })
+    return await handleResponse(response, 'Failed to search objects')
+  } catch (error) {
+    throw error
+  }
+}
+
 export async function getConfig() {
   try {
     const response = await fetch(`${API_BASE_URL}/config`)
@@ -160,3 +208,174 @@ export async function deleteFiles(bucketName, fileKeys, awsAccessKey, awsSecretK
     throw error
   }
 }
+
+export async function deletePrefix(bucketName, prefix, awsAccessKey, awsSecretKey) {
+  const headers = {}
+  if (awsAccessKey && awsSecretKey) {
+    headers['X-AWS-Access-Key'] = awsAccessKey
+    headers['X-AWS-Secret-Key'] = awsSecretKey
+  }
+  
+  try {
+    const url = new URL(`${API_BASE_URL}/delete/${bucketName}`)
+    url.searchParams.set('prefix', prefix)
+    
+    const response = await fetch(url.toString(), {
+      method: 'DELETE',
+      headers
+    })
+    return await handleResponse(response, 'Failed to delete prefix')
+  } catch (error) {
+    throw error
+  }
+}
+
+async function postJson(path, body, headers, defaultMessage) {
+  const response = await fetch(`${API_BASE_URL}${path}`, {
+    method: 'POST',
+    headers: { ...headers, 'Content-Type': 'application/json' },
+    body: JSON.stringify(body)
+  })
+  return await handleResponse(response, defaultMessage)
+}
+
+function multipartStateKey(file, bucketName, uploadPath) {
+  return `multipart:${bucketName || ''}:${uploadPath || ''}:${file.name}:${file.size}:${file.lastModified}`
+}
+
+async function putPartWithRetry(url, blob, maxRetries = 3) {
+  for (let attempt = 0; ; attempt++) {
+    try {
+      const response = await fetch(url, { method: 'PUT', body: blob })
+      if (!response.ok) throw new Error(`HTTP ${response.status}`)
+      // The bucket CORS policy must expose the ETag header
+      return response.headers.get('ETag')
+    } catch (error) {
+      if (attempt >= maxRetries) throw error
+      await new Promise(resolve => setTimeout(resolve, 2 ** attempt * 1000))
+    }
+  }
+}
+
+// Upload parts straight to S3 through presigned URLs; the backend only signs and
+// keeps the books. Progress is kept in localStorage so a failed upload resumes.
+export async function uploadFileDirect(file, bucketName, uploadPath, awsAccessKey, awsSecretKey, { concurrency = 4, onProgress } = {}) {
+  const headers = {}
+  if (awsAccessKey && awsSecretKey) {
+    headers['X-AWS-Access-Key'] = awsAccessKey
+    headers['X-AWS-Secret-Key'] = awsSecretKey
+  }
+  
+  const stateKey = multipartStateKey(file, bucketName, uploadPath)
+  let upload = JSON.parse(localStorage.getItem(stateKey) || 'null')
+  const completed = new Map()
+  
+  if (upload) {
+    try {
+      const url = new URL(`${API_BASE_URL}/multipart/${upload.upload_id}/parts`)
+      url.searchParams.set('bucket_name', upload.bucket_name)
+      url.searchParams.set('file_key', upload.file_key)
+      const existing = await handleResponse(await fetch(url.toString(), { headers }), 'Failed to list parts')
+      existing.parts.forEach(part => completed.set(part.part_number, part.etag))
+    } catch {
+      upload = null
+    }
+  }
+  
+  if (!upload) {
+    upload = await postJson('/multipart/initiate', {
+      filename: file.name,
+      file_size: file.size,
+      content_type: file.type || null,
+      bucket_name: bucketName || null,
+      upload_path: uploadPath || ''
+    }, headers, 'Failed to start upload')
+    localStorage.setItem(stateKey, JSON.stringify(upload))
+  }
+  
+  const pending = []
+  for (let n = 1; n <= upload.part_count; n++) {
+    if (!completed.has(n)) pending.push(n)
+  }
+  
+  let uploadedBytes = completed.size * upload.part_size
+  const reportProgress = () => onProgress?.(Math.min(100, Math.round((uploadedBytes / file.size) * 100)))
+  reportProgress()
+  
+  const worker = async () => {
+    while (pending.length) {
+      const batch = pending.splice(0, 10)
+      const { urls } = await postJson(`/multipart/${upload.upload_id}/part-urls`, {
+        bucket_name: upload.bucket_name,
+        file_key: upload.file_key,
+        part_numbers: batch,
+        part_count: upload.part_count,
+        upload_token: upload.upload_token
+      }, headers, 'Failed to sign part URLs')
+      for (const { part_number: partNumber, url } of urls) {
+        const start = (partNumber - 1) * upload.part_size
+        const blob = file.slice(start, Math.min(start + upload.part_size, file.size))
+        completed.set(partNumber, await putPartWithRetry(url, blob))
+        uploadedBytes += blob.size
+        reportProgress()
+      }
+    }
+  }
+  await Promise.all(Array.from({ length: concurrency }, worker))
+  
+  const parts = [...completed.entries()]
+    .sort((a, b) => a[0] - b[0])
+    .map(([partNumber, etag]) => ({ part_number: partNumber, etag }))
+  const result = await postJson(`/multipart/${upload.upload_id}/complete`, {
+    bucket_name: upload.bucket_name,
+    file_key: upload.file_key,
+    parts
+  }, headers, 'Failed to complete upload')
+  localStorage.removeItem(stateKey)
+  return result
+}
+
+export async function abortDirectUpload(file, bucketName, uploadPath, awsAccessKey, awsSecretKey) {
+  const headers = {}
+  if (awsAccessKey && awsSecretKey) {
+    headers['X-AWS-Access-Key'] = awsAccessKey
+    headers['X-AWS-Secret-Key'] = awsSecretKey
+  }
+  
+  const stateKey = multipartStateKey(file, bucketName, uploadPath)
+  const upload = JSON.parse(localStorage.getItem(stateKey) || 'null')
+  if (!upload) return { success: true }
+  
+  const url = new URL(`${API_BASE_URL}/multipart/${upload.upload_id}`)
+  url.searchParams.set('bucket_name', upload.bucket_name)
+  url.searchParams.set('file_key', upload.file_key)
+  const response = await fetch(url.toString(), { method: 'DELETE', headers })
+  localStorage.removeItem(stateKey)
+  return await handleResponse(response, 'Failed to abort upload')
+}
+
+export async function downloadArchive(bucketName, { keys = null, prefix = null, archiveName = null } = {}, awsAccessKey, awsSecretKey) {
+  const headers = {
+    'Content-Type': 'application/json'
+  }
+  if (awsAccessKey && awsSecretKey) {
+    headers['X-AWS-Access-Key'] = awsAccessKey
+    headers['X-AWS-Secret-Key'] = awsSecretKey
+  }
+  
+  try {
+    const response = await fetch(`${API_BASE_URL}/archive/${bucketName}`, {
+      method: 'POST',
+      headers,
+      body: JSON.stringify({ keys, prefix, archive_name: archiveName })
+    })
+    if (!response.ok) {
+      const text = await response.text().catch(() => '')
+      const message = text || 'Failed to download archive'
+      throw new Error(`HTTP ${response.status} ${response.statusText || ''} - ${message}`)
+    }
+    return response
+  } catch (error) {
+    throw error
+  }
+}